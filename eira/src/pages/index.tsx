@@ -1,5 +1,5 @@
 import { useEffect, useRef, useState } from "react";
-import type { UserDataT } from "../types/responses";
+import type { StatusEventT, UserDataT } from "../types/responses";
 import { useLocation } from "wouter";
 import "./css/index.css";
 import { useCookies } from "react-cookie";
@@ -211,6 +211,25 @@ function Index() {
     fetchUser();
   }, []);
 
+  useEffect(() => {
+    if (!cookies.session) {
+      return;
+    }
+
+    const source = new EventSource("/users/@me/events", { withCredentials: true });
+    const setStatus = (event: MessageEvent<string>) => {
+      const data: StatusEventT = JSON.parse(event.data);
+      const connected = data.event === "status" ? data.connected : data.event !== "disconnected";
+      setUser((current) => (current ? { ...current, status: connected } : current));
+    };
+
+    for (const name of ["status", "connected", "disconnected"]) {
+      source.addEventListener(name, setStatus);
+    }
+
+    return () => source.close();
+  }, []);
+
   return (
     <>
       <main>
@@ -5,7 +5,6 @@ export interface ApplicationDataT {
   scopes: string;
   bot_scopes: string;
   auths: number;
-  allowed: string | null;
   url: string;
 }
 
@@ -17,3 +16,10 @@ export interface UserDataT {
   applications: ApplicationDataT[];
   status?: boolean | null;
 }
+
+export interface StatusEventT {
+  event: "status" | "connected" | "disconnected" | "queued" | "relayed";
+  application_id: string;
+  connected?: boolean;
+  queue_depth?: number;
+}
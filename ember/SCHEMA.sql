@@ -23,4 +23,19 @@ CREATE TABLE IF NOT EXISTS whitelist(
     allowed TEXT NOT NULL,
     PRIMARY KEY (application_id, allowed),
     CONSTRAINT fk_whitelist_applications FOREIGN KEY (application_id) REFERENCES applications (id)
+);
+
+CREATE TABLE IF NOT EXISTS application_secrets(
+    application_id TEXT PRIMARY KEY,
+    secret BYTEA NOT NULL,
+    CONSTRAINT fk_application_secrets_applications FOREIGN KEY (application_id) REFERENCES applications (id)
+);
+
+CREATE TABLE IF NOT EXISTS refresh_tokens(
+    application_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    token BYTEA NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (application_id, user_id),
+    CONSTRAINT fk_refresh_tokens_applications FOREIGN KEY (application_id) REFERENCES applications (id)
 );
\ No newline at end of file
@@ -16,3 +16,4 @@ limitations under the License.
 from .app import App as App
 from .config import config as config
 from .database import Database as Database
+from .relay import Relay as Relay
@@ -0,0 +1,104 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+from typing import TYPE_CHECKING
+
+from metrics import ADMISSION_REJECTED
+from ratelimit import LocalLimiter
+
+
+if TYPE_CHECKING:
+    from connections import Registry
+    from monitor import LagMonitor
+    from types_.config import AdmissionT
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("Admission", "Rejection")
+
+
+class Rejection:
+    __slots__ = ("reason", "retry_after")
+
+    def __init__(self, reason: str, retry_after: float) -> None:
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def __repr__(self) -> str:
+        return f"Rejection(reason={self.reason}, retry_after={self.retry_after:.1f})"
+
+
+class Admission:
+    """Decides whether this worker accepts another websocket.
+
+    Every check is in-process and runs before the database is touched, so a reconnection storm is turned
+    away cheaply. Rejected bots are told when to retry, spread over ``jitter`` seconds so they do not all
+    return at once.
+    """
+
+    def __init__(self, *, clients: Registry, monitor: LagMonitor, config: AdmissionT) -> None:
+        self.clients = clients
+        self.monitor = monitor
+
+        self.enabled = config.get("enabled", False)
+        self.draining = False
+        self.max_connections = config.get("max_connections")
+        self.max_per_user = config.get("max_per_user")
+        self.max_lag = config.get("max_lag")
+        self.jitter = config.get("jitter", 10.0)
+
+        accept = config.get("accept")
+        self.limiter = LocalLimiter(rate=accept["rate"], burst=accept["burst"], max_keys=1) if accept else None
+
+    def _reject(self, reason: str, retry_after: float) -> Rejection:
+        ADMISSION_REJECTED.inc(reason)
+        return Rejection(reason, retry_after + random.uniform(0, self.jitter))
+
+    def check(self) -> Rejection | None:
+        """Check the worker-wide limits. Takes an accept token when the connection is admitted."""
+        if self.draining:
+            return self._reject("draining", 1.0)
+
+        if not self.enabled:
+            return None
+
+        if self.max_lag is not None and self.monitor.lag > self.max_lag:
+            return self._reject("lag", self.monitor.lag)
+
+        if self.max_connections is not None and len(self.clients) >= self.max_connections:
+            return self._reject("capacity", 1.0)
+
+        if self.limiter:
+            retry = self.limiter.check("")
+
+            if retry is not None:
+                return self._reject("rate", retry)
+
+        return None
+
+    def check_user(self, user_id: int) -> Rejection | None:
+        if not self.enabled or self.max_per_user is None:
+            return None
+
+        if self.clients.count_for_user(user_id) >= self.max_per_user:
+            return self._reject("user", 1.0)
+
+        return None
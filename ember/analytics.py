@@ -0,0 +1,245 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+import math
+import time
+from typing import TYPE_CHECKING, Any, Literal, cast
+
+from metrics import VALKEY_LATENCY
+
+
+if TYPE_CHECKING:
+    from valkey.asyncio import Valkey
+
+    from types_.config import AnalyticsT
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("RESOLUTIONS", "Analytics", "Sketch")
+
+
+OUTCOMES = ("started", "completed", "failed")
+
+# Bucket width and how long buckets are kept, in seconds, per resolution...
+RESOLUTIONS: dict[str, tuple[int, int]] = {
+    "minute": (60, 2 * 86400),
+    "hour": (3600, 35 * 86400),
+    "day": (86400, 400 * 86400),
+}
+
+# Latencies below this land in the lowest bin...
+MIN_LATENCY = 0.0001
+LATENCY_PREFIX = "latency:"
+
+
+class Sketch:
+    """A log-bucketed latency sketch: every quantile is within ``accuracy`` of the true value, relative to it.
+
+    Bins are keyed by ``ceil(log(value) / log(gamma))``, so sketches from any worker or bucket merge by adding
+    counts bin by bin. That is what lets Valkey merge them with HINCRBY, and a day be read as one bucket.
+    """
+
+    __slots__ = ("bins", "gamma", "log_gamma")
+
+    def __init__(self, accuracy: float = 0.01) -> None:
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins: collections.Counter[int] = collections.Counter()
+
+    def __len__(self) -> int:
+        return self.bins.total()
+
+    def index(self, value: float) -> int:
+        return math.ceil(math.log(max(value, MIN_LATENCY)) / self.log_gamma)
+
+    def add(self, value: float) -> None:
+        self.bins[self.index(value)] += 1
+
+    def merge(self, other: Sketch) -> None:
+        self.bins.update(other.bins)
+
+    def quantile(self, q: float) -> float | None:
+        count = self.bins.total()
+        if not count:
+            return None
+
+        rank = q * (count - 1)
+        seen = 0
+
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+
+            if seen > rank:
+                # The midpoint of the bin, relative to its bounds, keeps the error within accuracy either way...
+                return 2 * self.gamma**index / (self.gamma + 1)
+
+        return None
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "count": len(self),
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Rollup:
+    __slots__ = ("counts", "latency")
+
+    def __init__(self, accuracy: float) -> None:
+        self.counts: collections.Counter[str] = collections.Counter()
+        self.latency = Sketch(accuracy)
+
+    def merge(self, other: Rollup) -> None:
+        self.counts.update(other.counts)
+        self.latency.merge(other.latency)
+
+
+class Analytics:
+    """Per-application authorization counts and relay latency, in minute, hour and day buckets.
+
+    Each worker aggregates in memory by application and minute, then flushes every ``flush`` seconds in one
+    pipeline that increments the minute, hour and day buckets in Valkey. Reads fetch one hash per bucket, so
+    serving a day of hourly stats costs 24 small reads however busy the application was.
+    """
+
+    def __init__(self, *, client: Valkey, config: AnalyticsT) -> None:
+        self.client = client
+        self.interval = config.get("flush", 10.0)
+        self.accuracy = config.get("accuracy", 0.01)
+        self.max_pending = config.get("max_pending", 100_000)
+
+        self.pending: dict[tuple[str, int], Rollup] = {}
+        self._task: asyncio.Task[None] | None = None
+
+    @staticmethod
+    def key(app_id: str, resolution: str, start: int) -> str:
+        return f"analytics:{app_id}:{resolution}:{start}"
+
+    def rollup(self, app_id: str) -> Rollup:
+        minute = int(time.time()) // 60 * 60
+        rollup = self.pending.get((app_id, minute))
+
+        if rollup is None:
+            rollup = self.pending[(app_id, minute)] = Rollup(self.accuracy)
+
+        return rollup
+
+    def record(self, app_id: str, outcome: Literal["started", "completed", "failed"]) -> None:
+        self.rollup(app_id).counts[outcome] += 1
+
+    def observe(self, app_id: str, seconds: float) -> None:
+        self.rollup(app_id).latency.add(seconds)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+        await self.flush()
+
+    async def flush(self) -> None:
+        if not self.pending:
+            return
+
+        pending, self.pending = self.pending, {}
+
+        try:
+            # In one transaction, so a flush is applied whole or not at all. A reply lost after EXEC still counts
+            # as a failure though, and retrying that flush counts it twice; these stats are at-least-once...
+            with VALKEY_LATENCY.time("analytics", "flush", span="analytics"):
+                async with self.client.pipeline(transaction=True) as pipe:
+                    for (app_id, minute), rollup in pending.items():
+                        fields = {**rollup.counts, **{f"{LATENCY_PREFIX}{i}": n for i, n in rollup.latency.bins.items()}}
+
+                        for resolution, (width, retention) in RESOLUTIONS.items():
+                            key = self.key(app_id, resolution, minute // width * width)
+
+                            for field, amount in fields.items():
+                                pipe.hincrby(key, field, amount)
+
+                            pipe.expire(key, retention)
+
+                    await pipe.execute()
+        except Exception as e:
+            LOGGER.warning("Unable to flush analytics for %s applications: %s", len(pending), e)
+
+            # Kept for the next flush; counts for the same minute recorded since are merged in...
+            for key, rollup in pending.items():
+                current = self.pending.get(key)
+                if current is not None:
+                    rollup.merge(current)
+
+                self.pending[key] = rollup
+
+            # While Valkey stays unreachable, the oldest minutes go first rather than growing without bound...
+            if len(self.pending) > self.max_pending:
+                dropped = sorted(self.pending, key=lambda key: key[1])[: len(self.pending) - self.max_pending]
+
+                for key in dropped:
+                    del self.pending[key]
+
+                LOGGER.warning("Dropped analytics for the %s oldest application minutes past max_pending.", len(dropped))
+
+    async def fetch(self, app_id: str, resolution: str, count: int) -> dict[str, Any]:
+        """The latest ``count`` buckets at ``resolution``, oldest first, with their totals."""
+        width, _ = RESOLUTIONS[resolution]
+        current = int(time.time()) // width * width
+        starts = [current - width * i for i in reversed(range(count))]
+
+        with VALKEY_LATENCY.time("analytics", "fetch", span="analytics"):
+            async with self.client.pipeline(transaction=False) as pipe:
+                for start in starts:
+                    pipe.hgetall(self.key(app_id, resolution, start))  # type: ignore
+
+                results = cast("list[dict[bytes, bytes]]", await pipe.execute())  # type: ignore
+
+        total = Rollup(self.accuracy)
+        buckets: list[dict[str, Any]] = []
+
+        for start, fields in zip(starts, results, strict=True):
+            rollup = Rollup(self.accuracy)
+
+            for field, value in fields.items():
+                name = field.decode()
+
+                if name.startswith(LATENCY_PREFIX):
+                    rollup.latency.bins[int(name.removeprefix(LATENCY_PREFIX))] = int(value)
+                else:
+                    rollup.counts[name] = int(value)
+
+            total.merge(rollup)
+            buckets.append({"start": start, **self.serialize(rollup)})
+
+        return {"resolution": resolution, "buckets": buckets, "total": self.serialize(total)}
+
+    @staticmethod
+    def serialize(rollup: Rollup) -> dict[str, Any]:
+        return {**{outcome: rollup.counts[outcome] for outcome in OUTCOMES}, "latency": rollup.latency.summary()}
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
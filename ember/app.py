@@ -15,30 +15,63 @@ limitations under the License.
 
 from __future__ import annotations
 
+import asyncio
+import functools
+import logging
 import pathlib
+import signal
+import threading
 from typing import TYPE_CHECKING, Any
 
 from aiohttp import ClientSession
 from litestar import Litestar, get
 from litestar.logging import LoggingConfig
-from litestar.middleware.session.server_side import ServerSideSessionConfig
 from litestar.params import ParameterKwarg
 from litestar.response.file import File
 from litestar.router import Router
 from litestar.static_files import create_static_files_router  # type: ignore
-from litestar.stores.valkey import ValkeyStore
 
+from admission import Admission
+from analytics import Analytics
+from auth import AuthCache
+from capture import Capture
+from cluster import Cluster
 from config import config
 from controllers import *
 from database import Database
+from events import Events
+from metrics import (
+    CONNECTION_MEMORY,
+    DATABASE_POOL,
+    QUEUE_DEPTH,
+    TOKENS_SCHEDULED,
+    VALKEY_POOL,
+    WEBSOCKETS,
+    Exporter,
+    session_timing,
+)
+from monitor import LagMonitor, SlowCallbackLogger
+from profiler import SamplingProfiler
+from ratelimit import RateLimiter
+from refresh import Refresher
+from relay import Relay
+from session_backends import session_config
+from stores import TimedValkeyStore
+from timing import server_timing
+from versions import Versions
+from whitelist import Whitelist
 
 
 if TYPE_CHECKING:
-    import asyncio
+    from collections.abc import Callable
+    from types import FrameType
 
     from litestar import Controller
-    from litestar.middleware import DefineMiddleware
     from litestar.stores.base import Store
+    from litestar.types import ASGIApp
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
 
 
 @get("/")
@@ -47,31 +80,71 @@ async def dynamic_dist_route(name: str) -> File:
     return File(f"{dist}/{name}.html", media_type="text/html", content_disposition_type="inline")
 
 
+def frontend_routes(dist: str) -> list[Router]:
+    """One route per page of the frontend build, collected once before the server binds."""
+    routes: list[Router] = []
+
+    for path in sorted(pathlib.Path(dist).glob("*.html")):
+        name = path.name.removesuffix(".html")
+        route_path = f"/{name}" if name != "index" else "/"
+
+        route = Router(
+            route_path,
+            route_handlers=[dynamic_dist_route],
+            parameters={"name": ParameterKwarg(default=name, const=True)},
+        )
+        routes.append(route)
+
+    return routes
+
+
 class App(Litestar):
     def __init__(self, **kwargs: Any) -> None:
         self.config = config
-
-        # TODO
-        self.socket_map: dict[str, asyncio.Queue[Any]] = {}
+        self.draining = False
+        self.drain_task: asyncio.Task[None] | None = None
 
         valurl: str = f'valkey://{config["valkey"]["host"]}:{config["valkey"]["port"]}'
-        store = ValkeyStore.with_client(valurl, port=config["valkey"]["port"])
+        self.relay = Relay(url=valurl, db=config["valkey"]["db"])
+
+        store = TimedValkeyStore.labelled("sessions", valurl, port=config["valkey"]["port"])
         stores: dict[str, Store] = {"sessions": store}
+        self.session_store = store
+
+        sessions = session_config(config["sessions"], secure=True, httponly=False)
+        middleware: list[Callable[..., ASGIApp]] = [session_timing(sessions.middleware)]
+
+        timing = config.get("timing", {})
+        if timing.get("enabled", False):
+            middleware.insert(
+                0,
+                server_timing(
+                    sample_rate=timing.get("sample_rate", 1.0),
+                    header=timing.get("header", True),
+                    log=timing.get("log", False),
+                ),
+            )
 
-        sessions = ServerSideSessionConfig(
-            session_id_bytes=64,
-            max_age=config["sessions"]["max_age"],
-            renew_on_access=True,
-            secure=True,
-            httponly=False,
-        )
-        middleware: list[DefineMiddleware] = [sessions.middleware]
+        # Outermost, so captured timings include every other middleware...
+        self.capture: Capture | None = None
+        capturing = config.get("capture", {})
+        if capturing.get("enabled", False):
+            self.capture = Capture(capturing)
+            middleware.insert(0, self.capture.middleware)
 
         static = create_static_files_router(
             path="/assets",
             directories=["eira/dist/assets"],
         )
-        handlers: list[type[Controller] | Router] = [SessionsController, OAuthController, static]
+        handlers: list[type[Controller] | Router] = [SessionsController, WhitelistController, OAuthController, static]
+        if config.get("metrics", {}).get("enabled", False):
+            handlers.append(MetricsController)
+
+        if config.get("debug", {}).get("enabled", False):
+            handlers.append(DebugController)
+
+        # Registering after startup rebuilds the route map once per page...
+        handlers.extend(frontend_routes(config["server"]["build"]))
 
         logging_config = LoggingConfig(
             root={"level": "INFO", "handlers": ["queue_listener"]},
@@ -90,6 +163,9 @@ class App(Litestar):
         )
 
     async def on_startup(self, app: Litestar) -> None:
+        if self.capture:
+            self.capture.start()
+
         # Database...
         dsn = config["database"]["dsn"]
 
@@ -98,43 +174,202 @@ class App(Litestar):
 
         app.state.db = db
 
+        whitelist = Whitelist(db)
+        await whitelist.start()
+        app.state.whitelist = whitelist
+
         # State store...
         valurl: str = f'valkey://{config["valkey"]["host"]}:{config["valkey"]["port"]}'
-        store = ValkeyStore.with_client(valurl, db=config["valkey"]["db"])
+        store = TimedValkeyStore.labelled("states", valurl, db=config["valkey"]["db"])
         app.state.states = store
 
         # aiohttp Session
         session = ClientSession()
         app.state.aiohttp = session
 
-        # Add built routes from frontend
-        dist = config["server"]["build"]
-        root = pathlib.Path(dist)
+        # Set socket client queues...
+        await self.relay.connect()
+        app.state.relay = self.relay
+        app.state.clients = self.relay.clients
+        app.state.events = Events(self.relay)
+        app.state.versions = Versions(self.relay.client)
+        app.state.auth = AuthCache(client=self.relay.client)
+
+        # Partitioning applications across relay nodes...
+        cluster_config = config.get("cluster")
+        if cluster_config and cluster_config["enabled"]:
+            cluster = Cluster(relay=self.relay, config=cluster_config)
+            await cluster.start()
+
+            app.state.cluster = cluster
+
+        # Per-application analytics...
+        analytics_config = config.get("analytics", {})
+        if analytics_config.get("enabled", False):
+            analytics = Analytics(client=self.relay.client, config=analytics_config)
+            analytics.start()
+
+            app.state.analytics = analytics
+
+        # Rate limiting...
+        app.state.limiter = RateLimiter(client=self.relay.client, config=config.get("ratelimit", {}))
+
+        # Server-managed token refresh...
+        refresh = config.get("refresh")
+        if refresh and refresh["enabled"]:
+            refresher = Refresher(db=db, relay=self.relay, session=session, config=refresh)
+            await refresher.start()
+
+            app.state.refresher = refresher
+            TOKENS_SCHEDULED.set_function(lambda: {(): len(refresher)})
+
+        # Event loop diagnostics...
+        debug = config.get("debug", {})
+
+        monitor = LagMonitor(warning=debug.get("lag_warning", 0.25))
+        monitor.start()
+        app.state.monitor = monitor
+
+        slow_callback = debug.get("slow_callback", 0.1)
+        if slow_callback is not None:
+            callbacks = SlowCallbackLogger(threshold=slow_callback)
+            callbacks.install()
+            app.state.callbacks = callbacks
+
+        app.state.profiler = SamplingProfiler(max_seconds=debug.get("max_seconds", 60.0))
+
+        # Admission control...
+        app.state.admission = Admission(clients=self.relay.clients, monitor=monitor, config=config.get("admission", {}))
+
+        # Metrics...
+        exporter = Exporter(client=self.relay.client, node=self.relay.node)
+        exporter.start()
+        app.state.metrics = exporter
+
+        pools = {
+            "sessions": self.session_store._valkey.connection_pool,
+            "states": store._valkey.connection_pool,
+            "relay": self.relay.client.connection_pool,
+        }
+
+        WEBSOCKETS.set_function(lambda: {(): len(self.relay.clients)})
+        QUEUE_DEPTH.set_function(lambda: {(c.app_id,): c.queue.qsize() for c in self.relay.clients})
+        CONNECTION_MEMORY.set_function(lambda: {(): self.relay.clients.memory()})
+        DATABASE_POOL.set_function(
+            lambda: {
+                ("in_use",): db.pool.get_size() - db.pool.get_idle_size(),
+                ("idle",): db.pool.get_idle_size(),
+                ("max",): db.pool.get_max_size(),
+            }
+        )
 
-        for path in root.glob("*.html"):
-            name = path.name.removesuffix(".html")
-            route_path = f"/{name}" if name != "index" else "/"
+        def valkey_pools() -> dict[tuple[str, ...], float]:
+            values: dict[tuple[str, ...], float] = {}
 
-            route = Router(
-                route_path,
-                route_handlers=[dynamic_dist_route],
-                parameters={"name": ParameterKwarg(default=name, const=True)},
-            )
-            self.register(route)
+            for name, pool in pools.items():
+                values[(name, "in_use")] = len(pool._in_use_connections)  # type: ignore
+                values[(name, "idle")] = len(pool._available_connections)  # type: ignore
 
-        # Set socket client queues...
-        app.state.clients = self.socket_map
+            return values
+
+        VALKEY_POOL.set_function(valkey_pools)
+
+        if config.get("drain", {}).get("enabled", False):
+            self.install_drain()
+
+    def install_drain(self) -> None:
+        # uvicorn stops on SIGINT and SIGTERM by closing every websocket at once.
+        # Drain them first, then pass the signal on to uvicorn...
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        loop = asyncio.get_running_loop()
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            previous = signal.getsignal(sig)
+
+            if callable(previous):
+                signal.signal(sig, functools.partial(self.exit_signal, loop, previous))
+
+    def exit_signal(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        previous: Callable[[int, FrameType | None], Any],
+        sig: int,
+        frame: FrameType | None,
+    ) -> None:
+        # A second signal skips the drain...
+        if self.draining:
+            previous(sig, frame)
+            return
+
+        # Signal handlers interrupt the loop wherever it is, so the drain is scheduled through its wakeup pipe...
+        self.draining = True
+        loop.call_soon_threadsafe(self.start_drain, previous, sig)
+
+    def start_drain(self, previous: Callable[[int, FrameType | None], Any], sig: int) -> None:
+        self.drain_task = asyncio.create_task(self.drain(previous, sig))
+
+    async def drain(self, previous: Callable[[int, FrameType | None], Any], sig: int) -> None:
+        drain = config.get("drain", {})
+        admission: Admission = self.state.admission
+        admission.draining = True
+
+        try:
+            async with asyncio.timeout(drain.get("timeout", 20.0)):
+                await self.relay.drain(flush=drain.get("flush", 5.0), spread=drain.get("spread", 10.0))
+        except TimeoutError:
+            LOGGER.warning("Draining websockets exceeded the deadline. Closing the remainder.")
+        except Exception as e:
+            LOGGER.error("Ignoring exception while draining websockets: %s", e)
+        finally:
+            previous(sig, None)
 
     async def on_shutdown(self, app: Litestar) -> None:
         db: Database | None = app.state.get("db")
         sess: ClientSession | None = app.state.get("aiohttp")
 
+        if self.capture:
+            await self.capture.close()
+
+        # Stopped first, as refreshes in flight use the database and the aiohttp session...
+        refresher: Refresher | None = app.state.get("refresher")
+        if refresher:
+            await refresher.close()
+
+        cluster: Cluster | None = app.state.get("cluster")
+        if cluster:
+            await cluster.close()
+
+        # Flushed before the relay's Valkey client closes...
+        analytics: Analytics | None = app.state.get("analytics")
+        if analytics:
+            await analytics.close()
+
+        whitelist: Whitelist | None = app.state.get("whitelist")
+        if whitelist:
+            await whitelist.close()
+
         if db:
             await db.close()
 
         if sess:
             await sess.close()
 
-        client: asyncio.Queue[dict[str, str]]
-        for client in app.state.clients.values():
-            client.shutdown(immediate=True)
+        exporter: Exporter | None = app.state.get("metrics")
+        if exporter:
+            await exporter.close()
+
+        monitor: LagMonitor | None = app.state.get("monitor")
+        if monitor:
+            await monitor.close()
+
+        callbacks: SlowCallbackLogger | None = app.state.get("callbacks")
+        if callbacks:
+            callbacks.uninstall()
+
+        profiler: SamplingProfiler | None = app.state.get("profiler")
+        if profiler:
+            profiler.stop()
+
+        await self.relay.close()
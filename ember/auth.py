@@ -0,0 +1,147 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from typing import TYPE_CHECKING
+
+from metrics import AUTH_CACHE, VALKEY_LATENCY
+
+
+if TYPE_CHECKING:
+    from valkey.asyncio import Valkey
+
+    from database import Database
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("AuthCache", "Principal")
+
+
+# Written over a cached principal on invalidation. SET NX can't replace it, so a lookup that read the
+# database before the change can't cache what it read...
+TOMBSTONE = b"-"
+
+
+class Principal:
+    __slots__ = ("application_id", "user_id")
+
+    def __init__(self, user_id: int, application_id: str | None) -> None:
+        self.user_id = user_id
+        self.application_id = application_id
+
+    def __repr__(self) -> str:
+        return f"Principal(user_id={self.user_id}, application_id={self.application_id})"
+
+
+class AuthCache:
+    """Caches the user and application a websocket token belongs to, so repeat handshakes skip Postgres.
+
+    Principals are shared through Valkey keyed by a hash of the token, so the raw token is never stored.
+    Rejected tokens are remembered in-process, so repeated guesses don't each cost a query.
+    """
+
+    def __init__(
+        self,
+        *,
+        client: Valkey,
+        ttl: int = 60,
+        negative_ttl: float = 300.0,
+        max_negative: int = 100_000,
+    ) -> None:
+        self.client = client
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_negative = max_negative
+        self.rejected: dict[str, float] = {}
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def key(digest: str) -> str:
+        return f"auth:token:{digest}"
+
+    async def resolve(self, db: Database, token: str) -> Principal | None:
+        digest = self.digest(token)
+
+        expires = self.rejected.get(digest)
+        if expires is not None:
+            if expires > time.monotonic():
+                AUTH_CACHE.inc("negative")
+                return None
+
+            del self.rejected[digest]
+
+        cached: bytes | None = None
+        try:
+            with VALKEY_LATENCY.time("auth", "get", span="auth"):
+                cached = await self.client.get(self.key(digest))
+        except Exception as e:
+            LOGGER.warning("Unable to read the auth cache: %s", e)
+
+        if cached and cached != TOMBSTONE:
+            AUTH_CACHE.inc("hit")
+
+            user_id, _, application_id = cached.decode().partition(":")
+            return Principal(int(user_id), application_id or None)
+
+        AUTH_CACHE.inc("miss")
+        rows = await db.fetch_user_by_token(token)
+
+        if not rows:
+            self._reject(digest)
+            return None
+
+        first = rows[0]
+        principal = Principal(first.id, first.application_id)
+
+        if cached is None:
+            try:
+                with VALKEY_LATENCY.time("auth", "set", span="auth"):
+                    value = f"{principal.user_id}:{principal.application_id or ''}"
+                    await self.client.set(self.key(digest), value, ex=self.ttl, nx=True)
+            except Exception as e:
+                LOGGER.warning("Unable to write the auth cache: %s", e)
+
+        return principal
+
+    async def invalidate(self, token: str | None) -> None:
+        if not token:
+            return
+
+        try:
+            with VALKEY_LATENCY.time("auth", "invalidate", span="auth"):
+                await self.client.set(self.key(self.digest(token)), TOMBSTONE, ex=self.ttl)
+        except Exception as e:
+            LOGGER.warning("Unable to invalidate the auth cache: %s", e)
+
+    def _reject(self, digest: str) -> None:
+        now = time.monotonic()
+
+        if len(self.rejected) >= self.max_negative:
+            self.rejected = {key: expires for key, expires in self.rejected.items() if expires > now}
+
+            # Still full of live entries; drop the oldest half rather than grow without bound...
+            if len(self.rejected) >= self.max_negative:
+                self.rejected = dict(list(self.rejected.items())[self.max_negative // 2 :])
+
+        self.rejected[digest] = now + self.negative_ttl
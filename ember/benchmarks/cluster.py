@@ -0,0 +1,224 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Checks how applications are partitioned across relay nodes, and how many move when membership changes.
+#
+# The ring alone, in-process, with nothing running:
+#
+#     python -m benchmarks.cluster ring --nodes 2 4 8 --apps 100000
+#
+# Several local nodes, each a uvicorn process on its own port sharing the Postgres and Valkey in config.yaml. Bots
+# connect to random nodes and follow redirects; then the last node is killed, and later a new node joins. After
+# each change the share of bots that moved is compared with the 1/N a consistent-hash ring should move:
+#
+#     python -m benchmarks.cluster nodes --nodes 3 --bots 300
+#
+# Run from the ember directory.
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import statistics
+import time
+from typing import TYPE_CHECKING
+
+import aiohttp
+
+from benchmarks.utils import bench_apps, serve
+from cluster import HashRing
+from config import config
+from database import Database
+from relay import REDIRECT
+
+
+if TYPE_CHECKING:
+    from models import ApplicationRecord, UserRecord
+
+
+HOST = "127.0.0.1"
+
+# Short enough that a killed node leaves the ring within seconds; its owner keys still last the relay's own TTL...
+HEARTBEAT = 1.0
+TTL = 3.0
+
+
+def ring(args: argparse.Namespace) -> None:
+    keys = [f"app-{i}" for i in range(args.apps)]
+    print(f"{'nodes':>5} {'change':>7} {'moved %':>8} {'ideal %':>8} {'max/mean load':>13}")
+
+    for count in args.nodes:
+        nodes = [f"node-{i}" for i in range(count)]
+        before = HashRing(nodes, replicas=args.replicas)
+        owners = [before.owner(key) for key in keys]
+
+        loads = [owners.count(node) for node in nodes]
+        balance = max(loads) / statistics.mean(loads)
+
+        for change, after, ideal in (
+            ("join", HashRing([*nodes, "node-new"], replicas=args.replicas), 1 / (count + 1)),
+            ("leave", HashRing(nodes[:-1], replicas=args.replicas), 1 / count),
+        ):
+            moved = sum(owner != after.owner(key) for key, owner in zip(keys, owners, strict=True)) / len(keys)
+            print(f"{count:>5} {change:>7} {moved * 100:>8.2f} {ideal * 100:>8.2f} {balance:>13.2f}")
+
+
+class Placement:
+    def __init__(self) -> None:
+        self.nodes: dict[str, str] = {}
+        self.redirects = 0
+        self.changed = time.monotonic()
+
+    def place(self, app_id: str, url: str) -> None:
+        if self.nodes.get(app_id) != url:
+            self.nodes[app_id] = url
+            self.changed = time.monotonic()
+
+    async def settle(self, count: int, quiet: float) -> float:
+        """Wait until every bot is placed and none has moved for ``quiet`` seconds. Returns the seconds taken."""
+        start = time.monotonic()
+
+        while len(self.nodes) < count or time.monotonic() - self.changed < quiet:
+            await asyncio.sleep(0.1)
+
+        return time.monotonic() - start - quiet
+
+
+async def bot(
+    session: aiohttp.ClientSession,
+    urls: list[str],
+    user: UserRecord,
+    app: ApplicationRecord,
+    placement: Placement,
+    stop: asyncio.Event,
+) -> None:
+    headers = {"Authorization": user.token, "Application-ID": app.id}
+    url = random.choice(urls)
+
+    while not stop.is_set():
+        message: aiohttp.WSMessage | None = None
+
+        try:
+            async with session.ws_connect(url, headers=headers) as ws:
+                # Redirects close straight after accepting, so only a websocket still open a moment later counts...
+                with contextlib.suppress(TimeoutError):
+                    message = await ws.receive(timeout=0.2)
+
+                if not ws.closed:
+                    placement.place(app.id, url)
+                    message = await ws.receive()
+
+            if message and message.type is aiohttp.WSMsgType.CLOSE and message.data == REDIRECT and message.extra:
+                placement.redirects += 1
+                url = json.loads(message.extra)["redirect"]
+                continue
+        except aiohttp.ClientError:
+            pass
+
+        # Dropped, or turned away while the previous owner lets go; try any node...
+        placement.nodes.pop(app.id, None)
+        url = random.choice(urls)
+        await asyncio.sleep(0.2)
+
+
+def moved(before: dict[str, str], after: dict[str, str]) -> float:
+    return sum(after.get(app_id) != url for app_id, url in before.items()) / len(before)
+
+
+async def nodes(args: argparse.Namespace) -> None:
+    ports = [args.port + i for i in range(args.nodes + 1)]
+    urls = [f"ws://{HOST}:{port}/oauth/connect" for port in ports]
+
+    def node(i: int) -> contextlib.AbstractAsyncContextManager[asyncio.subprocess.Process]:
+        env = {
+            "EMBER_CLUSTER__ENABLED": "true",
+            "EMBER_CLUSTER__NODE": f"node-{i}",
+            "EMBER_CLUSTER__URL": urls[i],
+            "EMBER_CLUSTER__HEARTBEAT": str(HEARTBEAT),
+            "EMBER_CLUSTER__TTL": str(TTL),
+        }
+        return serve(host=HOST, port=ports[i], env=env)
+
+    placement = Placement()
+    stop = asyncio.Event()
+    quiet = TTL + 2 * HEARTBEAT
+
+    async with contextlib.AsyncExitStack() as stack:
+        db = await stack.enter_async_context(Database(dsn=config["database"]["dsn"]))
+        apps = await stack.enter_async_context(bench_apps(db, args.bots))
+        processes = [await stack.enter_async_context(node(i)) for i in range(args.nodes)]
+        session = await stack.enter_async_context(aiohttp.ClientSession())
+
+        live = urls[: args.nodes]
+        tasks = [asyncio.create_task(bot(session, live, user, app, placement, stop)) for user, app in apps]
+
+        took = await placement.settle(args.bots, quiet)
+        loads = [list(placement.nodes.values()).count(url) for url in live]
+        print(f"{args.nodes} nodes settled in {took:.1f}s after {placement.redirects} redirects, load per node {loads}")
+
+        before = dict(placement.nodes)
+        processes[-1].kill()
+        live.pop()
+
+        took = await placement.settle(args.bots, quiet)
+        print(
+            f"leave: {moved(before, placement.nodes) * 100:.1f}% moved (ideal {100 / args.nodes:.1f}%), "
+            f"recovered in {took:.1f}s"
+        )
+
+        before = dict(placement.nodes)
+        await stack.enter_async_context(node(args.nodes))
+        live.append(urls[-1])
+
+        took = await placement.settle(args.bots, quiet)
+        print(
+            f"join: {moved(before, placement.nodes) * 100:.1f}% moved (ideal {100 / args.nodes:.1f}%), "
+            f"settled in {took:.1f}s"
+        )
+
+        stop.set()
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Partitioning of applications across relay nodes.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ring_parser = commands.add_parser("ring", help="The ring alone, in-process.")
+    ring_parser.add_argument("--nodes", nargs="+", type=int, default=[2, 4, 8])
+    ring_parser.add_argument("--apps", type=int, default=100_000)
+    ring_parser.add_argument("--replicas", type=int, default=160)
+
+    nodes_parser = commands.add_parser("nodes", help="Several local relay processes.")
+    nodes_parser.add_argument("--nodes", type=int, default=3)
+    nodes_parser.add_argument("--bots", type=int, default=300)
+    nodes_parser.add_argument("--port", type=int, default=4242)
+
+    args = parser.parse_args()
+
+    if args.command == "ring":
+        ring(args)
+    else:
+        asyncio.run(nodes(args))
+
+
+if __name__ == "__main__":
+    main()
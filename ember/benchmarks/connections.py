@@ -0,0 +1,118 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Measures per-connection memory and lookup cost of the connection registry against a plain dict of queues.
+# Connections are simulated in-process; no sockets are opened. Run from the ember directory:
+#
+#     python -m benchmarks.connections --sizes 10000 100000
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import random
+import secrets
+import time
+import tracemalloc
+from typing import Any
+
+from connections import Connection, Registry
+
+
+def build(kind: str, size: int, users: int) -> tuple[Any, list[str]]:
+    app_ids = [secrets.token_hex(32) for _ in range(size)]
+
+    if kind == "dict":
+        queues: dict[str, asyncio.Queue[dict[str, str]]] = {app_id: asyncio.Queue() for app_id in app_ids}
+        return queues, app_ids
+
+    registry = Registry()
+    for index, app_id in enumerate(app_ids):
+        registry.add(Connection(app_id, index % users))
+
+    return registry, app_ids
+
+
+def memory(kind: str, size: int, users: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+
+    # The application IDs are excluded, as both layouts hold the same strings...
+    before = tracemalloc.take_snapshot()
+    container, app_ids = build(kind, size, users)
+    after = tracemalloc.take_snapshot()
+
+    tracemalloc.stop()
+
+    keys = sum(len(app_id) + 49 for app_id in app_ids)
+    used = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    del container
+    return used - keys
+
+
+def lookups(container: Any, keys: list[Any], rounds: int) -> float:
+    sample = random.choices(keys, k=rounds)
+    get = container.get
+
+    start = time.perf_counter()
+    for key in sample:
+        get(key)
+
+    return (time.perf_counter() - start) / rounds
+
+
+def user_lookups(registry: Registry, users: int, rounds: int) -> float:
+    sample = [random.randrange(users) for _ in range(rounds)]
+    for_user = registry.for_user
+
+    start = time.perf_counter()
+    for user_id in sample:
+        for_user(user_id)
+
+    return (time.perf_counter() - start) / rounds
+
+
+def run(args: argparse.Namespace) -> None:
+    print(f"{'size':>8} {'layout':>9} {'bytes/conn':>11} {'estimate':>9} {'get ns':>8} {'user ns':>8}")
+
+    for size in args.sizes:
+        users = max(1, size // args.apps_per_user)
+
+        for kind in ("dict", "registry"):
+            used = memory(kind, size, users)
+            container, app_ids = build(kind, size, users)
+            get = lookups(container, app_ids, args.rounds) * 1_000_000_000
+
+            estimate, user = "-", "-"
+            if kind == "registry":
+                estimate = f"{container.memory() / size:.0f}"
+                user = f"{user_lookups(container, users, args.rounds) * 1_000_000_000:.0f}"
+
+            print(f"{size:>8} {kind:>9} {used / size:>11.0f} {estimate:>9} {get:>8.0f} {user:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-connection memory and lookup cost of the connection registry.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000])
+    parser.add_argument("--apps-per-user", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=1_000_000)
+
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
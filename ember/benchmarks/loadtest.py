@@ -0,0 +1,290 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# End-to-end load test: N simulated bots hold websockets while M simulated browsers walk
+# /oauth/{uri} -> a fake id.twitch.tv -> /oauth/redirect/{uri}, and each code is timed until a bot receives it.
+# Requires the Postgres and Valkey instances from config.yaml. Every browser shares one address, so disable
+# 'ratelimit' in config.yaml unless the limiter is what is being measured. Run from the ember directory:
+#
+#     python -m benchmarks.loadtest --bots 100 --browsers 50 --duration 30 --output results.jsonl
+#
+# --output appends one JSON line per run, tagged with the current commit, for tracking regressions.
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import contextlib
+import json
+import random
+import subprocess
+import time
+import urllib.parse
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.utils import bench_apps, percentiles, rss, serve
+from config import config
+from database import Database
+
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncGenerator
+
+    from models import ApplicationRecord, UserRecord
+
+
+HOST = "127.0.0.1"
+TWITCH = "https://id.twitch.tv"
+
+
+class Results:
+    def __init__(self) -> None:
+        self.started: dict[str, float] = {}
+        self.relayed: list[float] = []
+        self.browser: list[float] = []
+        self.errors: collections.Counter[str] = collections.Counter()
+        self.connected = 0
+        self.memory: list[int] = []
+
+
+@contextlib.asynccontextmanager
+async def fake_twitch(relay: str, port: int) -> AsyncGenerator[str]:
+    """Stands in for id.twitch.tv, approving every authorization and sending the browser straight back."""
+
+    async def authorize(request: web.Request) -> web.Response:
+        query = request.query
+        redirect = urllib.parse.urlparse(query["redirect_uri"])
+
+        # The code is the flow ID the browser added, so the bot's receipt can be matched to its start...
+        params = urllib.parse.urlencode({"code": query["flow"], "scope": query["scope"], "state": query["state"]})
+        raise web.HTTPFound(f"{relay}{redirect.path}?{params}")
+
+    app = web.Application()
+    app.router.add_get("/oauth2/authorize", authorize)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, port).start()
+
+    try:
+        yield f"http://{HOST}:{port}"
+    finally:
+        await runner.cleanup()
+
+
+async def bot(
+    session: aiohttp.ClientSession,
+    url: str,
+    user: UserRecord,
+    app: ApplicationRecord,
+    results: Results,
+    stop: asyncio.Event,
+) -> None:
+    headers = {"Authorization": user.token, "Application-ID": app.id}
+
+    while not stop.is_set():
+        retry = 1.0
+
+        try:
+            async with session.ws_connect(url, headers=headers) as ws:
+                results.connected += 1
+
+                # Read by hand rather than iterating, as iteration swallows the close frame and its reason...
+                while True:
+                    message = await ws.receive()
+
+                    if message.type is not aiohttp.WSMsgType.TEXT:
+                        break
+
+                    started = results.started.pop(json.loads(message.data)["code"], None)
+                    if started is not None:
+                        results.relayed.append(time.perf_counter() - started)
+
+                results.connected -= 1
+
+                # Admission control and draining both hint when to come back...
+                if message.type is aiohttp.WSMsgType.CLOSE and message.data in (1012, 1013) and not stop.is_set():
+                    results.errors[f"bot_close_{message.data}"] += 1
+                    hint = json.loads(message.extra or "{}")
+                    retry = hint.get("retry_after", hint.get("reconnect_after", 1000) / 1000)
+        except aiohttp.WSServerHandshakeError as e:
+            results.errors[f"bot_handshake_{e.status}"] += 1
+        except aiohttp.ClientError:
+            results.errors["bot_connection"] += 1
+
+        if not stop.is_set():
+            await asyncio.sleep(retry)
+
+
+async def browser(
+    session: aiohttp.ClientSession,
+    relay: str,
+    twitch: str,
+    apps: list[ApplicationRecord],
+    results: Results,
+    deadline: float,
+) -> None:
+    while time.perf_counter() < deadline:
+        app = random.choice(apps)
+        flow = f"{random.getrandbits(64):016x}"
+        start = time.perf_counter()
+        results.started[flow] = start
+
+        try:
+            async with session.get(f"{relay}/oauth/{app.url}?scopes=user:read:email", allow_redirects=False) as resp:
+                if resp.status != 302:
+                    results.errors[f"authorize_{resp.status}"] += 1
+                    results.started.pop(flow, None)
+                    continue
+
+                location = resp.headers["Location"].replace(TWITCH, twitch)
+
+            async with session.get(f"{location}&flow={flow}", allow_redirects=False) as resp:
+                location = resp.headers["Location"]
+
+            async with session.get(location, allow_redirects=False) as resp:
+                if resp.status != 302:
+                    results.errors[f"redirect_{resp.status}"] += 1
+                    results.started.pop(flow, None)
+                    continue
+        except aiohttp.ClientError:
+            results.errors["browser_connection"] += 1
+            results.started.pop(flow, None)
+            continue
+
+        results.browser.append(time.perf_counter() - start)
+
+
+async def sample_memory(pid: int, results: Results, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        used = rss(pid)
+        if used is not None:
+            results.memory.append(used)
+
+        await asyncio.sleep(1.0)
+
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    relay = f"http://{HOST}:{args.port}"
+    results = Results()
+    db = Database(dsn=config["database"]["dsn"])
+
+    async with (
+        db,
+        bench_apps(db, args.bots) as pairs,
+        serve("--workers", str(args.workers), host=HOST, port=args.port) as process,
+        aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session,
+    ):
+        stop = asyncio.Event()
+        tasks = [
+            asyncio.create_task(bot(session, f"ws://{HOST}:{args.port}/oauth/connect", *pair, results, stop))
+            for pair in pairs
+        ]
+        tasks.append(asyncio.create_task(sample_memory(process.pid, results, stop)))
+
+        async with asyncio.timeout(60):
+            while results.connected < args.bots:
+                await asyncio.sleep(0.1)
+
+        connect_errors = sum(results.errors.values())
+        apps = [app for _, app in pairs]
+
+        async with fake_twitch(relay, args.twitch_port) as twitch:
+            deadline = time.perf_counter() + args.duration
+            await asyncio.gather(*(browser(session, relay, twitch, apps, results, deadline) for _ in range(args.browsers)))
+
+        # Codes still in flight get a moment to arrive before they count as lost...
+        await asyncio.sleep(args.grace)
+
+        stop.set()
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    relayed = percentiles(results.relayed)
+    browsed = percentiles(results.browser)
+
+    return {
+        "commit": commit(),
+        "time": time.time(),
+        "parameters": {
+            "bots": args.bots,
+            "browsers": args.browsers,
+            "duration": args.duration,
+            "workers": args.workers,
+        },
+        "flows": len(results.browser),
+        "throughput": len(results.relayed) / args.duration,
+        "relay_latency_ms": {str(point): value * 1000 for point, value in relayed.items()},
+        "browser_latency_ms": {str(point): value * 1000 for point, value in browsed.items()},
+        "lost": len(results.started),
+        "connect_errors": connect_errors,
+        "errors": dict(results.errors),
+        "rss_peak_bytes": max(results.memory, default=None),
+    }
+
+
+def report(result: dict[str, Any]) -> None:
+    relayed = result["relay_latency_ms"]
+    browsed = result["browser_latency_ms"]
+    peak = result["rss_peak_bytes"]
+
+    print(
+        f"{'flows':>8} {'codes/s':>9} {'relay p50':>10} {'p90':>8} {'p99':>8} {'browser p50':>12} {'p99':>8} {'lost':>6} {'rss MB':>7}"
+    )
+    print(
+        f"{result['flows']:>8} {result['throughput']:>9.1f} {relayed['50']:>10.2f} {relayed['90']:>8.2f} "
+        f"{relayed['99']:>8.2f} {browsed['50']:>12.2f} {browsed['99']:>8.2f} {result['lost']:>6} "
+        f"{(peak or 0) / 1_048_576:>7.1f}"
+    )
+
+    for error, count in sorted(result["errors"].items()):
+        print(f"  {error}: {count}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end load test of bots and browsers through the relay.")
+    parser.add_argument("--bots", type=int, default=100)
+    parser.add_argument("--browsers", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--grace", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=4242)
+    parser.add_argument("--twitch-port", type=int, default=4243)
+    parser.add_argument("--output", help="Append the results as a JSON line to this file.")
+
+    args = parser.parse_args()
+    result = asyncio.run(run(args))
+    report(result)
+
+    if args.output:
+        with open(args.output, "a") as fp:
+            fp.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Measures decoding the /users/@me rows into models and encoding the response, per request, for the struct models
+# against the previous asyncpg.Record subclasses. Rows are fetched once from the Postgres instance in config.yaml;
+# the timed loop runs in-process. Run from the ember directory:
+#
+#     python -m benchmarks.models --apps 1 5 --rounds 100000
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+from typing import TYPE_CHECKING, Any
+
+import asyncpg
+from litestar.serialization import encode_json
+
+from benchmarks.utils import bench_app
+from config import config
+from database import Database
+from models import FullUserRecord
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+QUERY = """
+SELECT
+    u.id,
+    u.twitch_id,
+    u.name,
+    u.token,
+    a.id AS application_id,
+    a.client_id,
+    a.name AS application_name,
+    a.scopes,
+    a.bot_scopes,
+    a.auths,
+    a.url
+FROM
+    users u
+LEFT JOIN
+    applications a ON u.id = a.user_id
+WHERE
+    u.id = $1
+ORDER BY
+    a.id;
+"""
+
+
+class RecordModel(asyncpg.Record):
+    """The previous model: a Record subclass with attribute access routed through __getattr__."""
+
+    def __getattr__(self, attr: str) -> Any:
+        return self[attr]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "application_id": self.application_id,
+            "client_id": self.client_id,
+            "application_name": self.application_name,
+            "scopes": self.scopes,
+            "bot_scopes": self.bot_scopes,
+            "auths": self.auths,
+            "url": self.url,
+        }
+
+
+def record_payload(rows: list[RecordModel]) -> bytes:
+    first = rows[0]
+    data = {
+        "id": first.id,
+        "twitch_id": first.twitch_id,
+        "name": first.name,
+        "applications": [row.to_dict() for row in rows if row.application_id is not None],
+        "status": False,
+    }
+
+    return encode_json(data)
+
+
+def struct_payload(records: list[asyncpg.Record]) -> bytes:
+    rows = [FullUserRecord.from_record(record) for record in records]
+
+    first = rows[0]
+    data = {
+        "id": first.id,
+        "twitch_id": first.twitch_id,
+        "name": first.name,
+        "applications": [row.application for row in rows if row.application_id is not None],
+        "status": False,
+    }
+
+    return encode_json(data)
+
+
+def timed(payload: Callable[[Any], bytes], rows: Any, rounds: int) -> tuple[float, int]:
+    for _ in range(1000):
+        payload(rows)
+
+    gc.collect()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        payload(rows)
+
+    elapsed = (time.perf_counter() - start) / rounds
+
+    # Peak traced memory of a single request, which counts every intermediate object it builds...
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    payload(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+
+async def measure(db: Database, apps: int, rounds: int) -> None:
+    async with bench_app(db) as (user, _):
+        extra = [
+            await db.create_app(user.id, name=f"{user.name}-{i}", client_id=f"{user.name}-{i}") for i in range(apps - 1)
+        ]
+
+        try:
+            async with db.pool.acquire() as connection:
+                records = await connection.fetch(QUERY, user.id)
+                legacy = await connection.fetch(QUERY, user.id, record_class=RecordModel)
+        finally:
+            for app in extra:
+                await db.delete_app(app.id)
+
+    cases: list[tuple[str, Callable[[Any], bytes], Any]] = [
+        ("record", record_payload, legacy),
+        ("struct", struct_payload, records),
+    ]
+
+    for kind, payload, rows in cases:
+        elapsed, peak = timed(payload, rows, rounds)
+        size = len(payload(rows))
+        print(f"{apps:>5} {kind:>7} {elapsed * 1_000_000_000:>9.0f} {peak:>10} {size:>7}")
+
+
+async def run(args: argparse.Namespace) -> None:
+    print(f"{'apps':>5} {'model':>7} {'ns/req':>9} {'peak B':>10} {'bytes':>7}")
+
+    async with Database(dsn=config["database"]["dsn"]) as db:
+        for apps in args.apps:
+            await measure(db, apps, args.rounds)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Decode and encode cost of the /users/@me payload per model.")
+    parser.add_argument("--apps", nargs="+", type=int, default=[1, 5])
+    parser.add_argument("--rounds", type=int, default=100_000)
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Compares the server profiles from main.PROFILES on:
+#   - HTTP redirect latency on /oauth/{uri}
+#   - websocket message throughput: codes relayed through /oauth/redirect/{uri} to a connected bot
+# Requires the Postgres and Valkey instances from config.yaml. Run from the ember directory:
+#
+#     python -m benchmarks.profiles --requests 5000 --messages 5000
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import secrets
+import time
+from typing import Any
+
+import aiohttp
+from litestar.stores.valkey import ValkeyStore
+
+from benchmarks.utils import bench_app, percentiles, serve
+from config import config
+from controllers.oauth import STATE_PREFIX
+from database import Database
+from main import PROFILES
+
+
+HOST = "127.0.0.1"
+
+# Every request comes from one address, which the limiter would otherwise turn away...
+UNLIMITED = {"EMBER_RATELIMIT__ENABLED": "false"}
+
+
+def flags(options: dict[str, Any]) -> list[str]:
+    args: list[str] = []
+
+    for key, value in options.items():
+        args.extend([f"--{key.replace('_', '-')}", str(value)])
+
+    return args
+
+
+async def redirect_latency(session: aiohttp.ClientSession, url: str, *, total: int, concurrency: int) -> list[float]:
+    latencies: list[float] = []
+    remaining = total
+
+    async def worker() -> None:
+        nonlocal remaining
+
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+
+            async with session.get(url, allow_redirects=False) as resp:
+                await resp.read()
+
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def message_throughput(
+    session: aiohttp.ClientSession,
+    websocket: aiohttp.ClientWebSocketResponse,
+    base: str,
+    *,
+    total: int,
+    concurrency: int,
+) -> float:
+    valurl = f"valkey://{config['valkey']['host']}:{config['valkey']['port']}"
+    store = ValkeyStore.with_client(valurl, db=config["valkey"]["db"])
+
+    states = [secrets.token_hex(32) for _ in range(total)]
+    values = {f"{STATE_PREFIX}{s}": json.dumps({"state": s, "user": None}) for s in states}
+    await asyncio.gather(*(store.set(key, value, expires_in=300) for key, value in values.items()))
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def redirect(state: str) -> None:
+        async with semaphore, session.get(f"{base}?state={state}&code=bench", allow_redirects=False) as resp:
+            await resp.read()
+
+    async def receive() -> None:
+        # Bounded, so a redirect that failed shows up as an error rather than a hang...
+        for _ in range(total):
+            await websocket.receive_str(timeout=30)
+
+    start = time.perf_counter()
+    await asyncio.gather(receive(), *(redirect(s) for s in states))
+    elapsed = time.perf_counter() - start
+
+    await store._valkey.aclose()
+    return total / elapsed
+
+
+async def run(args: argparse.Namespace) -> None:
+    db = Database(dsn=config["database"]["dsn"])
+
+    async with db, bench_app(db) as (user, app):
+        headers = {"Authorization": user.token, "Application-ID": app.id}
+
+        print(f"{'profile':>12} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'redirect/s':>11} {'messages/s':>11}")
+
+        for name in args.profiles:
+            base = f"http://{HOST}:{args.port}"
+
+            async with (
+                serve(*flags(PROFILES[name]), host=HOST, port=args.port, env=UNLIMITED),
+                aiohttp.ClientSession() as session,
+                session.ws_connect(f"ws://{HOST}:{args.port}/oauth/connect", headers=headers) as websocket,
+            ):
+                url = f"{base}/oauth/{app.url}?scopes=user:read:email"
+                await redirect_latency(session, url, total=200, concurrency=args.concurrency)
+
+                start = time.perf_counter()
+                latencies = await redirect_latency(session, url, total=args.requests, concurrency=args.concurrency)
+                rps = args.requests / (time.perf_counter() - start)
+
+                mps = await message_throughput(
+                    session,
+                    websocket,
+                    f"{base}/oauth/redirect/{app.url}",
+                    total=args.messages,
+                    concurrency=args.concurrency,
+                )
+
+            cuts = percentiles(latencies)
+            print(
+                f"{name:>12} {cuts[50] * 1000:>8.2f} {cuts[90] * 1000:>8.2f} {cuts[99] * 1000:>8.2f} "
+                f"{rps:>11.1f} {mps:>11.1f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare server profiles on redirect latency and websocket throughput.")
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES))
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=4242)
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Replays traffic recorded by the 'capture' config section against a local relay, with the same timing and
+# concurrency, and reports latency and throughput per kind of request. Each captured application is played by a
+# throwaway application; Twitch is the fake from benchmarks.loadtest. Requires the Postgres and Valkey instances
+# from config.yaml, with 'ratelimit' disabled unless the limiter is what is being measured. Run from the ember
+# directory:
+#
+#     python -m benchmarks.replay captures/traffic.*.jsonl.gz --speed 1 --output replays.jsonl
+#     python -m benchmarks.replay captures/traffic.*.jsonl.gz --baseline replays.jsonl
+#
+# Replayed: /oauth/{uri} and /oauth/redirect/{uri} as a browser would walk them, websockets on /oauth/connect held
+# for as long as they were, and GETs of routes without parameters. Anything needing a session is skipped.
+# --baseline compares against the last line of a previous --output file.
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import gzip
+import json
+import random
+import time
+from typing import TYPE_CHECKING, Any, cast
+
+import aiohttp
+
+from benchmarks.loadtest import HOST, TWITCH, commit, fake_twitch
+from benchmarks.utils import bench_apps, percentiles, serve
+from config import config
+from database import Database
+
+
+if TYPE_CHECKING:
+    from models import ApplicationRecord, UserRecord
+
+
+# Requests captured before the application was known replay against a URI that doesn't exist...
+MISSING = "replay-missing"
+
+KINDS = {
+    ("http", "/oauth/{uri:str}"): "authorize",
+    ("http", "/oauth/redirect/{uri:str}"): "redirect",
+    ("ws", "/oauth/connect"): "connect",
+}
+
+
+def load(paths: list[str]) -> list[dict[str, Any]]:
+    events: list[dict[str, Any]] = []
+
+    for path in paths:
+        with gzip.open(path, "rt") as fp:
+            events.extend(event for line in fp if (event := json.loads(line))["k"] != "start")
+
+    events.sort(key=lambda event: event["t"])
+    return events
+
+
+def kind(event: dict[str, Any]) -> str | None:
+    found = KINDS.get((event["k"], event["r"]))
+    if found:
+        return found
+
+    if event["k"] == "http" and event["m"] == "GET" and "{" not in event["r"] and event["r"] != "(unmatched)":
+        return "get"
+
+    return None
+
+
+class Results:
+    def __init__(self) -> None:
+        self.latency: dict[str, list[float]] = collections.defaultdict(list)
+        self.statuses: collections.Counter[str] = collections.Counter()
+        self.skipped: collections.Counter[str] = collections.Counter()
+        self.errors: collections.Counter[str] = collections.Counter()
+        self.lag: list[float] = []
+        self.started: dict[str, float] = {}
+        self.relayed: list[float] = []
+
+
+class Replay:
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        relay: str,
+        twitch: str,
+        apps: dict[str, tuple[UserRecord, ApplicationRecord]],
+        results: Results,
+        speed: float,
+    ) -> None:
+        self.session = session
+        self.relay = relay
+        self.twitch = twitch
+        self.apps = apps
+        self.results = results
+        self.speed = speed
+
+        # Twitch URLs handed out by /oauth/{uri}, waiting for the redirect that follows them...
+        self.pending: dict[str, collections.deque[str]] = collections.defaultdict(collections.deque)
+
+    def timed(self, name: str, start: float, status: int | str) -> None:
+        self.results.latency[name].append(time.perf_counter() - start)
+        self.results.statuses[f"{name}_{status}"] += 1
+
+    async def authorize(self, app: ApplicationRecord | None, *, timed: bool = True) -> str | None:
+        uri = app.url if app else MISSING
+        start = time.perf_counter()
+
+        async with self.session.get(f"{self.relay}/oauth/{uri}?scopes=user:read:email", allow_redirects=False) as resp:
+            if timed:
+                self.timed("authorize", start, resp.status)
+
+            if resp.status != 302:
+                return None
+
+            location = resp.headers["Location"].replace(TWITCH, self.twitch)
+
+        if app and timed:
+            self.pending[app.id].append(location)
+
+        return location
+
+    async def redirect(self, app: ApplicationRecord | None) -> None:
+        pending = self.pending[app.id] if app else None
+        location = pending.popleft() if pending else await self.authorize(app, timed=False)
+
+        if location is None:
+            # Nothing to follow, as in the capture where the redirect failed; replay it with a stale state...
+            start = time.perf_counter()
+            url = f"{self.relay}/oauth/redirect/{app.url if app else MISSING}?code=replay&state=replay"
+
+            async with self.session.get(url, allow_redirects=False) as resp:
+                self.timed("redirect", start, resp.status)
+
+            return
+
+        flow = f"{random.getrandbits(64):016x}"
+
+        async with self.session.get(f"{location}&flow={flow}", allow_redirects=False) as resp:
+            location = resp.headers["Location"]
+
+        start = time.perf_counter()
+        self.results.started[flow] = start
+
+        async with self.session.get(location, allow_redirects=False) as resp:
+            self.timed("redirect", start, resp.status)
+
+        if resp.status != 302:
+            self.results.started.pop(flow, None)
+
+    async def connect(self, user: UserRecord, app: ApplicationRecord, hold: float) -> None:
+        headers = {"Authorization": user.token, "Application-ID": app.id}
+        url = f"{self.relay.replace('http', 'ws', 1)}/oauth/connect"
+        start = time.perf_counter()
+
+        try:
+            async with self.session.ws_connect(url, headers=headers) as ws:
+                self.timed("connect", start, 101)
+
+                async with asyncio.timeout(hold):
+                    while True:
+                        message = await ws.receive()
+
+                        if message.type is not aiohttp.WSMsgType.TEXT:
+                            break
+
+                        data = json.loads(message.data)
+                        items = cast("list[dict[str, str]]", data if isinstance(data, list) else [data])
+
+                        for item in items:
+                            started = self.results.started.pop(item.get("code", ""), None)
+
+                            if started is not None:
+                                self.results.relayed.append(time.perf_counter() - started)
+
+                if message.type is aiohttp.WSMsgType.CLOSE:
+                    self.results.statuses[f"connect_close_{message.data}"] += 1
+        except TimeoutError:
+            pass
+        except aiohttp.WSServerHandshakeError as e:
+            self.timed("connect", start, e.status)
+
+    async def play(self, event: dict[str, Any]) -> None:
+        name = kind(event)
+        pair = self.apps.get(event.get("a") or "")
+        app = pair[1] if pair else None
+
+        try:
+            if name == "authorize":
+                await self.authorize(app)
+            elif name == "redirect":
+                await self.redirect(app)
+            elif name == "connect" and pair:
+                await self.connect(*pair, hold=event["d"] / self.speed)
+            elif name == "get":
+                start = time.perf_counter()
+
+                async with self.session.get(f"{self.relay}{event['r']}", allow_redirects=False) as resp:
+                    await resp.read()
+                    self.timed("get", start, resp.status)
+            else:
+                self.results.skipped[event["r"]] += 1
+        except aiohttp.ClientError as e:
+            self.results.errors[f"{name}_{type(e).__name__}"] += 1
+
+    async def run(self, events: list[dict[str, Any]]) -> float:
+        """Play every event at its captured offset, divided by the speed. Returns the seconds taken."""
+        loop = asyncio.get_running_loop()
+        origin = events[0]["t"]
+        begin = loop.time()
+        tasks: list[asyncio.Task[None]] = []
+
+        for event in events:
+            target = begin + (event["t"] - origin) / self.speed
+            delay = target - loop.time()
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # How late each event started, which shows whether the replay itself kept up...
+            self.results.lag.append(max(0.0, loop.time() - target))
+            tasks.append(asyncio.create_task(self.play(event)))
+
+        await asyncio.gather(*tasks)
+        return loop.time() - begin
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    events = load(args.captures)[: args.limit]
+    if not events:
+        raise SystemExit("No events captured.")
+
+    pseudonyms = list(dict.fromkeys(event["a"] for event in events if event.get("a")))
+    relay = f"http://{HOST}:{args.port}"
+    results = Results()
+    db = Database(dsn=config["database"]["dsn"])
+
+    async with (
+        db,
+        bench_apps(db, min(len(pseudonyms), args.max_apps) or 1) as pairs,
+        # The replayed instance mustn't capture the replay over the capture being replayed...
+        serve("--workers", str(args.workers), host=HOST, port=args.port, env={"EMBER_CAPTURE__ENABLED": "false"}),
+        aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session,
+        fake_twitch(relay, args.twitch_port) as twitch,
+    ):
+        # Beyond --max-apps, captured applications share the throwaway ones...
+        apps = {pseudonym: pairs[i % len(pairs)] for i, pseudonym in enumerate(pseudonyms)}
+
+        replay = Replay(session, relay, twitch, apps, results, args.speed)
+        elapsed = await replay.run(events)
+
+        await asyncio.sleep(args.grace)
+
+    kinds: dict[str, Any] = {}
+    for name, samples in sorted(results.latency.items()):
+        points = percentiles(samples)
+        kinds[name] = {
+            "count": len(samples),
+            "throughput": len(samples) / elapsed,
+            "latency_ms": {str(point): value * 1000 for point, value in points.items()},
+        }
+
+    relayed = percentiles(results.relayed)
+    lag = percentiles(results.lag)
+
+    return {
+        "commit": commit(),
+        "time": time.time(),
+        "parameters": {
+            "events": len(events),
+            "captured_seconds": events[-1]["t"] - events[0]["t"],
+            "applications": len(pseudonyms),
+            "speed": args.speed,
+            "workers": args.workers,
+        },
+        "elapsed": elapsed,
+        "kinds": kinds,
+        "relay_latency_ms": {str(point): value * 1000 for point, value in relayed.items()},
+        "lost": len(results.started),
+        "dispatch_lag_ms": {str(point): value * 1000 for point, value in lag.items()},
+        "statuses": dict(results.statuses),
+        "skipped": dict(results.skipped),
+        "errors": dict(results.errors),
+    }
+
+
+def report(result: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    def delta(current: float, previous: float | None) -> str:
+        if not previous:
+            return ""
+
+        return f" ({(current - previous) / previous * 100:+.0f}%)"
+
+    parameters = result["parameters"]
+    print(
+        f"{parameters['events']} events over {parameters['captured_seconds']:.1f}s captured, "
+        f"replayed at {parameters['speed']}x in {result['elapsed']:.1f}s"
+    )
+
+    print(f"{'kind':>10} {'count':>7} {'req/s':>16} {'p50 ms':>16} {'p90 ms':>16} {'p99 ms':>16}")
+    previous: dict[str, Any] = baseline["kinds"] if baseline else {}
+
+    for name, stats in result["kinds"].items():
+        before: dict[str, Any] = previous.get(name, {})
+        latency = stats["latency_ms"]
+        old: dict[str, float] = before.get("latency_ms", {})
+
+        print(
+            f"{name:>10} {stats['count']:>7} "
+            f"{stats['throughput']:>7.1f}{delta(stats['throughput'], before.get('throughput')):>9} "
+            + " ".join(f"{latency[p]:>7.2f}{delta(latency[p], old.get(p)):>9}" for p in ("50", "90", "99"))
+        )
+
+    relayed = result["relay_latency_ms"]
+    old = baseline["relay_latency_ms"] if baseline else {}
+    print(
+        f"{'relay':>10} {'':>7} {'':>16} "
+        + " ".join(f"{relayed[p]:>7.2f}{delta(relayed[p], old.get(p)):>9}" for p in ("50", "90", "99"))
+    )
+
+    print(f"lost codes: {result['lost']}, dispatch lag p99: {result['dispatch_lag_ms']['99']:.1f}ms")
+
+    for label in ("statuses", "skipped", "errors"):
+        for key, count in sorted(result[label].items()):
+            print(f"  {label[:-1] if label != 'statuses' else 'status'} {key}: {count}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay captured traffic against a local relay.")
+    parser.add_argument("captures", nargs="+", help="Capture files written by the 'capture' config section.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay this many times faster than captured.")
+    parser.add_argument("--limit", type=int, default=None, help="Replay only the first N events.")
+    parser.add_argument("--max-apps", type=int, default=1000)
+    parser.add_argument("--grace", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=4242)
+    parser.add_argument("--twitch-port", type=int, default=4243)
+    parser.add_argument("--output", help="Append the results as a JSON line to this file.")
+    parser.add_argument("--baseline", help="Compare against the last JSON line of this file.")
+
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.loads(fp.read().splitlines()[-1])
+
+    result = asyncio.run(run(args))
+    report(result, baseline)
+
+    if args.output:
+        with open(args.output, "a") as fp:
+            fp.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
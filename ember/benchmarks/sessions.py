@@ -0,0 +1,112 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Measures the per-request overhead of each session backend against a request with no session middleware.
+# Requests are served in-process; the valkey and coalescing backends use the Valkey instance from config.yaml.
+# Run from the ember directory:
+#
+#     python -m benchmarks.sessions --requests 2000
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import secrets
+import statistics
+import time
+from typing import Any
+
+from litestar import Litestar, Request, get
+from litestar.testing import AsyncTestClient
+
+from benchmarks.utils import percentiles
+from config import config
+from metrics import VALKEY_LATENCY
+from session_backends import session_config
+from stores import TimedValkeyStore
+
+
+@get("/login")
+async def login(request: Request[Any, Any, Any]) -> None:
+    request.set_session({"id": 10000, "twitch_id": "1", "name": "bench", "token": None})  # type: ignore
+
+
+@get("/poll")
+async def poll(request: Request[Any, Any, Any]) -> dict[str, Any]:
+    return {"status": bool(request.session)}
+
+
+def build(backend: str | None) -> Litestar:
+    if backend is None:
+        return Litestar([login, poll])
+
+    valurl = f"valkey://{config['valkey']['host']}:{config['valkey']['port']}"
+    store = TimedValkeyStore.labelled("sessions", valurl, db=config["valkey"]["db"])
+
+    sessions = session_config(
+        {**config["sessions"], "backend": backend, "secret": secrets.token_hex(32)},  # type: ignore
+        secure=False,
+    )
+    return Litestar([login, poll], stores={"sessions": store}, middleware=[sessions.middleware])
+
+
+async def measure(backend: str | None, requests: int) -> tuple[list[float], float]:
+    VALKEY_LATENCY.values.clear()
+
+    async with AsyncTestClient(build(backend)) as client:
+        await client.get("/login")
+        for _ in range(50):
+            await client.get("/poll")
+
+        before = sum(sum(counts) for counts in VALKEY_LATENCY.values.values())
+        timings: list[float] = []
+
+        for _ in range(requests):
+            start = time.perf_counter()
+            await client.get("/poll")
+            timings.append(time.perf_counter() - start)
+
+        after = sum(sum(counts) for counts in VALKEY_LATENCY.values.values())
+
+    return timings, (after - before) / requests
+
+
+async def run(args: argparse.Namespace) -> None:
+    baseline, _ = await measure(None, args.requests)
+    base = statistics.median(baseline)
+
+    print(f"{'backend':>12} {'p50 us':>9} {'p99 us':>9} {'overhead us':>12} {'valkey/req':>11}")
+
+    for backend in (None, *args.backends):
+        timings, commands = (baseline, 0.0) if backend is None else await measure(backend, args.requests)
+        cuts = percentiles(timings)
+        overhead = (cuts[50] - base) * 1_000_000
+
+        print(
+            f"{backend or 'none':>12} {cuts[50] * 1_000_000:>9.1f} {cuts[99] * 1_000_000:>9.1f} "
+            f"{overhead:>12.1f} {commands:>11.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-request overhead of each session backend.")
+    parser.add_argument("--backends", nargs="+", default=["valkey", "coalescing", "cookie"])
+    parser.add_argument("--requests", type=int, default=2000)
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
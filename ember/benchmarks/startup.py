@@ -0,0 +1,134 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Measures time from process start to the first request served, broken down by phase, over fresh interpreters.
+# Requires the Postgres and Valkey instances from config.yaml. Run from the ember directory:
+#
+#     python -m benchmarks.startup --runs 10
+#
+# Phases: interpreter (spawn to first line), config (load and validate config.yaml), imports (application modules),
+# app (construct the app and its route table), lifespan (startup hooks: pools, listeners, Valkey), bind (listening),
+# first request (GET / answered).
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+
+PHASES = ("interpreter", "config", "imports", "app", "lifespan", "bind", "first request")
+
+
+async def child(host: str, port: int) -> None:
+    marks = {"interpreter": time.monotonic()}
+
+    import config  # type: ignore
+
+    marks["config"] = time.monotonic()
+
+    import aiohttp
+    import uvicorn
+
+    from app import App
+
+    marks["imports"] = time.monotonic()
+
+    app = App()
+    marks["app"] = time.monotonic()
+
+    async def lifespan(_: App) -> None:
+        marks["lifespan"] = time.monotonic()
+
+    # Litestar keeps its startup hooks in an instance list, which shadows the App.on_startup method...
+    app.on_startup.append(lifespan)  # type: ignore
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="on"))
+    task = asyncio.create_task(server.serve())
+
+    while not server.started:
+        await asyncio.sleep(0.001)
+
+    marks["bind"] = time.monotonic()
+
+    async with aiohttp.ClientSession() as session, session.get(f"http://{host}:{port}/") as resp:
+        await resp.read()
+
+    marks["first request"] = time.monotonic()
+
+    server.should_exit = True
+    await task
+
+    print(json.dumps(marks), flush=True)
+
+
+async def spawn(host: str, port: int) -> dict[str, float]:
+    start = time.monotonic()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-m",
+        "benchmarks.startup",
+        "--child",
+        "--host",
+        host,
+        "--port",
+        str(port),
+        stdout=asyncio.subprocess.PIPE,
+    )
+
+    stdout, _ = await process.communicate()
+    marks: dict[str, float] = json.loads(stdout.decode().strip().splitlines()[-1])
+
+    # CLOCK_MONOTONIC is shared between processes, so the child's marks line up with the spawn time...
+    phases: dict[str, float] = {}
+    previous = start
+
+    for phase in PHASES:
+        phases[phase] = marks[phase] - previous
+        previous = marks[phase]
+
+    phases["total"] = previous - start
+    return phases
+
+
+async def run(args: argparse.Namespace) -> None:
+    runs = [await spawn(args.host, args.port) for _ in range(args.runs)]
+
+    print(f"{'phase':>14} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for phase in (*PHASES, "total"):
+        values = [timings[phase] * 1000 for timings in runs]
+        print(f"{phase:>14} {statistics.median(values):>10.1f} {min(values):>8.1f} {max(values):>8.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time from process start to first request served, per phase.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4242)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(child(args.host, args.port))
+    else:
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import pathlib
+import secrets
+import signal
+import statistics
+import sys
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncGenerator, Sequence
+
+    from database import Database
+    from models import ApplicationRecord, UserRecord
+
+
+__all__ = ("bench_app", "bench_apps", "percentiles", "rss", "serve", "wait_for_port")
+
+
+async def wait_for_port(host: str, port: int, *, timeout: float = 30.0) -> None:
+    async with asyncio.timeout(timeout):
+        while True:
+            try:
+                _, writer = await asyncio.open_connection(host, port)
+            except OSError:
+                await asyncio.sleep(0.1)
+                continue
+
+            writer.close()
+            await writer.wait_closed()
+            return
+
+
+@contextlib.asynccontextmanager
+async def serve(
+    *args: str,
+    host: str = "127.0.0.1",
+    port: int = 4242,
+    env: dict[str, str] | None = None,
+) -> AsyncGenerator[asyncio.subprocess.Process]:
+    """Run the relay under uvicorn in a subprocess for the duration of the context.
+
+    Must be started from the ``ember`` directory so ``config.yaml`` and ``SCHEMA.sql`` resolve. ``env`` is added
+    to the environment, for config overrides.
+    """
+    command = [
+        "-m",
+        "uvicorn",
+        "main:create_app",
+        "--factory",
+        "--host",
+        host,
+        "--port",
+        str(port),
+        "--log-level",
+        "warning",
+        *args,
+    ]
+    process = await asyncio.create_subprocess_exec(sys.executable, *command, env={**os.environ, **(env or {})})
+
+    try:
+        await wait_for_port(host, port)
+        yield process
+    finally:
+        # The caller may have killed it already...
+        if process.returncode is None:
+            process.send_signal(signal.SIGINT)
+
+        try:
+            async with asyncio.timeout(30):
+                await process.wait()
+        except TimeoutError:
+            process.kill()
+
+
+@contextlib.asynccontextmanager
+async def bench_app(db: Database) -> AsyncGenerator[tuple[UserRecord, ApplicationRecord]]:
+    """Create a throwaway user and application, removing both afterwards."""
+    suffix = secrets.token_hex(6)
+    user = await db.create_user(f"bench-{suffix}", f"bench_{suffix}")
+    app = await db.create_app(user.id, name=f"bench-{suffix}", client_id=f"bench-{suffix}")
+
+    try:
+        yield user, app
+    finally:
+        await db.delete_app(app.id)
+        await db.pool.execute("DELETE FROM users WHERE id = $1", user.id)
+
+
+@contextlib.asynccontextmanager
+async def bench_apps(db: Database, count: int) -> AsyncGenerator[list[tuple[UserRecord, ApplicationRecord]]]:
+    """Create ``count`` throwaway users, each with one application, removing them all afterwards."""
+    async with contextlib.AsyncExitStack() as stack:
+        yield [await stack.enter_async_context(bench_app(db)) for _ in range(count)]
+
+
+def rss(pid: int) -> int | None:
+    """The resident memory in bytes of a process and all of its descendants. Linux only."""
+    proc = pathlib.Path("/proc")
+
+    try:
+        status = (proc / str(pid) / "status").read_text()
+        children = (proc / str(pid) / "task" / str(pid) / "children").read_text().split()
+    except OSError:
+        return None
+
+    total = next((int(line.split()[1]) * 1024 for line in status.splitlines() if line.startswith("VmRSS:")), 0)
+    return total + sum(rss(int(child)) or 0 for child in children)
+
+
+def percentiles(samples: Sequence[float], points: Sequence[int] = (50, 90, 99)) -> dict[int, float]:
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return dict.fromkeys(points, value)
+
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {point: cuts[point - 1] for point in points}
@@ -0,0 +1,170 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Measures CPU per message against bytes on the wire for /oauth/connect frames: uncompressed, permessage-deflate on
+# every message, deflate above a size threshold, and each of those with messages batched into JSON array frames.
+# Frames go through the same websockets extensions the server negotiates, in-process; nothing needs to be running.
+# Run from the ember directory:
+#
+#     python -m benchmarks.websocket --bursts 1 10 --thresholds 0 256 --rounds 2000
+#
+# A burst is the messages queued for one bot within the batching window: 1 is an isolated authorization code, more
+# is a bot replaying codes after reconnecting or a token refresh storm. Server CPU covers encoding and compressing,
+# client CPU covers decompressing and decoding. Bytes include frame headers.
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import random
+import secrets
+import time
+from typing import Any
+
+from websockets.extensions.permessage_deflate import PerMessageDeflate
+from websockets.frames import Frame, Opcode
+
+from compression import ThresholdDeflate
+
+
+WINDOW_BITS = 12
+
+
+def header(size: int) -> int:
+    # Server frames are unmasked: 2 bytes, plus 2 or 8 bytes of extended length...
+    return 2 if size < 126 else 4 if size < 65536 else 10
+
+
+def messages(count: int) -> list[dict[str, Any]]:
+    result: list[dict[str, Any]] = []
+
+    for _ in range(count):
+        if random.random() < 0.7:
+            result.append(
+                {
+                    "code": secrets.token_urlsafe(22),
+                    "grant_type": "authorization_code",
+                    "redirect_uri": "https://tio.pythonista.gg/oauth/redirect/a1b2c3d4",
+                    "user": str(random.randint(10**7, 10**9)),
+                }
+            )
+        else:
+            result.append(
+                {
+                    "grant_type": "refresh_token",
+                    "user_id": str(random.randint(10**7, 10**9)),
+                    "access_token": secrets.token_urlsafe(22),
+                    "refresh_token": secrets.token_urlsafe(38),
+                    "expires_in": random.randint(13000, 15000),
+                    "scope": ["chat:read", "chat:edit", "moderator:read:followers", "user:read:chat"],
+                }
+            )
+
+    return result
+
+
+def pair(threshold: int | None) -> tuple[PerMessageDeflate | None, PerMessageDeflate | None]:
+    if threshold is None:
+        return None, None
+
+    server = ThresholdDeflate(False, False, WINDOW_BITS, WINDOW_BITS, {"memLevel": 5}, threshold=threshold)
+    client = PerMessageDeflate(False, False, WINDOW_BITS, WINDOW_BITS)
+
+    return server, client
+
+
+def measure(bursts: list[list[dict[str, Any]]], threshold: int | None, batched: bool) -> tuple[float, float, int, int]:
+    """Returns server and client CPU seconds, total bytes, and frames sent for the given bursts."""
+    server, client = pair(threshold)
+    server_cpu = client_cpu = 0.0
+    sent = frames = 0
+
+    for burst in bursts:
+        start = time.process_time()
+
+        if batched:
+            payloads = [f"[{','.join(json.dumps(message) for message in burst)}]".encode()]
+        else:
+            payloads = [json.dumps(message).encode() for message in burst]
+
+        encoded = [Frame(Opcode.TEXT, payload) for payload in payloads]
+        if server is not None:
+            encoded = [server.encode(frame) for frame in encoded]
+
+        middle = time.process_time()
+
+        for frame in encoded:
+            decoded = client.decode(frame) if client is not None else frame
+            json.loads(bytes(decoded.data))
+
+        server_cpu += middle - start
+        client_cpu += time.process_time() - middle
+        sent += sum(len(frame.data) + header(len(frame.data)) for frame in encoded)
+        frames += len(encoded)
+
+    return server_cpu, client_cpu, sent, frames
+
+
+def run(args: argparse.Namespace) -> None:
+    random.seed(args.seed)
+    settings: list[tuple[str, int | None]] = [("none", None)]
+    settings += [(f"deflate>={threshold}" if threshold else "deflate", threshold) for threshold in args.thresholds]
+
+    print(
+        f"{'burst':>5} {'compression':>13} {'batched':>7} {'frames':>6} {'bytes/msg':>9} "
+        f"{'server us/msg':>13} {'client us/msg':>13} {'saved B/server us':>17}"
+    )
+
+    for size in args.bursts:
+        bursts = [messages(size) for _ in range(args.rounds)]
+        count = size * args.rounds
+        baseline: float | None = None
+        baseline_us = 0.0
+
+        for batched in (False, True) if size > 1 else (False,):
+            for name, threshold in settings:
+                gc.collect()
+                server_cpu, client_cpu, sent, frames = measure(bursts, threshold, batched)
+
+                per_message = sent / count
+                server_us = server_cpu / count * 1_000_000
+
+                if baseline is None:
+                    baseline = per_message
+                    baseline_us = server_us
+
+                # Bytes saved on the wire for each extra microsecond the server spends, against no compression...
+                extra = server_us - baseline_us
+                ratio = f"{(baseline - per_message) / extra:>17.1f}" if extra > 0 else f"{'-':>17}"
+
+                print(
+                    f"{size:>5} {name:>13} {'yes' if batched else 'no':>7} {frames // args.rounds:>6} "
+                    f"{per_message:>9.1f} {server_us:>13.2f} {client_cpu / count * 1_000_000:>13.2f} {ratio}"
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="CPU against bytes for /oauth/connect compression and batching.")
+    parser.add_argument("--bursts", nargs="+", type=int, default=[1, 10])
+    parser.add_argument("--thresholds", nargs="+", type=int, default=[0, 256])
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
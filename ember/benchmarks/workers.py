@@ -0,0 +1,115 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Measures requests/second on /oauth/{uri} as the number of workers grows.
+# Requires the Postgres and Valkey instances from config.yaml. Run from the ember directory:
+#
+#     python -m benchmarks.workers --workers 1 2 4 8 --duration 10
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+
+import aiohttp
+
+from benchmarks.utils import bench_app, percentiles, serve
+from config import config
+from database import Database
+
+
+HOST = "127.0.0.1"
+
+# Every request comes from one address, which the limiter would otherwise turn away...
+UNLIMITED = {"EMBER_RATELIMIT__ENABLED": "false"}
+
+
+async def hammer(url: str, *, duration: float, concurrency: int) -> tuple[int, int, list[float]]:
+    ok = 0
+    errors = 0
+    latencies: list[float] = []
+    deadline = time.perf_counter() + duration
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def worker() -> None:
+            nonlocal ok, errors
+
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+
+                try:
+                    async with session.get(url, allow_redirects=False) as resp:
+                        await resp.read()
+                        success = resp.status == 302
+                except aiohttp.ClientError:
+                    success = False
+
+                latencies.append(time.perf_counter() - start)
+                if success:
+                    ok += 1
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    return ok, errors, latencies
+
+
+async def run(args: argparse.Namespace) -> None:
+    db = Database(dsn=config["database"]["dsn"])
+
+    async with db, bench_app(db) as (user, app):
+        url = f"http://{HOST}:{args.port}/oauth/{app.url}?scopes=user:read:email"
+        headers = {"Authorization": user.token, "Application-ID": app.id}
+        baseline: float | None = None
+
+        print(f"{'workers':>8} {'req/s':>10} {'scale':>7} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+
+        for count in args.workers:
+            async with (
+                serve("--workers", str(count), host=HOST, port=args.port, env=UNLIMITED),
+                aiohttp.ClientSession() as session,
+                session.ws_connect(f"ws://{HOST}:{args.port}/oauth/connect", headers=headers),
+            ):
+                # Warm every worker's pool before measuring...
+                await hammer(url, duration=1.0, concurrency=args.concurrency)
+                ok, errors, latencies = await hammer(url, duration=args.duration, concurrency=args.concurrency)
+
+            rps = ok / args.duration
+            baseline = baseline or rps
+            cuts = percentiles(latencies)
+
+            print(
+                f"{count:>8} {rps:>10.1f} {rps / baseline:>6.2f}x "
+                f"{cuts[50] * 1000:>8.2f} {cuts[99] * 1000:>8.2f} {errors:>7}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Requests/second on /oauth/{uri} from 1 to N workers.")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=4242)
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import gzip
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import secrets
+import time
+from typing import TYPE_CHECKING, Any
+
+
+if TYPE_CHECKING:
+    from litestar.types import ASGIApp, Message, Receive, ReceiveMessage, Scope, Send
+
+    from types_.config import CaptureT
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("Capture", "application")
+
+
+CURRENT: contextvars.ContextVar[dict[str, Any] | None] = contextvars.ContextVar("capture", default=None)
+
+
+def application(app_id: str) -> None:
+    """Attribute the current request to an application, if it is being captured."""
+    event = CURRENT.get()
+
+    if event is not None:
+        event["a"] = app_id
+
+
+class Capture:
+    """Records the timing of every HTTP request and websocket to a gzipped JSON lines file, for replay.
+
+    Traces are sanitized as they are taken: only the route template, status, timings and websocket close code
+    are kept. Query strings, headers, bodies, codes and tokens never reach the file, and applications are
+    recorded as a keyed hash, so a replay can tell them apart without learning which they were.
+
+    Each worker writes its own file, suffixed with its PID; timestamps are wall clock so files merge.
+    """
+
+    def __init__(self, config: CaptureT) -> None:
+        self.path = f"{config.get('path', 'captures/traffic')}.{os.getpid()}.jsonl.gz"
+        self.interval = config.get("flush", 5.0)
+        self.max_events = config.get("max_events", 1_000_000)
+
+        # Without a shared salt, each worker hashes the same application differently...
+        salt = config.get("salt")
+        self.salt = salt.encode() if salt else secrets.token_bytes(16)
+
+        self.buffer: list[dict[str, Any]] = []
+        self.captured = 0
+        self._task: asyncio.Task[None] | None = None
+
+    def pseudonym(self, app_id: str) -> str:
+        return hashlib.blake2b(app_id.encode(), key=self.salt, digest_size=6).hexdigest()
+
+    def start(self) -> None:
+        pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.buffer.append({"k": "start", "t": round(time.time(), 4), "pid": os.getpid()})
+        self._task = asyncio.create_task(self._run())
+
+        LOGGER.info("Capturing traffic to %s.", self.path)
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+        await self.flush()
+
+    def add(self, event: dict[str, Any]) -> None:
+        if self.captured >= self.max_events:
+            return
+
+        app_id = event.get("a")
+        if app_id is not None:
+            event["a"] = self.pseudonym(app_id)
+
+        self.captured += 1
+        self.buffer.append(event)
+
+        if self.captured == self.max_events:
+            LOGGER.warning("Traffic capture stopped after %s events.", self.max_events)
+
+    async def flush(self) -> None:
+        if not self.buffer:
+            return
+
+        lines, self.buffer = self.buffer, []
+        data = "".join(json.dumps(line, separators=(",", ":")) + "\n" for line in lines)
+
+        # Appending writes another gzip member, which readers decompress as one stream...
+        try:
+            await asyncio.to_thread(self._write, data)
+        except OSError as e:
+            LOGGER.warning("Unable to write %s captured events: %s", len(lines), e)
+
+    def _write(self, data: str) -> None:
+        with gzip.open(self.path, "at", compresslevel=6) as fp:
+            fp.write(data)
+
+    def middleware(self, app: ASGIApp) -> ASGIApp:
+        async def wrapped(scope: Scope, receive: Receive, send: Send) -> None:
+            if scope["type"] == "http":
+                event: dict[str, Any] = {"k": "http", "m": scope["method"]}
+            elif scope["type"] == "websocket":
+                event = {"k": "ws", "n": 0}
+            else:
+                await app(scope, receive, send)
+                return
+
+            event["t"] = round(time.time(), 4)
+            # The template, never the path, which would carry application URIs...
+            event["r"] = scope.get("path_template") or "(unmatched)"
+
+            start = time.perf_counter()
+            token = CURRENT.set(event)
+
+            async def captured_send(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    event["s"] = message["status"]
+                elif message["type"] == "websocket.accept":
+                    event["s"] = 101
+                    event["h"] = round(time.perf_counter() - start, 6)
+                elif message["type"] == "websocket.send":
+                    event["n"] += 1
+                elif message["type"] == "websocket.close":
+                    event.setdefault("c", message.get("code", 1000))
+
+                await send(message)
+
+            async def captured_receive() -> ReceiveMessage:
+                message = await receive()
+
+                if message["type"] == "websocket.disconnect":
+                    event.setdefault("c", message.get("code", 1005))
+
+                return message
+
+            try:
+                await app(scope, captured_receive, captured_send)
+            finally:
+                CURRENT.reset(token)
+
+                event["d"] = round(time.perf_counter() - start, 6)
+                self.add(event)
+
+        return wrapped
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
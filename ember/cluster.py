@@ -0,0 +1,199 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import hashlib
+import logging
+from typing import TYPE_CHECKING, Any, cast
+
+from metrics import CLUSTER_NODES, CLUSTER_REDIRECTS, VALKEY_LATENCY
+from relay import MAX_REASON, redirect_reason
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from relay import Relay
+    from types_.config import ClusterT
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("WRONG_NODE", "Cluster", "HashRing")
+
+
+MEMBERS_KEY = "relay:cluster:members"
+NODE_PREFIX = "relay:cluster:node:"
+
+# The close reason for bots connecting to a node that doesn't own their application, the longest one carrying a URL...
+WRONG_NODE = "Wrong node."
+
+# Refreshes this node's heartbeat and returns every live node with its URL, pruning members whose heartbeat expired.
+# Node keys are derived from the member set, so this expects a single Valkey rather than a Valkey cluster...
+MEMBERSHIP_SCRIPT = """
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+redis.call('SADD', KEYS[1], ARGV[1])
+
+local live = {}
+for _, node in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    local url = redis.call('GET', ARGV[4] .. node)
+    if url then
+        table.insert(live, node)
+        table.insert(live, url)
+    else
+        redis.call('SREM', KEYS[1], node)
+    end
+end
+return live
+"""
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest())
+
+
+class HashRing:
+    """A consistent-hash ring of nodes, each placed at ``replicas`` points.
+
+    Adding or removing one of N nodes only moves the keys on the arcs it gains or loses, about 1/N of them.
+    More replicas even out the arcs at the cost of a larger ring to search.
+    """
+
+    __slots__ = ("nodes", "owners", "points", "replicas")
+
+    def __init__(self, nodes: Iterable[str] = (), *, replicas: int = 160) -> None:
+        self.replicas = replicas
+        self.nodes = frozenset(nodes)
+
+        ring = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas))
+        self.points = [point for point, _ in ring]
+        self.owners = [node for _, node in ring]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __repr__(self) -> str:
+        return f"HashRing(nodes={len(self.nodes)}, replicas={self.replicas})"
+
+    def owner(self, key: str) -> str | None:
+        if not self.points:
+            return None
+
+        index = bisect.bisect(self.points, _hash(key))
+        return self.owners[index % len(self.owners)]
+
+
+class Cluster:
+    """Partitions applications across relay nodes that share a Valkey.
+
+    A node is one relay deployment, however many workers it runs; every worker heartbeats the node's entry and
+    builds the same ring from the membership it reads back. A bot connecting to a node that doesn't own its
+    application is redirected to the owner, and when membership changes the websockets whose application moved
+    are handed off to their new owner. Codes keep reaching their websocket through the owner keys in the relay.
+    """
+
+    def __init__(self, *, relay: Relay, config: ClusterT) -> None:
+        self.relay = relay
+        self.node = config["node"]
+        self.url = config["url"]
+        self.heartbeat = config.get("heartbeat", 5.0)
+        self.ttl = config.get("ttl", 15.0)
+        self.replicas = config.get("replicas", 160)
+        self.flush = config.get("flush", 2.0)
+
+        # Every node checks its own URL, so any URL a bot is redirected to fits...
+        if len(redirect_reason(WRONG_NODE, self.url).encode()) > MAX_REASON:
+            limit = MAX_REASON - len(redirect_reason(WRONG_NODE, ""))
+            raise ValueError(f"cluster.url is too long for a websocket close reason; it can be at most {limit} bytes.")
+
+        self.members: dict[str, str] = {self.node: self.url}
+        self.ring = HashRing(self.members, replicas=self.replicas)
+
+        self._task: asyncio.Task[None] | None = None
+        self._moves: set[asyncio.Task[Any]] = set()
+
+    def __repr__(self) -> str:
+        return f"Cluster(node={self.node}, members={len(self.members)})"
+
+    async def start(self) -> None:
+        self.script = self.relay.client.register_script(MEMBERSHIP_SCRIPT)
+
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        # The node's entry outlives this worker, as others may still serve it; it expires with the last heartbeat...
+        if self._task:
+            self._task.cancel()
+
+        # Handoffs in flight are finished rather than cut short, which could leave an application marked draining.
+        # They take at most 'flush' seconds and still use the relay's Valkey client, which closes straight after...
+        tasks = [*self._moves, *([self._task] if self._task else [])]
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def locate(self, app_id: str) -> str | None:
+        """The URL of the node that owns an application, or ``None`` when it is this one."""
+        owner = self.ring.owner(app_id)
+
+        if owner is None or owner == self.node:
+            return None
+
+        return self.members.get(owner)
+
+    async def refresh(self) -> None:
+        keys = [MEMBERS_KEY, f"{NODE_PREFIX}{self.node}"]
+
+        try:
+            with VALKEY_LATENCY.time("cluster", "heartbeat", span="cluster"):
+                args = [self.node, self.url, int(self.ttl), NODE_PREFIX]
+                live = cast("list[bytes]", await self.script(keys=keys, args=args))  # type: ignore
+        except Exception as e:
+            LOGGER.warning("Unable to refresh membership of %r: %s", self, e)
+            return
+
+        members = {node.decode(): url.decode() for node, url in zip(live[::2], live[1::2], strict=True)}
+
+        # This node always counts itself, so losing Valkey never hands its own websockets away...
+        members[self.node] = self.url
+        CLUSTER_NODES.set(len(members))
+
+        if members == self.members:
+            return
+
+        LOGGER.info("Cluster membership changed from %s to %s.", sorted(self.members), sorted(members))
+        self.members = members
+        self.ring = HashRing(members, replicas=self.replicas)
+
+        self.rebalance()
+
+    def rebalance(self) -> None:
+        for connection in list(self.relay.clients):
+            url = self.locate(connection.app_id)
+            if url is None or connection.close_reason:
+                continue
+
+            CLUSTER_REDIRECTS.inc("rebalance")
+            task = asyncio.create_task(self.relay.move(connection, url, flush=self.flush))
+            self._moves.add(task)
+            task.add_done_callback(self._moves.discard)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            await self.refresh()
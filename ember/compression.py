@@ -0,0 +1,122 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any
+
+from uvicorn.protocols.websockets.websockets_sansio_impl import WebSocketsSansIOProtocol
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+from websockets.frames import CONT, CTRL_OPCODES
+
+from config import config
+from metrics import WEBSOCKET_BYTES
+
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from websockets.extensions import Extension
+    from websockets.frames import Frame
+    from websockets.typing import ExtensionParameter
+
+    from types_.config import CompressionT
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("DeflateProtocol", "ThresholdDeflate", "ThresholdDeflateFactory")
+
+
+class ThresholdDeflate(PerMessageDeflate):
+    """permessage-deflate that leaves messages smaller than ``threshold`` bytes uncompressed.
+
+    RFC 7692 marks each message as compressed or not by its RSV1 bit, so a client that negotiated the extension
+    reads both. Small frames are mostly headers to deflate; compressing them costs CPU and barely saves bytes.
+    Skipped messages never reach the compressor, so the shared window still only holds what was compressed.
+    """
+
+    def __init__(self, *args: Any, threshold: int, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.threshold = threshold
+
+    def encode(self, frame: Frame) -> Frame:
+        if frame.opcode in CTRL_OPCODES:
+            return frame
+
+        size = len(frame.data)
+        WEBSOCKET_BYTES.inc("payload", amount=size)
+
+        # Only whole messages are skipped; continuation frames follow the first frame of their message...
+        if frame.fin and frame.opcode is not CONT and size < self.threshold:
+            WEBSOCKET_BYTES.inc("sent", amount=size)
+            return frame
+
+        encoded = super().encode(frame)
+        WEBSOCKET_BYTES.inc("sent", amount=len(encoded.data))
+
+        return encoded
+
+
+class ThresholdDeflateFactory(ServerPerMessageDeflateFactory):
+    """Negotiates permessage-deflate exactly like websockets does, then hands out :class:`ThresholdDeflate`."""
+
+    def __init__(self, *, threshold: int, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.threshold = threshold
+
+    def process_request_params(
+        self,
+        params: Sequence[ExtensionParameter],
+        accepted_extensions: Sequence[Extension],
+    ) -> tuple[list[ExtensionParameter], PerMessageDeflate]:
+        response, extension = super().process_request_params(params, accepted_extensions)
+
+        return response, ThresholdDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+            threshold=self.threshold,
+        )
+
+
+def factory(settings: CompressionT) -> ThresholdDeflateFactory:
+    window = settings.get("window_bits", 12)
+
+    return ThresholdDeflateFactory(
+        threshold=settings.get("threshold", 256),
+        server_max_window_bits=window,
+        client_max_window_bits=window,
+        compress_settings={"level": settings.get("level", 6), "memLevel": settings.get("memory_level", 5)},
+    )
+
+
+class DeflateProtocol(WebSocketsSansIOProtocol):
+    """uvicorn's websockets-sansio protocol with permessage-deflate configured from ``websocket.compression``.
+
+    Passed to uvicorn by import string, so each worker builds it from its own config.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+
+        settings = config.get("websocket", {}).get("compression", {})
+        enabled = self.config.ws_per_message_deflate and settings.get("enabled", True)
+
+        self.conn.available_extensions = [factory(settings)] if enabled else []
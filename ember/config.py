@@ -15,14 +15,58 @@ limitations under the License.
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import os
+import pathlib
+from typing import Any, cast
 
+import msgspec
 import yaml
 
+from types_.config import ConfigT
 
-if TYPE_CHECKING:
-    from types_.config import ConfigT
 
+__all__ = ("ENV_PREFIX", "config", "load")
 
-with open("config.yaml", "rb") as fp:
-    config: ConfigT = yaml.load(fp.read(), Loader=yaml.Loader)
+
+# Overrides a single value: EMBER_SERVER__PORT=8080 sets server.port, EMBER_TWITCH__CLIENT_SECRET sets twitch.client_secret.
+# Values are parsed as YAML, so numbers, booleans, null and [lists] keep their types...
+ENV_PREFIX = "EMBER_"
+
+# libyaml's loader when PyYAML was built against it. Either way only plain YAML types are constructed...
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def overrides(data: dict[str, Any], environ: dict[str, str]) -> None:
+    for name, raw in environ.items():
+        if not name.startswith(ENV_PREFIX):
+            continue
+
+        *parents, key = name.removeprefix(ENV_PREFIX).lower().split("__")
+        section = data
+
+        for parent in parents:
+            child: object = section.setdefault(parent, {})
+
+            if not isinstance(child, dict):
+                raise ValueError(f"{name} overrides a value inside '{parent}', which is not a section.")
+
+            section = cast("dict[str, Any]", child)
+
+        section[key] = yaml.load(raw, Loader=Loader)
+
+
+def load(path: str | os.PathLike[str] = "config.yaml", *, environ: dict[str, str] | None = None) -> ConfigT:
+    """Load, override and validate the config once.
+
+    Raises ValueError naming the offending key when the result doesn't match ``ConfigT``.
+    """
+    data: dict[str, Any] = yaml.load(pathlib.Path(path).read_bytes(), Loader=Loader) or {}
+    overrides(data, dict(os.environ) if environ is None else environ)
+
+    try:
+        return msgspec.convert(data, ConfigT)
+    except msgspec.ValidationError as e:
+        raise ValueError(f"Invalid config in {path}: {e}") from None
+
+
+config: ConfigT = load()
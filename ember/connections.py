@@ -0,0 +1,131 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import sys
+import time
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+
+__all__ = ("Connection", "Registry")
+
+
+class Connection:
+    """A websocket held by this worker, and the queue of messages waiting to be sent to it."""
+
+    __slots__ = ("app_id", "close_code", "close_reason", "connected_at", "last_active", "queue", "queued", "sent", "user_id")
+
+    def __init__(self, app_id: str, user_id: int, queue: asyncio.Queue[dict[str, str]] | None = None) -> None:
+        self.app_id = app_id
+        self.user_id = user_id
+        self.queue: asyncio.Queue[dict[str, str]] = queue if queue is not None else asyncio.Queue()
+
+        self.connected_at = time.time()
+        self.last_active = self.connected_at
+        self.queued = 0
+        self.sent = 0
+        self.close_reason: str | None = None
+        self.close_code = 1000
+
+    def __repr__(self) -> str:
+        return f"Connection(app_id={self.app_id}, user_id={self.user_id}, queued={self.queued}, sent={self.sent})"
+
+
+def _size(obj: object) -> int:
+    # Follows instance dicts and deques, which is everything an empty queue allocates...
+    size = sys.getsizeof(obj)
+
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(vars(obj))
+        size += sum(
+            _size(value)  # type: ignore
+            for value in vars(obj).values()
+            if hasattr(value, "__dict__") or isinstance(value, collections.deque)
+        )
+
+    return size
+
+
+# Records are slotted, so an empty record and queue cost the same for every connection...
+RECORD_SIZE = sys.getsizeof(Connection.__new__(Connection)) + _size(asyncio.Queue())  # type: ignore
+
+
+class Registry:
+    """The websockets held by this worker, indexed by application and by user."""
+
+    __slots__ = ("_apps", "_users", "get")
+
+    def __init__(self) -> None:
+        self._apps: dict[str, Connection] = {}
+
+        # Users rarely hold more than a few applications, and a short list is far smaller than a dict...
+        self._users: dict[int, list[Connection]] = {}
+
+        # The dict's own lookup, which skips a method call on every message delivered...
+        self.get: Callable[[str], Connection | None] = self._apps.get
+
+    def __len__(self) -> int:
+        return len(self._apps)
+
+    def __contains__(self, app_id: object) -> bool:
+        return app_id in self._apps
+
+    def __iter__(self) -> Iterator[Connection]:
+        return iter(self._apps.values())
+
+    def __repr__(self) -> str:
+        return f"Registry(connections={len(self._apps)}, users={len(self._users)})"
+
+    def for_user(self, user_id: int) -> list[Connection]:
+        return list(self._users.get(user_id, ()))
+
+    def count_for_user(self, user_id: int) -> int:
+        return len(self._users.get(user_id, ()))
+
+    def add(self, connection: Connection) -> bool:
+        """Register a connection. Returns ``False`` if its application is already registered."""
+        if connection.app_id in self._apps:
+            return False
+
+        self._apps[connection.app_id] = connection
+        self._users.setdefault(connection.user_id, []).append(connection)
+        return True
+
+    def remove(self, app_id: str) -> Connection | None:
+        connection = self._apps.pop(app_id, None)
+        if connection is None:
+            return None
+
+        apps = self._users[connection.user_id]
+        apps.remove(connection)
+
+        if not apps:
+            del self._users[connection.user_id]
+
+        return connection
+
+    def memory(self) -> int:
+        """An estimate, in bytes, of the memory held by the registry and its connections, excluding queued messages."""
+        size = sys.getsizeof(self._apps) + sys.getsizeof(self._users)
+        size += sum(sys.getsizeof(apps) for apps in self._users.values())
+
+        return size + len(self._apps) * RECORD_SIZE
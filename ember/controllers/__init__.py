@@ -13,5 +13,8 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+from .debug import *
+from .metrics import *
 from .oauth import *
 from .sessions import *
+from .whitelist import *
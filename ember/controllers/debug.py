@@ -0,0 +1,80 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import TYPE_CHECKING, Any
+
+import litestar
+from litestar.response import Response
+
+from config import config
+from guards import AdminGuard
+
+
+if TYPE_CHECKING:
+    from litestar.datastructures import State
+
+    from ..profiler import SamplingProfiler
+
+
+__all__ = ("DebugController",)
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+# Sampling faster than this costs the loop more than it tells us...
+MIN_INTERVAL = 0.001
+
+
+class DebugController(litestar.Controller):
+    """Admin-only diagnostics. Each request is answered by a single worker, which reports only on itself."""
+
+    path = "/debug"
+    include_in_schema = False
+    guards = (AdminGuard("debug", config.get("debug", {}), require_token=True),)
+
+    @litestar.post("/profile", status_code=202)
+    async def start_profile_endpoint(
+        self,
+        state: State,
+        seconds: float = 10.0,
+        interval: float = 0.01,
+    ) -> Response[str] | dict[str, Any]:
+        if seconds <= 0 or interval < MIN_INTERVAL:
+            return Response(f"'seconds' must be positive and 'interval' at least {MIN_INTERVAL}.", status_code=400)
+
+        profiler: SamplingProfiler = state.profiler
+        if profiler.running:
+            return Response("A profile is already running on this worker.", status_code=409)
+
+        # Started from the handler, so the loop thread is the one sampled...
+        window = profiler.start(seconds=seconds, interval=interval)
+        LOGGER.info("Profiling worker %d for %.1fs every %.3fs.", os.getpid(), window, interval)
+
+        return {"pid": os.getpid(), "seconds": window, "interval": interval}
+
+    @litestar.delete("/profile", status_code=200, media_type=litestar.MediaType.TEXT)
+    async def stop_profile_endpoint(self, state: State) -> Response[str]:
+        profiler: SamplingProfiler = state.profiler
+        if profiler.started is None:
+            return Response("No profile has been run on this worker.", status_code=404)
+
+        profiler.stop()
+        headers = {"X-Worker-PID": str(os.getpid())}
+
+        return Response(profiler.collapsed(), media_type=litestar.MediaType.TEXT, headers=headers)
@@ -0,0 +1,50 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+import litestar
+from litestar.response import Response
+
+from config import config
+from guards import AdminGuard
+
+
+if TYPE_CHECKING:
+    from litestar.datastructures import State
+
+    from ..metrics import Exporter
+
+
+__all__ = ("MetricsController",)
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+class MetricsController(litestar.Controller):
+    path = "/metrics"
+    include_in_schema = False
+    guards = (AdminGuard("metrics", config.get("metrics", {})),)
+
+    @litestar.get("/")
+    async def metrics_endpoint(self, state: State) -> Response[str]:
+        exporter: Exporter = state.metrics
+        body = await exporter.render()
+
+        return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -18,15 +18,23 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import math
 import secrets
-from typing import TYPE_CHECKING
+import time
+from typing import TYPE_CHECKING, Any
 
 import litestar
 from litestar.exceptions import HTTPException
 from litestar.handlers import send_websocket_stream  # type: ignore
 from litestar.response import Redirect, Response
 
+import capture
+import scopes as scopes_
+from cluster import WRONG_NODE
 from config import config
+from connections import Connection
+from metrics import CLUSTER_REDIRECTS, RELAY_LATENCY
+from relay import LOCAL, REDIRECT, redirect_reason
 
 
 if TYPE_CHECKING:
@@ -37,7 +45,18 @@ if TYPE_CHECKING:
     from litestar.datastructures import State
     from litestar.stores.valkey import ValkeyStore
 
+    from ..admission import Admission, Rejection
+    from ..analytics import Analytics
+    from ..auth import AuthCache, Principal
+    from ..cluster import Cluster
     from ..database import Database
+    from ..events import Events
+    from ..ratelimit import RateLimiter
+    from ..refresh import Refresher
+    from ..relay import Relay
+    from ..types_.config import BatchT
+    from ..versions import Versions
+    from ..whitelist import Whitelist
 
 
 __all__ = ("OAuthController",)
@@ -45,53 +64,137 @@ __all__ = ("OAuthController",)
 
 LOGGER: logging.Logger = logging.getLogger(__name__)
 
+BATCH: BatchT = config.get("websocket", {}).get("batch", {})
+
+# OAuth states share the store with login states, which hold the bare state rather than JSON...
+STATE_PREFIX = "oauth:"
+
 
 class OAuthController(litestar.Controller):
     path = "/oauth"
 
+    async def limited(self, request: Request[str, str, State], state: State, route: str, uri: str) -> Response[Any] | None:
+        limiter: RateLimiter = state.limiter
+        # Only rewritten from X-Forwarded-For sent by server.forwarded_allow_ips, so it can't be rotated at will...
+        address = request.client.host if request.client else None
+
+        retry = await limiter.check(route, address, uri)
+        if retry is None:
+            return None
+
+        headers = {"Retry-After": str(math.ceil(retry))}
+        return Response("Too many requests. Try again later.", status_code=429, headers=headers)
+
+    async def bot(self, request: Request[str, str, State], state: State) -> Principal | Response[str]:
+        """Authenticate a bot by the same headers as its websocket."""
+        auth = request.headers.get("Authorization")
+        app_id = request.headers.get("Application-ID")
+
+        if not auth:
+            return Response("Unauthorized. No Authorization header present.", status_code=401)
+
+        if not app_id:
+            return Response("Missing 'Application-ID' header.", status_code=400)
+
+        db: Database = state.db
+        cache: AuthCache = state.auth
+        principal = await cache.resolve(db, auth)
+
+        if not principal:
+            return Response("Unauthorized. No user matches the provided token.", status_code=401)
+
+        if principal.application_id != app_id:
+            return Response("Incorrect Application-ID passed.", status_code=400)
+
+        return principal
+
     @litestar.get("/{uri:str}")
     async def user_oauth_endpoint(self, request: Request[str, str, State], state: State, uri: str) -> Response[str | None]:
         # TODO: HTML Responses...
 
+        limited = await self.limited(request, state, "authorize", uri)
+        if limited:
+            return limited
+
         db: Database = state.db
         app = await db.fetch_app_by_uri(uri)
 
         if not app:
             return Response("Application not found or not valid", status_code=404)
 
-        client: asyncio.Queue[str] | None = state.clients.get(app.id)
-        if not client:
-            return Response("Application can not be authenticated currently. No websocket found.", status_code=404)
+        capture.application(app.id)
 
+        # Validated before any Valkey round trip, so bad requests cost nothing further...
         scopes: str | None = request.query_params.get("scopes", request.query_params.get("scope", None))
         if not scopes:
             return Response("Scopes is a required parameter which is missing", status_code=400)
 
+        requested = scopes_.parse(scopes)
+        if not requested:
+            return Response("Scopes contains an invalid scope", status_code=400)
+
+        allowed = scopes_.policy(app.scopes, app.bot_scopes)
+        if allowed is not None and not requested <= allowed:
+            denied = " ".join(sorted(requested - allowed))
+            return Response(f"Scopes not allowed by this application: {denied}", status_code=403)
+
+        # Advisory only: Twitch does not tell us who is authenticating, so 'user' is whatever the link says. It is
+        # forwarded with the code, and the bot must check it against the 'login' of the token it exchanges...
+        user = request.query_params.get("user")
+        whitelist: Whitelist = state.whitelist
+
+        if not await whitelist.allowed(app.id, user):
+            return Response("You are not allowed to authenticate with this application.", status_code=403)
+
+        relay: Relay = state.relay
+        if not await relay.connected(app.id):
+            return Response("Application can not be authenticated currently. No websocket found.", status_code=404)
+
         force: str = str(bool(request.query_params.get("force_verify", None))).lower()
         domain = config["server"]["domain"]
         redirect = f"{domain}/oauth/redirect/{app.url}"
 
         state_ = secrets.token_hex(32)
         states: ValkeyStore = state.states
-        await states.set(state_, state_, expires_in=300)
+        await states.set(f"{STATE_PREFIX}{state_}", json.dumps({"state": state_, "user": user}), expires_in=300)
 
         url = (
             "https://id.twitch.tv/oauth2/authorize"
             f"?client_id={app.client_id}"
-            f"&scope={scopes}"
+            f"&scope={scopes_.encode(requested)}"
             f"&redirect_uri={redirect}"
             "&response_type=code"
             f"&force_verify={force}"
             f"&state={state_}"
         )
 
+        analytics: Analytics | None = state.get("analytics")
+        if analytics:
+            analytics.record(app.id, "started")
+
         return Redirect(url)
 
     @litestar.get("/redirect/{uri:str}")
     async def user_redicrect_endpoint(self, request: Request[str, str, State], state: State, uri: str) -> Response[str]:
+        received = time.time()
+
+        limited = await self.limited(request, state, "redirect", uri)
+        if limited:
+            return limited
+
         error = request.query_params.get("error")
 
+        db: Database = state.db
+        analytics: Analytics | None = state.get("analytics")
+
         if error:
+            # Looked up only to count the failure...
+            if analytics:
+                failed = await db.fetch_app_by_uri(uri)
+                if failed:
+                    analytics.record(failed.id, "failed")
+                    capture.application(failed.id)
+
             description = request.query_params.get("error_description")
             return Response(f"Unable to Authenticate: {description}")
 
@@ -100,30 +203,40 @@ class OAuthController(litestar.Controller):
             return Response("Error: Missing state parameter.", status_code=400)
 
         states: ValkeyStore = state.states
-        state_value = await states.get(state_)
+        state_value = await states.get(f"{STATE_PREFIX}{state_}")
 
-        if not state_value:
+        # Values written before states were prefixed are bare strings...
+        try:
+            stored: dict[str, Any] = json.loads(state_value)  # type: ignore
+            matches = stored["state"] == state_
+        except (ValueError, KeyError, TypeError):
             return Response("Error: Incorrect state parameter provided or the request timed-out", status_code=400)
 
-        state_value = state_value.decode()
-        if state_value != state_:
+        if not matches:
             return Response("Error: state values do not match.", status_code=400)
 
         code = request.query_params.get("code")
         if not code:
             return Response("Error: Missing code parameter.", status_code=400)
 
-        await states.delete(state_)
+        await states.delete(f"{STATE_PREFIX}{state_}")
 
-        db: Database = state.db
         app = await db.fetch_app_by_uri(uri)
 
         if not app:
             return Response("Error: This application no longer exists.")
 
-        client: asyncio.Queue[dict[str, str]] | None = state.clients.get(app.id)
-        if not client:
-            return Response("Error: Application can not be authenticated currently. No websocket found.", status_code=404)
+        capture.application(app.id)
+
+        # The whitelist may have changed since the user was sent to Twitch. Still advisory, as above...
+        user: str | None = stored["user"]
+        whitelist: Whitelist = state.whitelist
+
+        if not await whitelist.allowed(app.id, user):
+            if analytics:
+                analytics.record(app.id, "failed")
+
+            return Response("Error: You are not allowed to authenticate with this application.", status_code=403)
 
         domain = config["server"]["domain"]
         redirect = f"{domain}/oauth/redirect/{app.url}"
@@ -132,28 +245,174 @@ class OAuthController(litestar.Controller):
             "code": code,
             "grant_type": "authorization_code",
             "redirect_uri": redirect,
+            "_received": repr(received),
         }
 
-        await client.put(data)
+        # The bot must reject the token unless its 'login' matches, which is what actually enforces the whitelist...
+        if user:
+            data["user"] = user
+
+        relay: Relay = state.relay
+        if not await relay.send(app.id, data):
+            if analytics:
+                analytics.record(app.id, "failed")
+
+            return Response("Error: Application can not be authenticated currently. No websocket found.", status_code=404)
+
+        events: Events = state.events
+        await events.publish(app.user_id, "queued", application_id=app.id)
 
         # TODO: Wait for websocket...
         return Redirect("/oauth/success")
 
+    @litestar.post("/refresh", status_code=200)
+    async def register_refresh_endpoint(
+        self,
+        request: Request[str, str, State],
+        state: State,
+        data: dict[str, Any],
+    ) -> Response[str] | dict[str, str]:
+        refresher: Refresher | None = state.get("refresher")
+        if not refresher:
+            return Response("Token refresh is not enabled on this relay.", status_code=404)
+
+        principal = await self.bot(request, state)
+        if isinstance(principal, Response):
+            return principal
+
+        fields = ("user_id", "client_secret", "refresh_token")
+        missing = [field for field in fields if not data.get(field) or not isinstance(data[field], str)]
+
+        if missing:
+            return Response(f"Missing the following fields: {', '.join(missing)}", status_code=400)
+
+        expires_in = data.get("expires_in")
+        if not isinstance(expires_in, int) or isinstance(expires_in, bool) or expires_in <= 0:
+            return Response("'expires_in' must be a positive number of seconds.", status_code=400)
+
+        expires_at = await refresher.register(
+            principal.application_id,  # type: ignore
+            data["user_id"],
+            client_secret=data["client_secret"],
+            refresh_token=data["refresh_token"],
+            expires_in=expires_in,
+        )
+
+        return {"user_id": data["user_id"], "expires_at": expires_at.isoformat()}
+
+    @litestar.delete("/refresh", status_code=200)
+    async def unregister_refresh_endpoint(
+        self,
+        request: Request[str, str, State],
+        state: State,
+        data: dict[str, Any],
+    ) -> Response[str] | None:
+        refresher: Refresher | None = state.get("refresher")
+        if not refresher:
+            return Response("Token refresh is not enabled on this relay.", status_code=404)
+
+        principal = await self.bot(request, state)
+        if isinstance(principal, Response):
+            return principal
+
+        user_id = data.get("user_id")
+        if not user_id or not isinstance(user_id, str):
+            return Response("Missing 'user_id' field", status_code=400)
+
+        if not await refresher.unregister(principal.application_id, user_id):  # type: ignore
+            return Response("No refresh token is registered for this user.", status_code=404)
+
+        return None
+
     @litestar.get("/success", media_type=litestar.MediaType.HTML)
     async def success_endpoint(self, request: Request[str, str, State]) -> str:
         html = """<div>Success. You can now close this page.</div>"""
         return html
 
-    async def handler(self, queue: asyncio.Queue[dict[str, str]]) -> AsyncGenerator[str]:
+    async def handler(
+        self,
+        connection: Connection,
+        events: Events,
+        batch: BatchT | None = None,
+        analytics: Analytics | None = None,
+    ) -> AsyncGenerator[str]:
+        queue = connection.queue
+        loop = asyncio.get_running_loop()
+
         while True:
             try:
                 data = await queue.get()
             except asyncio.QueueShutDown:
                 break
 
-            json_ = json.dumps(data)
+            data.pop(LOCAL, None)
+            received = [data.pop("_received", None)]
+            encoded = [json.dumps(data)]
+
+            if batch is None:
+                json_ = encoded[0]
+            else:
+                # Whatever else arrives within the window goes out in the same frame, as one JSON array...
+                deadline = loop.time() + batch.get("window", 0.005)
+                size = len(encoded[0])
+
+                while len(encoded) < batch.get("max_messages", 50) and size < batch.get("max_bytes", 65536):
+                    try:
+                        if queue.empty():
+                            async with asyncio.timeout_at(deadline):
+                                data = await queue.get()
+                        else:
+                            data = queue.get_nowait()
+                    except (TimeoutError, asyncio.QueueShutDown):
+                        break
+
+                    data.pop(LOCAL, None)
+                    received.append(data.pop("_received", None))
+                    encoded.append(json.dumps(data))
+                    size += len(encoded[-1]) + 1
+
+                json_ = f"[{','.join(encoded)}]"
+
             yield json_
 
+            connection.sent += len(encoded)
+            connection.last_active = time.time()
+
+            for value in received:
+                if not value:
+                    continue
+
+                latency = connection.last_active - float(value)
+                RELAY_LATENCY.observe(latency, "sent")
+
+                # Only a code handed to the bot's websocket counts, not one queued, parked or dropped on the way...
+                if analytics:
+                    analytics.observe(connection.app_id, latency)
+                    analytics.record(connection.app_id, "completed")
+
+            await events.publish(
+                connection.user_id,
+                "relayed",
+                application_id=connection.app_id,
+                queue_depth=queue.qsize(),
+            )
+
+    async def reject(self, socket: WebSocket[str, str, State], rejection: Rejection) -> None:
+        # A close code is the only way to hand a bot a retry hint, as denial responses can't be customised...
+        reason = {
+            "error": f"Unable to accept websocket: {rejection.reason}",
+            "retry_after": math.ceil(rejection.retry_after),
+        }
+
+        await socket.accept()
+        await socket.close(code=1013, reason=json.dumps(reason))
+
+    async def redirect(self, socket: WebSocket[str, str, State], url: str) -> None:
+        CLUSTER_REDIRECTS.inc("connect")
+
+        await socket.accept()
+        await socket.close(code=REDIRECT, reason=redirect_reason(WRONG_NODE, url))
+
     @litestar.websocket("/connect")
     async def websocket_endpoint(self, socket: WebSocket[str, str, State], state: State) -> None:
         # Litestar won't allow a custom Websocket Denial Response:
@@ -170,31 +429,74 @@ class OAuthController(litestar.Controller):
         if not app_id:
             raise HTTPException({"error": "Missing 'Application-ID' header."}, status_code=400)
 
+        capture.application(app_id)
+
+        # Turned away before the database is touched...
+        cluster: Cluster | None = state.get("cluster")
+        owner = cluster.locate(app_id) if cluster else None
+
+        if owner:
+            return await self.redirect(socket, owner)
+
+        admission: Admission = state.admission
+        rejection = admission.check()
+
+        if rejection:
+            return await self.reject(socket, rejection)
+
         db: Database = state.db
-        user = await db.fetch_user_by_token(auth)
+        cache: AuthCache = state.auth
+        principal = await cache.resolve(db, auth)
 
-        if not user:
+        if not principal:
             raise HTTPException({"error": "Unauthorized. No user matches the provided token."}, status_code=401)
 
-        first = user[0]
-        if first.application_id != app_id:
+        if principal.application_id != app_id:
             raise HTTPException({"error": "Incorrect Application-ID passed."}, status_code=400)
 
-        if app_id in state.clients:
+        rejection = admission.check_user(principal.user_id)
+        if rejection:
+            return await self.reject(socket, rejection)
+
+        relay: Relay = state.relay
+        connection = Connection(app_id, principal.user_id)
+
+        if not await relay.acquire(connection):
             raise HTTPException(
                 {"error": "The Application-ID already has an associated websocket connected."}, status_code=409
             )
 
-        queue: asyncio.Queue[dict[str, str]] = asyncio.Queue()
-        state.clients[app_id] = queue
+        events: Events = state.events
+        versions: Versions = state.versions
+        refresher: Refresher | None = state.get("refresher")
+
+        # Batched frames are a different wire format, so bots opt in and are told the most messages a frame holds...
+        batch = BATCH if BATCH.get("enabled", True) and headers.get("Relay-Batch") else None
+        accept = {"Relay-Batch": str(BATCH.get("max_messages", 50))} if batch is not None else None
+        stream = self.handler(connection, events, batch, state.get("analytics"))
 
         try:
-            await socket.accept()
-            await send_websocket_stream(socket=socket, stream=self.handler(queue), listen_for_disconnect=True)
+            await socket.accept(headers=accept)
+            await versions.bump(principal.user_id)
+
+            if refresher:
+                await refresher.track(app_id)
+
+            await events.publish(principal.user_id, "connected", application_id=app_id)
+            await send_websocket_stream(socket=socket, stream=stream, listen_for_disconnect=True, close=False)
+
+            # Drained and moved websockets are told where to reconnect...
+            if socket.connection_state != "disconnect":
+                await socket.close(code=connection.close_code, reason=connection.close_reason)
         except Exception:
-            state.clients.pop(app_id, None)
+            await relay.release(app_id)
+
+        if refresher:
+            refresher.untrack(app_id)
 
-        state.clients.pop(app_id, None)
+        await relay.release(app_id)
+        await versions.bump(principal.user_id)
+        await events.publish(principal.user_id, "disconnected", application_id=app_id)
 
     @litestar.get("/status")
     async def websocket_status_endpoint(self, request: Request[str, str, State], state: State) -> Redirect | dict[str, bool]:
@@ -209,7 +511,7 @@ class OAuthController(litestar.Controller):
             return Redirect("/")
 
         first = rows[0]
-        client = state.clients.get(first.application_id)
+        relay: Relay = state.relay
 
-        data = {"status": bool(client)}
+        data = {"status": await relay.connected(first.application_id)}
         return data
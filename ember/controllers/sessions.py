@@ -15,29 +15,37 @@ limitations under the License.
 
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
 import secrets
 from typing import TYPE_CHECKING, Any
 
 import asyncpg
 import litestar
-from litestar.response import Redirect, Response
+from litestar.response import Redirect, Response, ServerSentEvent, ServerSentEventMessage
 
+import scopes as scopes_
+from analytics import RESOLUTIONS
 from config import config
-from types_.models import UserRecordDT  # noqa: TC001 [Litestar uses this at runtime]
+from metrics import TWITCH_ERRORS, TWITCH_LATENCY
+from models import ApplicationRecord, UserRecord  # noqa: TC001 [Litestar uses this at runtime]
 
 
 if TYPE_CHECKING:
-    import asyncio
+    from collections.abc import AsyncGenerator
 
     from aiohttp import ClientSession
     from litestar import Request
     from litestar.datastructures import State
     from litestar.stores.valkey import ValkeyStore
 
-    from models import UserRecord
-
+    from ..analytics import Analytics
+    from ..auth import AuthCache
     from ..database import Database
+    from ..events import Events
+    from ..relay import Relay
+    from ..versions import Versions
 
 
 __all__ = ("SessionsController",)
@@ -49,6 +57,9 @@ TWITCH_OAUTH_URL = "https://id.twitch.tv/oauth2/authorize"
 TWITCH_TOKEN_URL = "https://id.twitch.tv/oauth2/token"
 TWITCH_VALIDATE_URL = "https://id.twitch.tv/oauth2/validate"
 
+# A day of minutes, and more hours or days than are kept...
+MAX_BUCKETS = 1440
+
 
 class SessionsController(litestar.Controller):
     path = "/users"
@@ -57,6 +68,12 @@ class SessionsController(litestar.Controller):
     def headers(self) -> dict[str, str]:
         return {"Content-Type": "application/x-www-form-urlencoded"}
 
+    def scope_policy(self, data: dict[str, Any], field: str) -> str | None:
+        value = data.get(field) or ""
+        parsed = scopes_.parse(value) if isinstance(value, str) else None
+
+        return None if parsed is None else scopes_.canonical(parsed)
+
     @litestar.get("/login")
     async def login_endpoint(self, request: Request[str, str, State], state: State) -> Redirect:
         if request.session:
@@ -133,55 +150,118 @@ class SessionsController(litestar.Controller):
 
         sess: ClientSession = state.aiohttp
 
-        async with sess.post(TWITCH_TOKEN_URL, data=sdata, headers=self.headers) as resp:
-            if resp.status > 200:
-                return Response("An internal error occurred. Try again.", status_code=500)
+        with TWITCH_LATENCY.time("token", span="twitch"):
+            async with sess.post(TWITCH_TOKEN_URL, data=sdata, headers=self.headers) as resp:
+                if resp.status > 200:
+                    TWITCH_ERRORS.inc("token")
+                    return Response("An internal error occurred. Try again.", status_code=500)
 
-            data = await resp.json()
-            token: str = data["access_token"]
+                data = await resp.json()
+                token: str = data["access_token"]
 
         validate_headers = {"Authorization": f"OAuth {token}"}
-        async with sess.get(TWITCH_VALIDATE_URL, headers=validate_headers) as resp:
-            if resp.status > 200:
-                return Response("An internal error occurred. Try again.", status_code=500)
+        with TWITCH_LATENCY.time("validate", span="twitch"):
+            async with sess.get(TWITCH_VALIDATE_URL, headers=validate_headers) as resp:
+                if resp.status > 200:
+                    TWITCH_ERRORS.inc("validate")
+                    return Response("An internal error occurred. Try again.", status_code=500)
 
-            data = await resp.json()
-            user_id: str = data["user_id"]
-            user_login: str = data["login"]
+                data = await resp.json()
+                user_id: str = data["user_id"]
+                user_login: str = data["login"]
 
         if not user_id:
             Response("An internal error occurred. Try again.", status_code=500)
 
         db: Database = state.db
-        data: UserRecord = await db.create_user(user_id, user_login)
+        user: UserRecord = await db.create_user(user_id, user_login)
+
+        versions: Versions = state.versions
+        await versions.bump(user.id)
 
-        request.set_session(data.to_dict(include_token=False))  # type: ignore
+        request.set_session(user.to_dict(include_token=False))  # type: ignore
         return Redirect("/")
 
     @litestar.get("/@me")
-    async def current_user_endpoint(self, request: Request[str, str, State], state: State) -> dict[str, Any] | None:
+    async def current_user_endpoint(
+        self,
+        request: Request[str, str, State],
+        state: State,
+    ) -> Response[dict[str, Any] | None] | None:
         if not request.session:
             return None
 
+        # The version is read before the user so a change in between can only ever invalidate the ETag...
+        user_id: int = request.session["id"]
+        versions: Versions = state.versions
+        etag = versions.etag(user_id, await versions.get(user_id))
+
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if versions.matches(request.headers.get("If-None-Match"), etag):
+            return Response(None, status_code=304, headers=headers)
+
         db: Database = state.db
-        rows = await db.fetch_user_by_id(request.session["id"])
+        rows = await db.fetch_user_by_id(user_id)
 
         if not rows:
             request.clear_session()
             return None
 
         first = rows[0]
-        client = state.clients.get(first.application_id)
+        relay: Relay = state.relay
 
         data: dict[str, Any] = {
             "id": first.id,
             "twitch_id": first.twitch_id,
             "name": first.name,
-            "applications": [app.to_dict() for app in rows if app.application_id is not None],
-            "status": bool(client),
+            "applications": [row.application for row in rows if row.application_id is not None],
+            "status": await relay.connected(first.application_id),
         }
 
-        return data
+        return Response(data, headers=headers)
+
+    async def event_stream(
+        self,
+        events: Events,
+        relay: Relay,
+        user_id: int,
+        applications: list[str],
+    ) -> AsyncGenerator[ServerSentEventMessage]:
+        async with events.listen(user_id) as queue:
+            # Subscribed before taking the snapshot so no change can fall between the two...
+            for app_id in applications:
+                status = {"event": "status", "application_id": app_id, "connected": await relay.connected(app_id)}
+                yield ServerSentEventMessage(data=json.dumps(status), event="status")
+
+            while True:
+                try:
+                    async with asyncio.timeout(15):
+                        event = await queue.get()
+                except TimeoutError:
+                    yield ServerSentEventMessage(comment="ping")
+                    continue
+
+                yield ServerSentEventMessage(data=json.dumps(event), event=event["event"])
+
+    @litestar.get("/@me/events")
+    async def events_endpoint(self, request: Request[str, str, State], state: State) -> ServerSentEvent | Response[str]:
+        if not request.session:
+            return Response("Unauthorized", status_code=401)
+
+        db: Database = state.db
+        rows = await db.fetch_user_by_id(request.session["id"])
+
+        if not rows:
+            request.clear_session()
+            return Response("Unauthorized", status_code=401)
+
+        first = rows[0]
+        applications = list(dict.fromkeys(row.application_id for row in rows if row.application_id is not None))
+
+        events: Events = state.events
+        relay: Relay = state.relay
+
+        return ServerSentEvent(self.event_stream(events, relay, first.id, applications))
 
     @litestar.post("/apps")
     async def create_app_endpoint(
@@ -211,6 +291,12 @@ class SessionsController(litestar.Controller):
         elif len(client_id) > 50:
             return Response("Invalid client_id passed.")
 
+        scopes = self.scope_policy(data, "scopes")
+        bot_scopes = self.scope_policy(data, "bot_scopes")
+
+        if scopes is None or bot_scopes is None:
+            return Response("Invalid scopes passed.", status_code=400)
+
         db: Database = state.db
         rows = await db.fetch_user_by_id(request.session["id"])
 
@@ -223,18 +309,67 @@ class SessionsController(litestar.Controller):
             return Response("You currently have too many applications.", status_code=409)
 
         try:
-            new_row = await db.create_app(first.id, name=name, client_id=client_id)
+            new_row = await db.create_app(first.id, name=name, client_id=client_id, scopes=scopes, bot_scopes=bot_scopes)
         except asyncpg.UniqueViolationError:
             return Response("An application with the provided Client-ID already exists.", status_code=403)
 
+        # A bot that tried to connect before the application existed is cached without one...
+        cache: AuthCache = state.auth
+        await cache.invalidate(first.token)
+
+        versions: Versions = state.versions
+        await versions.bump(first.id)
+
         resp: dict[str, Any] = {
             "id": first.id,
             "twitch_id": first.twitch_id,
             "name": first.name,
-            "applications": [new_row.to_dict()],
+            "applications": [new_row],
         }
         return resp
 
+    @litestar.patch("/apps")
+    async def update_app_endpoint(
+        self,
+        request: Request[str, str, State],
+        state: State,
+        data: dict[str, str],
+    ) -> Response[str] | ApplicationRecord:
+        if not request.session:
+            return Response("Unauthorized", status_code=401)
+
+        if not data:
+            return Response("Missing application data", status_code=400)
+
+        application_id = data.get("application_id")
+
+        if not application_id:
+            return Response("Missing 'application_id' field", status_code=400)
+
+        scopes = self.scope_policy(data, "scopes")
+        bot_scopes = self.scope_policy(data, "bot_scopes")
+
+        if scopes is None or bot_scopes is None:
+            return Response("Invalid scopes passed.", status_code=400)
+
+        db: Database = state.db
+        rows = await db.fetch_user_by_id(request.session["id"])
+
+        if not rows:
+            request.clear_session()
+            return Response("Unauthorized", status_code=401)
+
+        first = rows[0]
+        if first.application_id != application_id:
+            return Response("Incorrect 'application_id' passed. No matching application", status_code=400)
+
+        row = await db.update_app_scopes(application_id, scopes=scopes, bot_scopes=bot_scopes)
+
+        versions: Versions = state.versions
+        await versions.bump(first.id)
+
+        return row
+
     @litestar.delete("/apps", status_code=200)
     async def delete_app_endpoint(
         self,
@@ -269,12 +404,53 @@ class SessionsController(litestar.Controller):
         except Exception as e:
             return Response(f"Unexpected error occurred. Try again later: {e}", status_code=500)
 
-        queue: asyncio.Queue[Any] | None = state.clients.get(first.application_id, None)
-        if queue:
-            queue.shutdown(immediate=True)
+        versions: Versions = state.versions
+        await versions.bump(first.id)
+
+        cache: AuthCache = state.auth
+        await cache.invalidate(first.token)
+
+        relay: Relay = state.relay
+        await relay.disconnect(first.application_id)
+
+    @litestar.get("/apps/stats")
+    async def app_stats_endpoint(
+        self,
+        request: Request[str, str, State],
+        state: State,
+        resolution: str = "hour",
+        count: int = 24,
+    ) -> Response[str] | dict[str, Any]:
+        if not request.session:
+            return Response("Unauthorized", status_code=401)
+
+        analytics: Analytics | None = state.get("analytics")
+        if not analytics:
+            return Response("Analytics are not enabled on this relay.", status_code=404)
+
+        if resolution not in RESOLUTIONS:
+            return Response(f"'resolution' must be one of: {', '.join(RESOLUTIONS)}", status_code=400)
+
+        if not 1 <= count <= MAX_BUCKETS:
+            return Response(f"'count' must be between 1 and {MAX_BUCKETS}.", status_code=400)
+
+        db: Database = state.db
+        rows = await db.fetch_user_by_id(request.session["id"])
+
+        if not rows:
+            request.clear_session()
+            return Response("Unauthorized", status_code=401)
+
+        application_id = rows[0].application_id
+        if application_id is None:
+            return Response("You do not have an application.", status_code=404)
+
+        # Buckets are only as current as each worker's last flush...
+        stats = await analytics.fetch(application_id, resolution, count)
+        return {"application_id": application_id, **stats}
 
     @litestar.post("/token")
-    async def new_token_endpoint(self, request: Request[str, str, State], state: State) -> Redirect | UserRecordDT:
+    async def new_token_endpoint(self, request: Request[str, str, State], state: State) -> Redirect | UserRecord:
         if not request.session:
             return Redirect("/")
 
@@ -288,8 +464,13 @@ class SessionsController(litestar.Controller):
         user = rows[0]
         new = await db.update_token(user.id)
 
-        queue: asyncio.Queue[Any] | None = state.clients.get(user.application_id, None)
-        if queue:
-            queue.shutdown(immediate=True)
+        cache: AuthCache = state.auth
+        await cache.invalidate(user.token)
+
+        versions: Versions = state.versions
+        await versions.bump(user.id)
+
+        relay: Relay = state.relay
+        await relay.disconnect(user.application_id)
 
-        return new.to_dict()
+        return new
@@ -0,0 +1,154 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any
+
+import litestar
+from litestar.response import Response
+
+from whitelist import Whitelist
+
+
+if TYPE_CHECKING:
+    from litestar import Request
+    from litestar.datastructures import State
+
+    from ..database import Database
+
+
+__all__ = ("WhitelistController",)
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = 100_000
+MAX_ENTRY_LENGTH = 64
+
+
+class WhitelistController(litestar.Controller):
+    path = "/users/apps/whitelist"
+
+    async def owned(self, request: Request[str, str, State], state: State, application_id: Any) -> Response[str] | None:
+        if not request.session:
+            return Response("Unauthorized", status_code=401)
+
+        if not application_id or not isinstance(application_id, str):
+            return Response("Missing 'application_id' field", status_code=400)
+
+        db: Database = state.db
+        rows = await db.fetch_user_by_id(request.session["id"])
+
+        if not rows:
+            request.clear_session()
+            return Response("Unauthorized", status_code=401)
+
+        if rows[0].application_id != application_id:
+            return Response("Incorrect 'application_id' passed. No matching application", status_code=400)
+
+        return None
+
+    def entries(self, data: dict[str, Any]) -> list[str] | Response[str]:
+        allowed = data.get("allowed")
+
+        if not isinstance(allowed, list) or not all(isinstance(entry, str) for entry in allowed):  # type: ignore
+            return Response("The 'allowed' field must be a list of Twitch user IDs or logins.", status_code=400)
+
+        if len(allowed) > MAX_ENTRIES:  # type: ignore
+            return Response(f"The whitelist cannot contain more than {MAX_ENTRIES} entries.", status_code=400)
+
+        entries = list(dict.fromkeys(Whitelist.normalize(entry) for entry in allowed))  # type: ignore
+        if not all(0 < len(entry) <= MAX_ENTRY_LENGTH for entry in entries):
+            return Response(f"Entries must be between 1 and {MAX_ENTRY_LENGTH} characters long.", status_code=400)
+
+        return entries
+
+    @litestar.get("/")
+    async def fetch_whitelist_endpoint(
+        self,
+        request: Request[str, str, State],
+        state: State,
+        application_id: str,
+    ) -> Response[str] | dict[str, Any]:
+        denied = await self.owned(request, state, application_id)
+        if denied:
+            return denied
+
+        db: Database = state.db
+        allowed = await db.fetch_whitelist(application_id)
+
+        return {"application_id": application_id, "allowed": sorted(allowed)}
+
+    @litestar.put("/")
+    async def replace_whitelist_endpoint(
+        self,
+        request: Request[str, str, State],
+        state: State,
+        data: dict[str, Any],
+    ) -> Response[str] | dict[str, int]:
+        denied = await self.owned(request, state, data.get("application_id"))
+        if denied:
+            return denied
+
+        entries = self.entries(data)
+        if isinstance(entries, Response):
+            return entries
+
+        db: Database = state.db
+        count = await db.replace_whitelist(data["application_id"], entries)
+
+        return {"count": count}
+
+    @litestar.post("/", status_code=200)
+    async def add_whitelist_endpoint(
+        self,
+        request: Request[str, str, State],
+        state: State,
+        data: dict[str, Any],
+    ) -> Response[str] | dict[str, int]:
+        denied = await self.owned(request, state, data.get("application_id"))
+        if denied:
+            return denied
+
+        entries = self.entries(data)
+        if isinstance(entries, Response):
+            return entries
+
+        db: Database = state.db
+        added = await db.add_whitelist(data["application_id"], entries)
+
+        return {"added": added}
+
+    @litestar.delete("/", status_code=200)
+    async def remove_whitelist_endpoint(
+        self,
+        request: Request[str, str, State],
+        state: State,
+        data: dict[str, Any],
+    ) -> Response[str] | dict[str, int]:
+        denied = await self.owned(request, state, data.get("application_id"))
+        if denied:
+            return denied
+
+        entries = self.entries(data)
+        if isinstance(entries, Response):
+            return entries
+
+        db: Database = state.db
+        removed = await db.remove_whitelist(data["application_id"], entries)
+
+        return {"removed": removed}
@@ -14,13 +14,18 @@ limitations under the License.
 """
 
 import asyncio
+import datetime
+import json
 import logging
 import secrets
+from collections.abc import Iterable
 from typing import TYPE_CHECKING, Any, Self
 
 import asyncpg
 
+from metrics import DATABASE_LATENCY, timed
 from models import *
+from whitelist import CHANNEL as WHITELIST_CHANNEL
 
 
 LOGGER: logging.Logger = logging.getLogger(__name__)
@@ -51,7 +56,12 @@ class Database:
 
     async def setup(self) -> None:
         with open("SCHEMA.sql") as fp:
-            await self.pool.execute(fp.read())
+            schema = fp.read()
+
+        # Workers start concurrently; serialize schema creation across them...
+        async with self.pool.acquire() as connection, connection.transaction():
+            await connection.execute("SELECT pg_advisory_xact_lock(4141)")
+            await connection.execute(schema)
 
     async def close(self) -> None:
         try:
@@ -76,45 +86,54 @@ class Database:
         # Future proofing
         return secrets.token_urlsafe(64)
 
+    @timed(DATABASE_LATENCY, "create_user", span="db")
     async def create_user(self, twitch_id: str, twitch_name: str) -> UserRecord:
         query = """
         INSERT INTO users (twitch_id, token, name) VALUES($1, $2, $3)
         ON CONFLICT (twitch_id) DO UPDATE SET name = $3
-        RETURNING *
+        RETURNING id, twitch_id, name, token
         """
 
         token = self.generate_token()
 
         async with self.pool.acquire() as connection:
-            row: UserRecord | None = await connection.fetchrow(query, twitch_id, token, twitch_name, record_class=UserRecord)
+            row = await connection.fetchrow(query, twitch_id, token, twitch_name)
 
         assert row
-        return row
+        return UserRecord.from_record(row)
 
+    @timed(DATABASE_LATENCY, "update_token", span="db")
     async def update_token(self, user_id: int) -> UserRecord:
-        query = """UPDATE users SET token = $2 WHERE id = $1 RETURNING *"""
+        query = """UPDATE users SET token = $2 WHERE id = $1 RETURNING id, twitch_id, name, token"""
 
         token = self.generate_token()
 
         async with self.pool.acquire() as connection:
-            row: UserRecord | None = await connection.fetchrow(query, user_id, token, record_class=UserRecord)
+            row = await connection.fetchrow(query, user_id, token)
 
         assert row
-        return row
-
-    async def create_app(self, user_id: int, *, name: str, client_id: str) -> ApplicationRecord:
+        return UserRecord.from_record(row)
+
+    @timed(DATABASE_LATENCY, "create_app", span="db")
+    async def create_app(
+        self,
+        user_id: int,
+        *,
+        name: str,
+        client_id: str,
+        scopes: str = "",
+        bot_scopes: str = "",
+    ) -> ApplicationRecord:
         query = """
         INSERT INTO applications(id, user_id, client_id, name, url, scopes, bot_scopes) VALUES($1, $2, $3, $4, $5, $6, $7)
-        RETURNING *
+        RETURNING id, user_id, client_id, name, url, scopes, bot_scopes, auths
         """
 
         id_ = secrets.token_hex(32)
         url = secrets.token_hex(10)
-        scopes = ""
-        bot_scopes = ""
 
         async with self.pool.acquire() as connection:
-            row: ApplicationRecord | None = await connection.fetchrow(
+            row = await connection.fetchrow(
                 query,
                 id_,
                 user_id,
@@ -123,113 +142,290 @@ class Database:
                 url,
                 scopes,
                 bot_scopes,
-                record_class=ApplicationRecord,
             )
 
         assert row
-        return row
+        return ApplicationRecord.from_record(row)
+
+    @timed(DATABASE_LATENCY, "update_app_scopes", span="db")
+    async def update_app_scopes(self, id_: str, *, scopes: str, bot_scopes: str) -> ApplicationRecord:
+        query = """
+        UPDATE applications SET scopes = $2, bot_scopes = $3 WHERE id = $1
+        RETURNING id, user_id, client_id, name, url, scopes, bot_scopes, auths
+        """
 
+        async with self.pool.acquire() as connection:
+            row = await connection.fetchrow(
+                query,
+                id_,
+                scopes,
+                bot_scopes,
+            )
+
+        assert row
+        return ApplicationRecord.from_record(row)
+
+    @timed(DATABASE_LATENCY, "delete_app", span="db")
     async def delete_app(self, id_: str) -> None:
         query = """
         DELETE FROM applications WHERE id = $1
         """
 
-        async with self.pool.acquire() as connection:
+        async with self.pool.acquire() as connection, connection.transaction():
+            await connection.execute("DELETE FROM whitelist WHERE application_id = $1", id_)
+            await connection.execute("DELETE FROM refresh_tokens WHERE application_id = $1", id_)
+            await connection.execute("DELETE FROM application_secrets WHERE application_id = $1", id_)
             await connection.execute(query, id_)
+            await self._notify_whitelist(connection, id_, "reload")
+
+    async def _notify_whitelist(
+        self,
+        connection: "asyncpg.pool.PoolConnectionProxy[asyncpg.Record]",
+        id_: str,
+        op: str,
+        allowed: list[str] | None = None,
+    ) -> None:
+        payload = json.dumps({"op": op, "application_id": id_, "allowed": allowed or []})
+
+        # NOTIFY payloads are limited to 8000 bytes; listeners reload the whole list instead...
+        if len(payload) > 7900:
+            payload = json.dumps({"op": "reload", "application_id": id_, "allowed": []})
+
+        # Delivered to listeners when the transaction commits...
+        await connection.execute("SELECT pg_notify($1, $2)", WHITELIST_CHANNEL, payload)
+
+    @timed(DATABASE_LATENCY, "fetch_whitelist", span="db")
+    async def fetch_whitelist(self, id_: str) -> list[str]:
+        query = """
+        SELECT allowed FROM whitelist WHERE application_id = $1
+        """
+
+        async with self.pool.acquire() as connection:
+            rows = await connection.fetch(query, id_)
+
+        return [row["allowed"] for row in rows]
+
+    @timed(DATABASE_LATENCY, "add_whitelist", span="db")
+    async def add_whitelist(self, id_: str, allowed: Iterable[str]) -> int:
+        query = """
+        INSERT INTO whitelist (application_id, allowed)
+        SELECT $1, allowed FROM whitelist_import
+        ON CONFLICT DO NOTHING
+        RETURNING allowed
+        """
+
+        async with self.pool.acquire() as connection, connection.transaction():
+            await connection.execute("CREATE TEMPORARY TABLE whitelist_import (allowed TEXT NOT NULL) ON COMMIT DROP")
+            await connection.copy_records_to_table("whitelist_import", records=[(entry,) for entry in allowed])
+
+            rows = await connection.fetch(query, id_)
+            added = [row["allowed"] for row in rows]
+
+            if added:
+                await self._notify_whitelist(connection, id_, "add", added)
+
+        return len(added)
+
+    @timed(DATABASE_LATENCY, "replace_whitelist", span="db")
+    async def replace_whitelist(self, id_: str, allowed: Iterable[str]) -> int:
+        records = [(id_, entry) for entry in allowed]
+
+        async with self.pool.acquire() as connection, connection.transaction():
+            await connection.execute("DELETE FROM whitelist WHERE application_id = $1", id_)
+            await connection.copy_records_to_table("whitelist", records=records, columns=["application_id", "allowed"])
+            await self._notify_whitelist(connection, id_, "reload")
+
+        return len(records)
+
+    @timed(DATABASE_LATENCY, "remove_whitelist", span="db")
+    async def remove_whitelist(self, id_: str, allowed: Iterable[str]) -> int:
+        query = """
+        DELETE FROM whitelist WHERE application_id = $1 AND allowed = ANY($2::text[])
+        RETURNING allowed
+        """
 
+        async with self.pool.acquire() as connection, connection.transaction():
+            rows = await connection.fetch(query, id_, list(allowed))
+            removed = [row["allowed"] for row in rows]
+
+            if removed:
+                await self._notify_whitelist(connection, id_, "remove", removed)
+
+        return len(removed)
+
+    @timed(DATABASE_LATENCY, "fetch_app_by_uri", span="db")
     async def fetch_app_by_uri(self, uri: str) -> ApplicationRecord | None:
         query = """
-        SELECT * FROM applications WHERE url = $1
+        SELECT id, user_id, client_id, name, url, scopes, bot_scopes, auths FROM applications WHERE url = $1
         """
 
         async with self.pool.acquire() as connection:
-            row: ApplicationRecord | None = await connection.fetchrow(query, uri, record_class=ApplicationRecord)
+            row = await connection.fetchrow(query, uri)
 
-        return row
+        return ApplicationRecord.from_record(row) if row else None
 
+    @timed(DATABASE_LATENCY, "fetch_user_by_token", span="db")
     async def fetch_user_by_token(self, token: str) -> list[FullUserRecord]:
         query = """
         SELECT
-            u.*,
+            u.id,
+            u.twitch_id,
+            u.name,
+            u.token,
             a.id AS application_id,
             a.client_id,
             a.name AS application_name,
             a.scopes,
             a.bot_scopes,
             a.auths,
-            a.url,
-            w.allowed
+            a.url
         FROM
             users u
         LEFT JOIN
             applications a ON u.id = a.user_id
-        LEFT JOIN
-            whitelist w ON a.id = w.application_id
         WHERE
             u.token = $1
         ORDER BY
-            a.id, w.allowed;
+            a.id;
         """
 
         async with self.pool.acquire() as connection:
-            rows: list[FullUserRecord] = await connection.fetch(query, token, record_class=FullUserRecord)
+            rows = await connection.fetch(query, token)
 
-        return rows
+        return [FullUserRecord.from_record(row) for row in rows]
 
+    @timed(DATABASE_LATENCY, "fetch_user_by_id", span="db")
     async def fetch_user_by_id(self, user_id: int) -> list[FullUserRecord]:
         query = """
         SELECT
-            u.*,
+            u.id,
+            u.twitch_id,
+            u.name,
+            u.token,
             a.id AS application_id,
             a.client_id,
             a.name AS application_name,
             a.scopes,
             a.bot_scopes,
             a.auths,
-            a.url,
-            w.allowed
+            a.url
         FROM
             users u
         LEFT JOIN
             applications a ON u.id = a.user_id
-        LEFT JOIN
-            whitelist w ON a.id = w.application_id
         WHERE
             u.id = $1
         ORDER BY
-            a.id, w.allowed;
+            a.id;
         """
 
         async with self.pool.acquire() as connection:
-            rows: list[FullUserRecord] = await connection.fetch(query, user_id, record_class=FullUserRecord)
+            rows = await connection.fetch(query, user_id)
 
-        return rows
+        return [FullUserRecord.from_record(row) for row in rows]
 
+    @timed(DATABASE_LATENCY, "fetch_user_by_twitch", span="db")
     async def fetch_user_by_twitch(self, twitch_id: str) -> list[FullUserRecord]:
         query = """
         SELECT
-            u.*,
+            u.id,
+            u.twitch_id,
+            u.name,
+            u.token,
             a.id AS application_id,
             a.client_id,
             a.name AS application_name,
             a.scopes,
             a.bot_scopes,
             a.auths,
-            a.url,
-            w.allowed
+            a.url
         FROM
             users u
         LEFT JOIN
             applications a ON u.id = a.user_id
-        LEFT JOIN
-            whitelist w ON a.id = w.application_id
         WHERE
             u.twitch_id = $1
         ORDER BY
-            a.id, w.allowed;
+            a.id;
+        """
+
+        async with self.pool.acquire() as connection:
+            rows = await connection.fetch(query, twitch_id)
+
+        return [FullUserRecord.from_record(row) for row in rows]
+
+    @timed(DATABASE_LATENCY, "register_refresh", span="db")
+    async def register_refresh(
+        self,
+        id_: str,
+        user_id: str,
+        *,
+        secret: bytes,
+        token: bytes,
+        expires_at: datetime.datetime,
+    ) -> None:
+        async with self.pool.acquire() as connection, connection.transaction():
+            await connection.execute(
+                """
+                INSERT INTO application_secrets (application_id, secret) VALUES ($1, $2)
+                ON CONFLICT (application_id) DO UPDATE SET secret = $2
+                """,
+                id_,
+                secret,
+            )
+            await connection.execute(
+                """
+                INSERT INTO refresh_tokens (application_id, user_id, token, expires_at) VALUES ($1, $2, $3, $4)
+                ON CONFLICT (application_id, user_id) DO UPDATE SET token = $3, expires_at = $4
+                """,
+                id_,
+                user_id,
+                token,
+                expires_at,
+            )
+
+    @timed(DATABASE_LATENCY, "update_refresh", span="db")
+    async def update_refresh(self, id_: str, user_id: str, *, token: bytes, expires_at: datetime.datetime) -> None:
+        query = """
+        UPDATE refresh_tokens SET token = $3, expires_at = $4 WHERE application_id = $1 AND user_id = $2
+        """
+
+        async with self.pool.acquire() as connection:
+            await connection.execute(query, id_, user_id, token, expires_at)
+
+    @timed(DATABASE_LATENCY, "delete_refresh", span="db")
+    async def delete_refresh(self, id_: str, user_id: str) -> bool:
+        query = """
+        DELETE FROM refresh_tokens WHERE application_id = $1 AND user_id = $2
+        """
+
+        async with self.pool.acquire() as connection:
+            status = await connection.execute(query, id_, user_id)
+
+        return status != "DELETE 0"
+
+    @timed(DATABASE_LATENCY, "fetch_refresh_expiries", span="db")
+    async def fetch_refresh_expiries(self, id_: str, user_id: str | None = None) -> list[tuple[str, datetime.datetime]]:
+        query = """
+        SELECT user_id, expires_at FROM refresh_tokens WHERE application_id = $1 AND ($2::text IS NULL OR user_id = $2)
+        """
+
+        async with self.pool.acquire() as connection:
+            rows = await connection.fetch(query, id_, user_id)
+
+        return [(row["user_id"], row["expires_at"]) for row in rows]
+
+    @timed(DATABASE_LATENCY, "fetch_refresh", span="db")
+    async def fetch_refresh(self, id_: str, user_id: str) -> RefreshRecord | None:
+        query = """
+        SELECT r.application_id, r.user_id, a.client_id, s.secret, r.token, r.expires_at
+        FROM refresh_tokens r
+        JOIN applications a ON a.id = r.application_id
+        JOIN application_secrets s ON s.application_id = r.application_id
+        WHERE r.application_id = $1 AND r.user_id = $2
         """
 
         async with self.pool.acquire() as connection:
-            rows: list[FullUserRecord] = await connection.fetch(query, twitch_id, record_class=FullUserRecord)
+            row = await connection.fetchrow(query, id_, user_id)
 
-        return rows
+        return RefreshRecord.from_record(row) if row else None
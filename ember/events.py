@@ -0,0 +1,91 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import json
+import logging
+from typing import TYPE_CHECKING, Any
+
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncGenerator
+
+    from relay import Relay
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("Events",)
+
+
+class Events:
+    """Fans out status events for a user's applications to every dashboard they have open.
+
+    Events are published to a channel per user, so they reach listeners on any worker.
+    A worker only subscribes to a user's channel while it has at least one listener for that user.
+    """
+
+    def __init__(self, relay: Relay, *, backlog: int = 100) -> None:
+        self.relay = relay
+        self.backlog = backlog
+        self.listeners: dict[int, set[asyncio.Queue[dict[str, Any]]]] = {}
+
+    @staticmethod
+    def channel(user_id: int) -> str:
+        return f"events:user:{user_id}"
+
+    async def publish(self, user_id: int, event: str, **data: Any) -> None:
+        payload = json.dumps({"event": event, **data})
+
+        try:
+            await self.relay.client.publish(self.channel(user_id), payload)  # type: ignore
+        except Exception as e:
+            LOGGER.warning("Unable to publish %s event for user %s: %s", event, user_id, e)
+
+    @contextlib.asynccontextmanager
+    async def listen(self, user_id: int) -> AsyncGenerator[asyncio.Queue[dict[str, Any]]]:
+        queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=self.backlog)
+
+        listeners = self.listeners.setdefault(user_id, set())
+        listeners.add(queue)
+
+        if len(listeners) == 1:
+            await self.relay.subscribe(self.channel(user_id), functools.partial(self._dispatch, user_id))
+
+        try:
+            yield queue
+        finally:
+            listeners.discard(queue)
+
+            if not listeners:
+                del self.listeners[user_id]
+                await self.relay.unsubscribe(self.channel(user_id))
+
+                # A new listener may have subscribed while we were unsubscribing...
+                if user_id in self.listeners:
+                    await self.relay.subscribe(self.channel(user_id), functools.partial(self._dispatch, user_id))
+
+    def _dispatch(self, user_id: int, event: dict[str, Any]) -> None:
+        for queue in self.listeners.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A dashboard that can't keep up only misses intermediate states...
+                pass
@@ -0,0 +1,84 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import ipaddress
+import logging
+import secrets
+from typing import TYPE_CHECKING, Any
+
+from litestar.exceptions import PermissionDeniedException
+
+
+if TYPE_CHECKING:
+    from litestar.connection import ASGIConnection
+    from litestar.handlers.base import BaseRouteHandler
+
+    from types_.config import DebugT, MetricsT
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("AdminGuard",)
+
+
+class AdminGuard:
+    """A Litestar guard for operator endpoints, configured by a section with ``token`` and ``allow``.
+
+    By default either a matching bearer token or a client address within one of the allowed networks grants
+    access. With ``require_token`` the token is always needed, and ``allow``, when set, narrows where it is
+    accepted from. Client addresses are only as trustworthy as ``server.forwarded_allow_ips``.
+    """
+
+    __slots__ = ("allowed", "name", "require_token", "token")
+
+    def __init__(self, name: str, settings: MetricsT | DebugT, *, require_token: bool = False) -> None:
+        self.name = name
+        self.token = settings.get("token")
+        self.allowed = [ipaddress.ip_network(net, strict=False) for net in settings.get("allow", [])]
+        self.require_token = require_token
+
+        if require_token and not self.token and settings.get("enabled", False):
+            LOGGER.warning("The %s endpoints need a token and none is configured; every request will be refused.", name)
+
+    def __repr__(self) -> str:
+        return f"AdminGuard(name={self.name}, require_token={self.require_token})"
+
+    def __call__(self, connection: ASGIConnection[Any, Any, Any, Any], _: BaseRouteHandler) -> None:
+        if not self.permitted(connection):
+            raise PermissionDeniedException("Forbidden")
+
+    def authenticated(self, connection: ASGIConnection[Any, Any, Any, Any]) -> bool:
+        auth = connection.headers.get("Authorization", "")
+        return bool(self.token) and secrets.compare_digest(auth.removeprefix("Bearer "), self.token)  # type: ignore
+
+    def addressed(self, connection: ASGIConnection[Any, Any, Any, Any]) -> bool:
+        if not connection.client:
+            return False
+
+        try:
+            address = ipaddress.ip_address(connection.client.host)
+        except ValueError:
+            return False
+
+        return any(address in net for net in self.allowed)
+
+    def permitted(self, connection: ASGIConnection[Any, Any, Any, Any]) -> bool:
+        if not self.require_token:
+            return self.authenticated(connection) or self.addressed(connection)
+
+        return self.authenticated(connection) and (not self.allowed or self.addressed(connection))
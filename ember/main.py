@@ -15,6 +15,7 @@ limitations under the License.
 
 import asyncio
 import logging
+from typing import Any
 
 import uvicorn
 
@@ -25,6 +26,23 @@ from config import config as config
 LOGGER: logging.Logger = logging.getLogger(__name__)
 
 
+# uvicorn options applied per server.profile; server.tuning overrides individual values...
+PROFILES: dict[str, dict[str, Any]] = {
+    "default": {
+        "loop": "asyncio",
+    },
+    "performance": {
+        "loop": "uvloop",
+        "http": "httptools",
+        "ws": "websockets-sansio",
+        "backlog": 4096,
+        "limit_concurrency": 16384,
+        "timeout_keep_alive": 15,
+        "ws_max_queue": 16,
+    },
+}
+
+
 def create_app() -> App:
     app = App()
     return app
@@ -33,22 +51,44 @@ def create_app() -> App:
 def main() -> None:
     host = config["server"]["host"]
     port = config["server"]["port"]
-
-    async def runner() -> None:
-        conf = uvicorn.Config(
+    workers = config["server"].get("workers", 1)
+    profile = config["server"].get("profile", "default")
+
+    options: dict[str, Any] = {
+        "host": host,
+        "port": port,
+        "proxy_headers": True,
+        # X-Forwarded-For is only believed from these, so client addresses can be trusted for access and rate limits...
+        "forwarded_allow_ips": config["server"].get("forwarded_allow_ips", "127.0.0.1"),
+        "factory": True,
+        "timeout_graceful_shutdown": config["server"].get("graceful_timeout"),
+        **PROFILES[profile],
+        **config["server"].get("tuning", {}),
+    }
+
+    # websocket.compression configures permessage-deflate through our subclass of the websockets-sansio protocol...
+    if options.get("ws", "auto") in ("auto", "websockets-sansio"):
+        options["ws"] = "compression:DeflateProtocol"
+
+    if workers > 1:
+        # The supervisor binds once and pre-forks workers onto the shared socket.
+        # Workers exit gracefully after max_requests and are replaced; SIGHUP restarts them one at a time...
+        uvicorn.run(
             "main:create_app",
-            host=host,
-            port=port,
-            proxy_headers=True,
-            forwarded_allow_ips="*",
-            factory=True,
+            workers=workers,
+            limit_max_requests=config["server"].get("max_requests"),
+            **options,
         )
+        return
+
+    conf = uvicorn.Config("main:create_app", **options)
 
+    async def runner() -> None:
         server = uvicorn.Server(conf)
         await server.serve()
 
     try:
-        asyncio.run(runner())
+        asyncio.run(runner(), loop_factory=conf.get_loop_factory())
     except KeyboardInterrupt:
         LOGGER.warning("Shutting down due to KeyboardInterrupt...")
 
@@ -0,0 +1,429 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import functools
+import json
+import logging
+import time
+from typing import TYPE_CHECKING, Any, ClassVar, ParamSpec, Self, TypeVar, cast
+
+import timing
+
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from litestar.types import ASGIApp, Message, Receive, Scope, Send
+    from valkey.asyncio import Valkey
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = (
+    "Counter",
+    "Exporter",
+    "Gauge",
+    "Histogram",
+    "Registry",
+    "session_timing",
+    "timed",
+)
+
+
+# Metrics are only ever touched from the event loop thread, so plain dict updates are safe without locks.
+# Each collector keeps its values keyed by the tuple of label values...
+
+P = ParamSpec("P")
+R = TypeVar("R")
+MetricT = TypeVar("MetricT", bound="Metric")
+
+Sample = tuple[str, dict[str, str], float]
+Family = dict[str, Any]
+
+DEFAULT_BUCKETS: tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    type: ClassVar[str]
+
+    __slots__ = ("description", "labelnames", "name", "values")
+
+    def __init__(self, name: str, description: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+        self.values: dict[tuple[str, ...], Any] = {}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(name={self.name})"
+
+    def _labels(self, values: tuple[str, ...]) -> dict[str, str]:
+        return dict(zip(self.labelnames, values, strict=True))
+
+    def samples(self) -> list[Sample]:
+        return [(self.name, self._labels(key), value) for key, value in self.values.items()]
+
+    def collect(self) -> Family:
+        return {"name": self.name, "type": self.type, "help": self.description, "samples": self.samples()}
+
+
+class Counter(Metric):
+    type = "counter"
+
+    __slots__ = ()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    __slots__ = ("function",)
+
+    def __init__(self, name: str, description: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, description, labelnames)
+        self.function: Callable[[], dict[tuple[str, ...], float]] | None = None
+
+    def set(self, value: float, *labels: str) -> None:
+        self.values[labels] = value
+
+    def set_function(self, function: Callable[[], dict[tuple[str, ...], float]]) -> None:
+        """Compute this gauge at collection time instead of tracking it on the hot path."""
+        self.function = function
+
+    def samples(self) -> list[Sample]:
+        if self.function:
+            self.values = self.function()
+
+        return super().samples()
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    __slots__ = ("buckets", "sums")
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: tuple[str, ...] = (),
+        *,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, labelnames)
+        self.buckets = buckets
+        self.sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts: list[int] | None = self.values.get(labels)
+
+        if counts is None:
+            counts = self.values[labels] = [0] * (len(self.buckets) + 1)
+            self.sums[labels] = 0.0
+
+        # Buckets are stored non-cumulatively and summed at collection time...
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sums[labels] += value
+
+    def time(self, *labels: str, span: str | None = None) -> Timer:
+        """Observe the duration of a block. If ``span`` is given the duration is also added to the request timings."""
+        return Timer(self, labels, span)
+
+    def samples(self) -> list[Sample]:
+        samples: list[Sample] = []
+
+        for key, counts in self.values.items():
+            labels = self._labels(key)
+            total = 0
+
+            for bound, count in zip((*self.buckets, float("inf")), counts, strict=True):
+                total += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                samples.append((f"{self.name}_bucket", {**labels, "le": le}, total))
+
+            samples.append((f"{self.name}_count", labels, total))
+            samples.append((f"{self.name}_sum", labels, self.sums[key]))
+
+        return samples
+
+
+class Timer:
+    __slots__ = ("histogram", "labels", "span", "start")
+
+    def __init__(self, histogram: Histogram, labels: tuple[str, ...], span: str | None = None) -> None:
+        self.histogram = histogram
+        self.labels = labels
+        self.span = span
+
+    def __enter__(self) -> Self:
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        duration = time.perf_counter() - self.start
+        self.histogram.observe(duration, *self.labels)
+
+        if self.span:
+            timing.record(self.span, duration)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: MetricT) -> MetricT:
+        if metric.name in self.metrics:
+            raise ValueError(f"A metric named {metric.name!r} is already registered.")
+
+        self.metrics[metric.name] = metric
+        return metric
+
+    def collect(self) -> list[Family]:
+        return [metric.collect() for metric in self.metrics.values()]
+
+    @staticmethod
+    def render(nodes: dict[str, list[Family]]) -> str:
+        """Render the families of every node in the Prometheus text format, grouped by metric name."""
+        merged: dict[str, Family] = {}
+
+        for node, families in nodes.items():
+            for family in families:
+                entry = merged.setdefault(family["name"], {**family, "samples": []})
+
+                for name, labels, value in family["samples"]:
+                    entry["samples"].append((name, {"node": node, **labels}, value))
+
+        lines: list[str] = []
+        for name, family in merged.items():
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+
+            for sample, labels, value in family["samples"]:
+                pairs = ",".join(f'{k}="{escape(v)}"' for k, v in labels.items())
+                lines.append(f"{sample}{{{pairs}}} {float(value)!r}")
+
+        lines.append("")
+        return "\n".join(lines)
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def timed(
+    histogram: Histogram,
+    *labels: str,
+    span: str | None = None,
+) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+    def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            start = time.perf_counter()
+
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                histogram.observe(duration, *labels)
+
+                if span:
+                    timing.record(span, duration)
+
+        return wrapper
+
+    return decorator
+
+
+def session_timing(session: Callable[[ASGIApp], ASGIApp]) -> Callable[[ASGIApp], ASGIApp]:
+    """Wrap the session middleware so the time it spends around the handler is recorded.
+
+    Time is recorded on the way in (loading the session) and on the way out, including the wrapped
+    ``send`` where the session is stored, minus the time spent in the outer ``send`` itself.
+    """
+
+    def middleware(app: ASGIApp) -> ASGIApp:
+        async def inner(scope: Scope, receive: Receive, send: Send) -> None:
+            marks: list[float] = scope["session_timing"]  # type: ignore
+            marks[0] += time.perf_counter()
+
+            async def timed_send(message: Message) -> None:
+                start = marks[1] = time.perf_counter()
+                await send(message)
+                marks[0] += time.perf_counter() - start
+
+            try:
+                await app(scope, receive, timed_send)
+            finally:
+                marks[0] -= time.perf_counter()
+
+        wrapped = session(inner)
+
+        async def outer(scope: Scope, receive: Receive, send: Send) -> None:
+            if scope["type"] != "http":
+                await wrapped(scope, receive, send)
+                return
+
+            # marks[0] accumulates the time spent outside the handler, but inside the session middleware.
+            # marks[1] is when the handler last sent, which is where the session starts being stored...
+            marks = [-time.perf_counter(), 0.0]
+            scope["session_timing"] = marks  # type: ignore
+
+            async def outer_send(message: Message) -> None:
+                start = time.perf_counter()
+
+                # Loaded and stored by now, and Server-Timing is added to these headers further out...
+                if message["type"] == "http.response.start":
+                    timing.record("session", marks[0] + start - marks[1])
+
+                await send(message)
+                marks[0] -= time.perf_counter() - start
+
+            try:
+                await wrapped(scope, receive, outer_send)
+            finally:
+                marks[0] += time.perf_counter()
+                SESSION_OVERHEAD.observe(marks[0])
+
+        return outer
+
+    return middleware
+
+
+class Exporter:
+    """Shares this worker's metrics with the other workers through Valkey.
+
+    Every worker publishes a snapshot periodically, so ``/metrics`` can answer for all of them regardless
+    of which worker the scrape lands on.
+    """
+
+    NODES_KEY = "metrics:nodes"
+
+    def __init__(self, *, client: Valkey, node: str, interval: float = 10.0) -> None:
+        self.client = client
+        self.node = node
+        self.interval = interval
+        self._task: asyncio.Task[None] | None = None
+
+    @staticmethod
+    def snapshot_key(node: str) -> str:
+        return f"metrics:node:{node}"
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._publish())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+        try:
+            await self.client.srem(self.NODES_KEY, self.node)  # type: ignore
+            await self.client.delete(self.snapshot_key(self.node))
+        except Exception as e:
+            LOGGER.warning("Unable to remove metrics snapshot for %s: %s", self.node, e)
+
+    async def render(self) -> str:
+        nodes: dict[str, list[Family]] = {self.node: REGISTRY.collect()}
+
+        # valkey types set commands as maybe synchronous...
+        found = cast("set[bytes]", await self.client.smembers(self.NODES_KEY))  # type: ignore
+        members = [m for m in found if m.decode() != self.node]
+        if members:
+            snapshots: list[bytes | None] = await self.client.mget([self.snapshot_key(m.decode()) for m in members])
+
+            for member, snapshot in zip(members, snapshots, strict=True):
+                if snapshot is None:
+                    await self.client.srem(self.NODES_KEY, member)  # type: ignore
+                    continue
+
+                nodes[member.decode()] = json.loads(snapshot)
+
+        return REGISTRY.render(nodes)
+
+    async def _publish(self) -> None:
+        while True:
+            try:
+                async with self.client.pipeline(transaction=False) as pipe:
+                    pipe.set(self.snapshot_key(self.node), json.dumps(REGISTRY.collect()), ex=int(self.interval * 3))
+                    pipe.sadd(self.NODES_KEY, self.node)
+                    await pipe.execute()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                LOGGER.warning("Unable to publish metrics snapshot: %s", e)
+
+            await asyncio.sleep(self.interval)
+
+
+REGISTRY = Registry()
+
+WEBSOCKETS = REGISTRY.register(Gauge("relay_websockets_connected", "Websockets connected to this worker."))
+QUEUE_DEPTH = REGISTRY.register(
+    Gauge("relay_queue_depth", "Relayed payloads waiting to be sent per application.", ("application_id",))
+)
+CONNECTION_MEMORY = REGISTRY.register(
+    Gauge("relay_connection_registry_bytes", "Estimated memory held by this worker's connection registry.")
+)
+RELAY_LATENCY = REGISTRY.register(
+    Histogram("relay_latency_seconds", "Time from a redirect being received to the relay stage.", ("stage",))
+)
+TWITCH_LATENCY = REGISTRY.register(Histogram("twitch_request_seconds", "Latency of requests made to Twitch.", ("endpoint",)))
+TWITCH_ERRORS = REGISTRY.register(Counter("twitch_request_errors_total", "Failed requests made to Twitch.", ("endpoint",)))
+VALKEY_LATENCY = REGISTRY.register(Histogram("valkey_command_seconds", "Latency of Valkey commands.", ("client", "command")))
+VALKEY_POOL = REGISTRY.register(Gauge("valkey_pool_connections", "Valkey connections per pool.", ("pool", "state")))
+DATABASE_LATENCY = REGISTRY.register(Histogram("database_query_seconds", "Latency of Postgres queries.", ("query",)))
+DATABASE_POOL = REGISTRY.register(Gauge("database_pool_connections", "Postgres pool connections.", ("state",)))
+RATELIMITED = REGISTRY.register(
+    Counter("ratelimit_rejections_total", "Requests rejected by the rate limiter.", ("route", "layer"))
+)
+ADMISSION_REJECTED = REGISTRY.register(
+    Counter("websocket_rejections_total", "Websockets turned away by admission control.", ("reason",))
+)
+AUTH_CACHE = REGISTRY.register(Counter("auth_cache_lookups_total", "Websocket token lookups by cache result.", ("result",)))
+EVENT_LOOP_LAG = REGISTRY.register(Gauge("event_loop_lag_seconds", "How late the event loop last ran a timer."))
+EVENT_LOOP_DELAY = REGISTRY.register(
+    Histogram(
+        "event_loop_delay_seconds",
+        "How late the event loop ran each lag monitor timer.",
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+    )
+)
+TOKEN_REFRESHES = REGISTRY.register(
+    Counter("token_refreshes_total", "Server-managed token refreshes by result.", ("result",))
+)
+TOKENS_SCHEDULED = REGISTRY.register(Gauge("token_refreshes_scheduled", "Tokens scheduled for refresh on this worker."))
+SLOW_CALLBACKS = REGISTRY.register(
+    Counter("event_loop_slow_callbacks_total", "Callbacks that held the event loop past the slow callback threshold.")
+)
+WEBSOCKET_BYTES = REGISTRY.register(
+    Counter("relay_websocket_bytes_total", "Websocket message bytes before and after compression.", ("stage",))
+)
+CLUSTER_NODES = REGISTRY.register(Gauge("relay_cluster_nodes", "Live relay nodes in the cluster, as seen by this worker."))
+CLUSTER_REDIRECTS = REGISTRY.register(
+    Counter("relay_cluster_redirects_total", "Websockets sent to the node owning their application.", ("reason",))
+)
+SESSION_OVERHEAD = REGISTRY.register(
+    Histogram(
+        "session_middleware_seconds",
+        "Time spent in the session middleware per request.",
+        buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+    )
+)
@@ -15,26 +15,35 @@ limitations under the License.
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING
 
-import asyncpg
+import msgspec
 
 
 if TYPE_CHECKING:
-    from types_.models import ApplicationRecordDT, FullUserRecordDT, UserRecordDT
+    import datetime
 
+    import asyncpg
 
-__all__ = ("ApplicationRecord", "FullUserRecord", "UserRecord")
+    from types_.models import UserRecordDT
 
 
-class UserRecord(asyncpg.Record):
+__all__ = ("ApplicationRecord", "FullUserRecord", "RefreshRecord", "UserRecord")
+
+
+# Rows are built positionally from records, so field order must match the column order of the queries in database.py.
+# Every field is a scalar, so the structs are left out of garbage collector tracking...
+
+
+class UserRecord(msgspec.Struct, frozen=True, gc=False):
     id: int
     twitch_id: str
     name: str
     token: str
 
-    def __getattr__(self, attr: str) -> Any:
-        return self[attr]
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> UserRecord:
+        return cls(*record)
 
     def to_dict(self, include_token: bool = True) -> UserRecordDT:
         return {
@@ -45,33 +54,22 @@ class UserRecord(asyncpg.Record):
         }
 
 
-class ApplicationRecord(asyncpg.Record):
-    id: str
+class ApplicationRecord(msgspec.Struct, frozen=True, gc=False):
+    id: str = msgspec.field(name="application_id")
     user_id: int
     client_id: str
-    name: str
+    name: str = msgspec.field(name="application_name")
     url: str
     scopes: str
     bot_scopes: str
     auths: int
 
-    def __getattr__(self, attr: str) -> Any:
-        return self[attr]
-
-    def to_dict(self) -> ApplicationRecordDT:
-        return {
-            "application_id": self.id,
-            "user_id": self.user_id,
-            "client_id": self.client_id,
-            "application_name": self.name,
-            "url": self.url,
-            "scopes": self.scopes,
-            "bot_scopes": self.bot_scopes,
-            "auths": self.auths,
-        }
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> ApplicationRecord:
+        return cls(*record)
 
 
-class FullUserRecord(asyncpg.Record):
+class FullUserRecord(msgspec.Struct, frozen=True, gc=False):
     id: int
     twitch_id: str
     name: str
@@ -82,35 +80,30 @@ class FullUserRecord(asyncpg.Record):
     scopes: str | None
     bot_scopes: str | None
     auths: int | None
-    allowed: str | None
     url: str | None
 
-    def __getattr__(self, attr: str) -> Any:
-        return self[attr]
-
-    def to_dict(self, include_user: bool = False, include_token: bool = False) -> FullUserRecordDT:
-        data: FullUserRecordDT = {}
-
-        if include_user:
-            data.update(
-                {
-                    "id": self.id,
-                    "twitch_id": self.twitch_id,
-                    "name": self.name,
-                    "token": self.token if include_token else None,
-                }
-            )
-
-        data.update(
-            {
-                "application_id": self.application_id,
-                "client_id": self.client_id,
-                "application_name": self.application_name,
-                "scopes": self.scopes,
-                "bot_scopes": self.bot_scopes,
-                "auths": self.auths,
-                "allowed": self.allowed,
-                "url": self.url,
-            }
-        )
-        return data
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> FullUserRecord:
+        return cls(*record)
+
+    @property
+    def application(self) -> ApplicationRecord | None:
+        if self.application_id is None:
+            return None
+
+        # The join fills every application column whenever the ID is present...
+        fields = (self.client_id, self.application_name, self.url, self.scopes, self.bot_scopes, self.auths)
+        return ApplicationRecord(self.application_id, self.id, *fields)  # type: ignore
+
+
+class RefreshRecord(msgspec.Struct, frozen=True, gc=False):
+    application_id: str
+    user_id: str
+    client_id: str
+    secret: bytes
+    token: bytes
+    expires_at: datetime.datetime
+
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> RefreshRecord:
+        return cls(*record)
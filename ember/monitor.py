@@ -0,0 +1,131 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+from metrics import EVENT_LOOP_DELAY, EVENT_LOOP_LAG, SLOW_CALLBACKS
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("LagMonitor", "SlowCallbackLogger")
+
+
+class LagMonitor:
+    """Measures how late the event loop runs a timer, which is how long every other callback has been waiting."""
+
+    def __init__(self, *, interval: float = 0.5, warning: float | None = None) -> None:
+        self.interval = interval
+        self.warning = warning
+        self.lag = 0.0
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+
+            self.lag = max(0.0, loop.time() - start - self.interval)
+            EVENT_LOOP_LAG.set(self.lag)
+            EVENT_LOOP_DELAY.observe(self.lag)
+
+            if self.warning is not None and self.lag > self.warning:
+                LOGGER.warning("Event loop lagged by %.3fs.", self.lag)
+
+
+class SlowCallbackLogger:
+    """Logs callbacks that hold the event loop for longer than ``threshold`` seconds.
+
+    Wraps the run method shared by every asyncio callback, which costs two clock reads per callback rather than
+    the overhead of the loop's debug mode. Logging is limited to one line per ``interval``; the rest are counted.
+    uvloop runs its own callbacks, so only the asyncio loop is covered.
+    """
+
+    def __init__(self, *, threshold: float = 0.1, interval: float = 1.0) -> None:
+        self.threshold = threshold
+        self.interval = interval
+
+        self._original: Callable[[asyncio.Handle], None] | None = None
+        self._last = 0.0
+        self._suppressed = 0
+
+    def install(self) -> None:
+        if self._original is not None:
+            return
+
+        original = self._original = asyncio.Handle._run  # type: ignore
+        perf_counter = time.perf_counter
+
+        def run(handle: asyncio.Handle) -> None:
+            start = perf_counter()
+            original(handle)
+            elapsed = perf_counter() - start
+
+            if elapsed >= self.threshold:
+                self.report(handle, elapsed)
+
+        asyncio.Handle._run = run  # type: ignore
+
+    def uninstall(self) -> None:
+        if self._original is not None:
+            asyncio.Handle._run = self._original  # type: ignore
+            self._original = None
+
+    @staticmethod
+    def describe(handle: asyncio.Handle) -> str:
+        callback: Any = handle._callback  # type: ignore
+
+        # A task step names the coroutine it resumed, rather than the task's internal method...
+        task = getattr(callback, "__self__", None)
+        if isinstance(task, asyncio.Task):
+            coro: Any = task.get_coro()
+            return f"{task.get_name()} ({getattr(coro, '__qualname__', repr(coro))})"
+
+        return getattr(callback, "__qualname__", repr(callback))
+
+    def report(self, handle: asyncio.Handle, elapsed: float) -> None:
+        SLOW_CALLBACKS.inc()
+
+        now = time.monotonic()
+        if now - self._last < self.interval:
+            self._suppressed += 1
+            return
+
+        suppressed, self._suppressed, self._last = self._suppressed, 0, now
+        LOGGER.warning(
+            "Callback %s held the event loop for %.3fs (%d more slow callbacks since the last report).",
+            self.describe(handle),
+            elapsed,
+            suppressed,
+        )
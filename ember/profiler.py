@@ -0,0 +1,128 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import collections
+import logging
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from types import FrameType
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("SamplingProfiler",)
+
+
+# Samples where the loop is waiting for I/O are folded into one frame, so idle time shows as a single block...
+IDLE = "(idle)"
+TRUNCATED = "(truncated)"
+
+
+class SamplingProfiler:
+    """Samples the event loop thread's stack from a background thread for a bounded window.
+
+    Nothing is hooked into the loop itself: each sample briefly takes the GIL to walk one stack, so the cost is
+    set by ``interval`` rather than by how busy the loop is. Output is in the collapsed format read by
+    flamegraph.pl, speedscope and most other flamegraph tools: one ``root;...;leaf count`` line per stack.
+    """
+
+    def __init__(self, *, max_seconds: float = 60.0, max_stacks: int = 10_000) -> None:
+        self.max_seconds = max_seconds
+        self.max_stacks = max_stacks
+
+        self.counts: collections.Counter[str] = collections.Counter()
+        self.started: float | None = None
+        self.stopped: float | None = None
+
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, *, seconds: float, interval: float = 0.01, thread_id: int | None = None) -> float:
+        """Start sampling ``thread_id``, the calling thread by default. Returns the bounded window in seconds."""
+        if self.running:
+            raise RuntimeError("A profile is already running.")
+
+        seconds = min(seconds, self.max_seconds)
+        target = thread_id if thread_id is not None else threading.get_ident()
+
+        self.counts = collections.Counter()
+        self.started = time.monotonic()
+        self.stopped = None
+        self._stop.clear()
+
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(target, seconds, interval),
+            name="ember-profiler",
+            daemon=True,
+        )
+        self._thread.start()
+        return seconds
+
+    def stop(self) -> None:
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+    @staticmethod
+    def fold(frame: FrameType | None) -> str:
+        if frame is not None and frame.f_code.co_name == "select" and frame.f_code.co_filename.endswith("selectors.py"):
+            return IDLE
+
+        names: list[str] = []
+
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_qualname} ({code.co_filename}:{code.co_firstlineno})")
+            frame = frame.f_back
+
+        return ";".join(reversed(names))
+
+    def _run(self, thread_id: int, seconds: float, interval: float) -> None:
+        deadline = time.monotonic() + seconds
+        counts = self.counts
+
+        while not self._stop.wait(interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)  # type: ignore
+            if frame is None:
+                break
+
+            stack = self.fold(frame)
+            del frame
+
+            # Bounds memory however varied the stacks are...
+            if stack not in counts and len(counts) >= self.max_stacks:
+                stack = TRUNCATED
+
+            counts[stack] += 1
+
+        self.stopped = time.monotonic()
+        LOGGER.info("Profile finished with %d samples over %.1fs.", counts.total(), self.stopped - (self.started or 0))
@@ -0,0 +1,179 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import TYPE_CHECKING, cast
+
+from metrics import RATELIMITED, VALKEY_LATENCY
+
+
+if TYPE_CHECKING:
+    from valkey.asyncio import Valkey
+
+    from types_.config import BucketT, RateLimitT
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("LocalLimiter", "RateLimiter")
+
+
+# Checks every bucket in KEYS and only takes a token from each if all of them have one.
+# ARGV holds (rate, burst) pairs matching KEYS. Server time keeps every worker on the same clock.
+# Returns {allowed, retry_after} with retry_after as a string, as Lua numbers are truncated to integers...
+TOKEN_BUCKET_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+
+local retry = 0
+local tokens = {}
+
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2 - 1])
+    local burst = tonumber(ARGV[i * 2])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+
+    local available = tonumber(bucket[1]) or burst
+    local ts = tonumber(bucket[2]) or now
+
+    available = math.min(burst, available + math.max(0, now - ts) * rate)
+    if available < 1 then
+        retry = math.max(retry, (1 - available) / rate)
+    end
+
+    tokens[i] = available
+end
+
+if retry > 0 then
+    return {0, tostring(retry)}
+end
+
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2 - 1])
+    local burst = tonumber(ARGV[i * 2])
+
+    redis.call('HSET', key, 'tokens', tokens[i] - 1, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+end
+
+return {1, '0'}
+"""
+
+
+class LocalLimiter:
+    """An in-process token bucket per key, used to shed floods before they reach Valkey."""
+
+    __slots__ = ("buckets", "burst", "max_keys", "rate")
+
+    def __init__(self, *, rate: float, burst: float, max_keys: int = 100_000) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets: dict[str, list[float]] = {}
+
+    def check(self, key: str) -> float | None:
+        """Take a token for ``key``. Returns the seconds to wait if none are available, otherwise ``None``."""
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+
+        if bucket is None:
+            if len(self.buckets) >= self.max_keys:
+                self.prune(now)
+
+            bucket = self.buckets[key] = [self.burst, now]
+
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+
+        if tokens < 1:
+            bucket[0] = tokens
+            return (1 - tokens) / self.rate
+
+        bucket[0] = tokens - 1
+        return None
+
+    def prune(self, now: float) -> None:
+        # Buckets that have refilled completely hold no state worth keeping...
+        full = self.burst / self.rate
+        self.buckets = {key: bucket for key, bucket in self.buckets.items() if now - bucket[1] < full}
+
+
+class RateLimiter:
+    """Token bucket rate limiting per route, keyed by client address and by client address and application URL.
+
+    Each check is a single script call against Valkey, so limits hold across every worker and node.
+    An optional local limiter per route rejects obvious floods without a round trip.
+    """
+
+    def __init__(self, *, client: Valkey, config: RateLimitT) -> None:
+        self.client = client
+        self.routes = config.get("routes", {}) if config.get("enabled", False) else {}
+
+        local: BucketT | None = config.get("local")
+        self.local: dict[str, LocalLimiter] = {}
+
+        if local:
+            self.local = {route: LocalLimiter(rate=local["rate"], burst=local["burst"]) for route in self.routes}
+
+        self.script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def check(self, route: str, address: str | None, uri: str) -> float | None:
+        """Returns the seconds to wait before retrying if the request is limited, otherwise ``None``."""
+        limits = self.routes.get(route)
+        if not limits:
+            return None
+
+        local = self.local.get(route)
+        if local and address:
+            retry = local.check(address)
+
+            if retry is not None:
+                RATELIMITED.inc(route, "local")
+                return retry
+
+        keys: list[str] = []
+        args: list[float] = []
+
+        ip = limits.get("ip")
+        if ip and address:
+            keys.append(f"ratelimit:{route}:ip:{address}")
+            args.extend((ip["rate"], ip["burst"]))
+
+        # Per address as well, so nobody can spend an application's allowance and lock its real users out...
+        application = limits.get("application")
+        if application and address:
+            keys.append(f"ratelimit:{route}:app:{uri}:{address}")
+            args.extend((application["rate"], application["burst"]))
+
+        if not keys:
+            return None
+
+        try:
+            with VALKEY_LATENCY.time("ratelimit", "check", span="ratelimit"):
+                allowed, retry = cast("tuple[int, bytes]", await self.script(keys=keys, args=args))
+        except Exception as e:
+            # Failing open: a Valkey outage should not also lock every user out of authenticating...
+            LOGGER.warning("Unable to check rate limit for %s: %s", route, e)
+            return None
+
+        if not allowed:
+            RATELIMITED.inc(route, "valkey")
+            return float(retry)
+
+        return None
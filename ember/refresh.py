@@ -0,0 +1,329 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import heapq
+import json
+import logging
+import random
+import secrets
+import time
+from typing import TYPE_CHECKING, Any, cast
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from metrics import TOKEN_REFRESHES, TWITCH_ERRORS, TWITCH_LATENCY, VALKEY_LATENCY
+from ratelimit import TOKEN_BUCKET_SCRIPT
+
+
+if TYPE_CHECKING:
+    from aiohttp import ClientSession
+
+    from database import Database
+    from models import RefreshRecord
+    from relay import Relay
+    from types_.config import RefreshT
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("Refresher",)
+
+
+TWITCH_TOKEN_URL = "https://id.twitch.tv/oauth2/token"
+CHANNEL = "refresh:tokens"
+
+# Transient failures are retried after this many seconds...
+RETRY = 60.0
+
+
+class Refresher:
+    """Refreshes Twitch tokens on behalf of bots that opt in, pushing each new token over their websocket.
+
+    Refresh tokens and client secrets are stored in Postgres encrypted with AES-GCM. Each worker only schedules
+    tokens for the applications whose websocket it holds, in a min-heap of due times. Due times are spread
+    randomly before expiry so a fleet registered together doesn't refresh together. Calls to Twitch are
+    paced by a token bucket per client ID in Valkey, shared by every worker.
+    """
+
+    def __init__(
+        self,
+        *,
+        db: Database,
+        relay: Relay,
+        session: ClientSession,
+        config: RefreshT,
+    ) -> None:
+        self.db = db
+        self.relay = relay
+        self.session = session
+
+        self.cipher = AESGCM(bytes.fromhex(config["key"]))
+        self.margin = config.get("margin", 300.0)
+        self.spread = config.get("spread", 600.0)
+        self.batch = config.get("batch", 20)
+        self.rate = config.get("rate", 10.0)
+        self.burst = config.get("burst", 20.0)
+
+        # (due, generation, application ID, user ID); superseded entries are skipped when popped...
+        self.heap: list[tuple[float, int, str, str]] = []
+        self.entries: dict[str, dict[str, int]] = {}
+        self._generation = 0
+
+        self.script = relay.client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    def __len__(self) -> int:
+        return sum(len(users) for users in self.entries.values())
+
+    async def start(self) -> None:
+        await self.relay.subscribe(CHANNEL, self._notify)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        tasks = [*self._tasks, *([self._task] if self._task else [])]
+
+        for task in tasks:
+            task.cancel()
+
+        # Refreshes in flight still hold the database and HTTP session, which close straight after...
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def encrypt(self, value: str, context: str) -> bytes:
+        # The nonce is stored with the ciphertext, which is bound to its row by the associated data...
+        nonce = secrets.token_bytes(12)
+        return nonce + self.cipher.encrypt(nonce, value.encode(), context.encode())
+
+    def decrypt(self, value: bytes, context: str) -> str:
+        return self.cipher.decrypt(value[:12], value[12:], context.encode()).decode()
+
+    async def register(
+        self,
+        app_id: str,
+        user_id: str,
+        *,
+        client_secret: str,
+        refresh_token: str,
+        expires_in: float,
+    ) -> datetime.datetime:
+        expires_at = datetime.datetime.now(datetime.UTC) + datetime.timedelta(seconds=expires_in)
+
+        await self.db.register_refresh(
+            app_id,
+            user_id,
+            secret=self.encrypt(client_secret, app_id),
+            token=self.encrypt(refresh_token, f"{app_id}:{user_id}"),
+            expires_at=expires_at,
+        )
+
+        await self._publish(app_id, user_id)
+        return expires_at
+
+    async def unregister(self, app_id: str, user_id: str) -> bool:
+        deleted = await self.db.delete_refresh(app_id, user_id)
+        await self._publish(app_id, user_id)
+
+        return deleted
+
+    async def track(self, app_id: str, user_id: str | None = None) -> None:
+        """Schedule the registered tokens of an application whose websocket this worker holds."""
+        try:
+            rows = await self.db.fetch_refresh_expiries(app_id, user_id)
+        except Exception as e:
+            LOGGER.warning("Unable to load the refresh tokens of %s: %s", app_id, e)
+            return
+
+        # The websocket may have closed while we were reading...
+        if not self.relay.clients.get(app_id):
+            return
+
+        users = self.entries.setdefault(app_id, {})
+        if user_id is not None and not rows:
+            users.pop(user_id, None)
+
+        for user, expires_at in rows:
+            self.schedule(app_id, user, expires_at.timestamp())
+
+        if not users:
+            del self.entries[app_id]
+
+    def untrack(self, app_id: str) -> None:
+        self.entries.pop(app_id, None)
+
+        # Superseded entries are normally dropped as they come due; rebuild once they dominate the heap...
+        if len(self.heap) > 4 * len(self.entries) + 1000:
+            self.heap = [item for item in self.heap if self.entries.get(item[2], {}).get(item[3]) == item[1]]
+            heapq.heapify(self.heap)
+
+    def schedule(self, app_id: str, user_id: str, expires_at: float, *, due: float | None = None) -> None:
+        if due is None:
+            due = expires_at - self.margin - random.uniform(0, self.spread)
+
+        self._generation += 1
+        self.entries.setdefault(app_id, {})[user_id] = self._generation
+        heapq.heappush(self.heap, (due, self._generation, app_id, user_id))
+
+        if self.heap[0][1] == self._generation:
+            self._wake.set()
+
+    def due(self, now: float) -> list[tuple[str, str]]:
+        batch: list[tuple[str, str]] = []
+
+        while self.heap and self.heap[0][0] <= now and len(batch) < self.batch:
+            _, generation, app_id, user_id = heapq.heappop(self.heap)
+            users = self.entries.get(app_id)
+
+            if users is None or users.get(user_id) != generation:
+                continue
+
+            del users[user_id]
+            batch.append((app_id, user_id))
+
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            timeout = max(0.0, self.heap[0][0] - time.time()) if self.heap else None
+            self._wake.clear()
+
+            try:
+                async with asyncio.timeout(timeout):
+                    await self._wake.wait()
+            except TimeoutError:
+                pass
+
+            batch = self.due(time.time())
+            if batch:
+                await asyncio.gather(*(self._refresh(app_id, user_id) for app_id, user_id in batch))
+
+    async def _pace(self, client_id: str) -> None:
+        key = f"ratelimit:refresh:client:{client_id}"
+
+        while True:
+            try:
+                with VALKEY_LATENCY.time("refresh", "pace", span="refresh"):
+                    allowed, retry = cast("tuple[int, bytes]", await self.script(keys=[key], args=[self.rate, self.burst]))  # type: ignore
+            except Exception as e:
+                LOGGER.warning("Unable to pace token refreshes for %s: %s", client_id, e)
+                return
+
+            if allowed:
+                return
+
+            await asyncio.sleep(float(retry))
+
+    async def _refresh(self, app_id: str, user_id: str) -> None:
+        # One failure mustn't escape into the scheduler, which would stop refreshing for every application...
+        try:
+            await self._attempt(app_id, user_id)
+        except Exception as e:
+            TOKEN_REFRESHES.inc("error")
+            LOGGER.warning("Unable to refresh the token for %s of %s: %s", user_id, app_id, e)
+
+            if self.relay.clients.get(app_id):
+                self.schedule(app_id, user_id, 0, due=time.time() + RETRY)
+
+    async def _attempt(self, app_id: str, user_id: str) -> None:
+        record = await self.db.fetch_refresh(app_id, user_id)
+        if record is None:
+            return
+
+        await self._pace(record.client_id)
+
+        # New tokens are only ever handed to a websocket on this worker, so there's no point refreshing without one...
+        if not self.relay.clients.get(app_id):
+            return
+
+        data = await self._request(record)
+
+        if data is None:
+            # Twitch rejected the refresh token; the bot has to authorize again...
+            TOKEN_REFRESHES.inc("invalid")
+            await self.db.delete_refresh(app_id, user_id)
+            await self.relay.send(app_id, {"grant_type": "refresh_token", "user_id": user_id, "error": "invalid_grant"})
+            return
+
+        TOKEN_REFRESHES.inc("refreshed")
+
+        expires_at = datetime.datetime.now(datetime.UTC) + datetime.timedelta(seconds=data["expires_in"])
+        token = self.encrypt(data["refresh_token"], f"{app_id}:{user_id}")
+        await self.db.update_refresh(app_id, user_id, token=token, expires_at=expires_at)
+
+        message = {
+            "grant_type": "refresh_token",
+            "user_id": user_id,
+            "access_token": data["access_token"],
+            "refresh_token": data["refresh_token"],
+            "expires_in": data["expires_in"],
+            "scope": data.get("scope", []),
+        }
+
+        # Never through Valkey, where the tokens would sit in plaintext...
+        if self.relay.deliver(app_id, message):
+            self.schedule(app_id, user_id, expires_at.timestamp())
+            return
+
+        # The bot never got the new access token; marking it due has it refreshed again as soon as the bot returns...
+        LOGGER.info("Refreshed the token for %s of %s, but its websocket has gone.", user_id, app_id)
+        await self.db.update_refresh(app_id, user_id, token=token, expires_at=datetime.datetime.now(datetime.UTC))
+
+    async def _request(self, record: RefreshRecord) -> dict[str, Any] | None:
+        context = f"{record.application_id}:{record.user_id}"
+
+        try:
+            secret = self.decrypt(record.secret, record.application_id)
+            token = self.decrypt(record.token, context)
+        except InvalidTag:
+            # Encrypted under another key; only the bot can supply the token again...
+            LOGGER.warning("Unable to decrypt the refresh token for %s of %s.", record.user_id, record.application_id)
+            return None
+
+        form = {
+            "client_id": record.client_id,
+            "client_secret": secret,
+            "grant_type": "refresh_token",
+            "refresh_token": token,
+        }
+
+        with TWITCH_LATENCY.time("refresh", span="twitch"):
+            async with self.session.post(TWITCH_TOKEN_URL, data=form) as resp:
+                if resp.status in (400, 401):
+                    TWITCH_ERRORS.inc("refresh")
+                    return None
+
+                resp.raise_for_status()
+                return await resp.json()
+
+    async def _publish(self, app_id: str, user_id: str) -> None:
+        try:
+            await self.relay.client.publish(CHANNEL, json.dumps({"application_id": app_id, "user_id": user_id}))  # type: ignore
+        except Exception as e:
+            LOGGER.warning("Unable to publish a refresh registration for %s: %s", app_id, e)
+
+    def _notify(self, payload: dict[str, Any]) -> None:
+        # Only the worker holding the websocket schedules the token...
+        app_id = payload["application_id"]
+
+        if self.relay.clients.get(app_id):
+            task = asyncio.create_task(self.track(app_id, payload["user_id"]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
@@ -0,0 +1,430 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import secrets
+import time
+from typing import TYPE_CHECKING, Any, Self, cast
+
+from valkey.asyncio import Valkey
+
+from connections import Registry
+from metrics import RELAY_LATENCY, VALKEY_LATENCY
+
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Callable
+
+    from valkey.asyncio.client import PubSub
+
+    from connections import Connection
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("LOCAL", "MAX_REASON", "REDIRECT", "Relay", "redirect_reason")
+
+
+# Only remove the owner key when it still belongs to this node...
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Claims an application that is unowned or being drained, taking any codes parked during the handoff.
+# Returns {0} if another node owns it, otherwise {1, parked...}...
+ACQUIRE_SCRIPT = """
+local owner = redis.call('GET', KEYS[1])
+if owner and owner ~= ARGV[2] then
+    return {0}
+end
+
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+
+local parked = redis.call('LRANGE', KEYS[2], 0, -1)
+redis.call('DEL', KEYS[2])
+
+table.insert(parked, 1, 1)
+return parked
+"""
+
+# Marks an application owned by this node as draining, so codes for it are parked rather than forwarded...
+HANDOFF_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Parks codes for an application only while it is still draining, as a new owner may have claimed it...
+PARK_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+
+for i = 3, #ARGV do
+    redis.call('RPUSH', KEYS[2], ARGV[i])
+end
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+DRAINING = "draining"
+
+# Marks data queued by ``Relay.deliver``, which is dropped rather than parked when its websocket drains...
+LOCAL = "_local"
+
+# Close code telling a bot to reconnect to the node named in the close reason; 307 in the private range...
+REDIRECT = 4307
+
+# Websocket close reasons are capped at 123 bytes, as a close frame's payload is 125 including the code...
+MAX_REASON = 123
+
+
+def _restarting(spread: float) -> str:
+    reconnect = random.uniform(0, spread)
+    return json.dumps({"error": "Relay restarting.", "reconnect_after": int(reconnect * 1000)})
+
+
+def redirect_reason(error: str, url: str) -> str:
+    """The close reason sent with ``REDIRECT``. It must fit in ``MAX_REASON`` bytes, which limits ``url``."""
+    return json.dumps({"error": error, "redirect": url})
+
+
+class Relay:
+    """Routes OAuth codes to whichever worker holds the websocket for an application.
+
+    Websockets are only ever held by the worker that accepted them. Ownership is recorded in Valkey
+    and each worker listens on its own channel, so a redirect landing on any worker can be forwarded
+    to the owner in a single publish.
+
+    While a worker drains, codes for its applications are parked in Valkey until the bot reconnects,
+    and whichever worker it reconnects to takes them when claiming ownership.
+    """
+
+    if TYPE_CHECKING:
+        client: Valkey
+        pubsub: PubSub
+
+    def __init__(self, *, url: str, db: int, heartbeat: float = 15.0, handoff: int = 60) -> None:
+        self.url = url
+        self.db = db
+        self.heartbeat = heartbeat
+        self.handoff = handoff
+        self.node = secrets.token_hex(8)
+
+        self.clients = Registry()
+        self._tasks: set[asyncio.Task[Any]] = set()
+        self._handlers: dict[str, Callable[[Any], None]] = {self.channel: self._dispatch}
+
+    def __repr__(self) -> str:
+        return f"Relay(node={self.node}, clients={len(self.clients)})"
+
+    @property
+    def ttl(self) -> int:
+        return int(self.heartbeat * 3)
+
+    @property
+    def channel(self) -> str:
+        return self.node_channel(self.node)
+
+    @staticmethod
+    def owner_key(app_id: str) -> str:
+        return f"relay:owner:{app_id}"
+
+    @staticmethod
+    def node_channel(node: str) -> str:
+        return f"relay:node:{node}"
+
+    @staticmethod
+    def parked_key(app_id: str) -> str:
+        return f"relay:parked:{app_id}"
+
+    async def connect(self) -> Self:
+        if getattr(self, "client", None):
+            raise RuntimeError("Relay has previously been connected.")
+
+        self.client = Valkey.from_url(self.url, db=self.db)
+        self._release = self.client.register_script(RELEASE_SCRIPT)
+        self._acquire = self.client.register_script(ACQUIRE_SCRIPT)
+        self._handoff = self.client.register_script(HANDOFF_SCRIPT)
+        self._park = self.client.register_script(PARK_SCRIPT)
+
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.subscribe(self.channel)  # type: ignore
+
+        for coro in (self._listen(), self._beat()):
+            task = asyncio.create_task(coro)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        LOGGER.info("Successfully connected %r.", self)
+        return self
+
+    async def close(self) -> None:
+        if not getattr(self, "client", None):
+            return
+
+        for task in list(self._tasks):
+            task.cancel()
+
+        for connection in list(self.clients):
+            connection.queue.shutdown(immediate=True)
+            await self.release(connection.app_id)
+
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+    async def subscribe(self, channel: str, handler: Callable[[Any], None]) -> None:
+        """Route decoded JSON messages on ``channel`` to ``handler``, sharing this worker's pubsub connection."""
+        self._handlers[channel] = handler
+        await self.pubsub.subscribe(channel)  # type: ignore
+
+    async def unsubscribe(self, channel: str) -> None:
+        self._handlers.pop(channel, None)
+        await self.pubsub.unsubscribe(channel)  # type: ignore
+
+    async def acquire(self, connection: Connection) -> bool:
+        """Claim ownership of an application for this worker. Returns ``False`` if any worker already owns it."""
+        if connection.app_id in self.clients:
+            return False
+
+        keys = [self.owner_key(connection.app_id), self.parked_key(connection.app_id)]
+        result = cast("list[Any]", await self._acquire(keys=keys, args=[self.node, DRAINING, self.ttl]))  # type: ignore
+        claimed, *parked = result
+
+        if not claimed or not self.clients.add(connection):
+            return False
+
+        for data in parked:
+            self._enqueue(connection, json.loads(data))
+
+        return True
+
+    async def release(self, app_id: str) -> None:
+        self.clients.remove(app_id)
+
+        try:
+            await self._release(keys=[self.owner_key(app_id)], args=[self.node])
+        except Exception as e:
+            LOGGER.warning("Unable to release ownership of %s: %s", app_id, e)
+
+    async def connected(self, app_id: str | None) -> bool:
+        if not app_id:
+            return False
+
+        if app_id in self.clients:
+            return True
+
+        with VALKEY_LATENCY.time("relay", "exists", span="relay"):
+            return bool(await self.client.exists(self.owner_key(app_id)))
+
+    async def send(self, app_id: str, data: dict[str, str]) -> bool:
+        """Deliver data to the websocket of an application. Returns ``False`` if no worker could accept it."""
+        connection = self.clients.get(app_id)
+
+        if connection:
+            self._enqueue(connection, data)
+            return True
+
+        return await self._forward(app_id, {"op": "send", "application_id": app_id, "data": data})
+
+    def deliver(self, app_id: str, data: dict[str, Any]) -> bool:
+        """Deliver data only to a websocket held by this worker. Returns ``False`` if it isn't held here.
+
+        For secrets, which must never pass through Valkey: they are neither forwarded to another worker nor
+        parked when the websocket drains before sending them.
+        """
+        connection = self.clients.get(app_id)
+        if not connection:
+            return False
+
+        try:
+            connection.queue.put_nowait({**data, LOCAL: "1"})
+        except asyncio.QueueShutDown:
+            return False
+
+        connection.queued += 1
+        connection.last_active = time.time()
+
+        return True
+
+    async def disconnect(self, app_id: str | None) -> None:
+        """Close the websocket of an application regardless of which worker holds it."""
+        if not app_id:
+            return
+
+        connection = self.clients.get(app_id)
+
+        if connection:
+            connection.queue.shutdown(immediate=True)
+            return
+
+        await self._forward(app_id, {"op": "disconnect", "application_id": app_id})
+
+    async def drain(self, *, flush: float, spread: float) -> None:
+        """Hand every websocket on this worker off to another.
+
+        Pending codes get ``flush`` seconds to be delivered, then each bot is closed with a hint to reconnect
+        after a random delay of up to ``spread`` seconds. Undelivered codes are parked for the next owner.
+        """
+        connections = list(self.clients)
+        if not connections:
+            return
+
+        LOGGER.info("Draining %s websockets from %r.", len(connections), self)
+        await asyncio.gather(
+            *(self._drain(connection, flush, reason=_restarting(spread), code=1012) for connection in connections)
+        )
+
+    async def move(self, connection: Connection, url: str, *, flush: float) -> None:
+        """Hand a websocket off to the node at ``url``, which now owns its application.
+
+        Works like a drain of that one websocket, except the bot is told where to reconnect straight away.
+        """
+        await self._drain(connection, flush, reason=redirect_reason("Moved.", url), code=REDIRECT)
+
+    async def _drain(self, connection: Connection, flush: float, *, reason: str, code: int) -> None:
+        app_id = connection.app_id
+        queue = connection.queue
+
+        try:
+            await self._handoff(keys=[self.owner_key(app_id)], args=[self.node, DRAINING, self.handoff])
+        except Exception as e:
+            LOGGER.warning("Unable to hand off %s: %s", app_id, e)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + flush
+
+        while not queue.empty() and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+
+        leftover: list[dict[str, str]] = []
+        while not queue.empty():
+            data = queue.get_nowait()
+
+            if LOCAL not in data:
+                leftover.append(data)
+
+        connection.close_reason = reason
+        connection.close_code = code
+        queue.shutdown(immediate=True)
+
+        if leftover:
+            await self._park_codes(app_id, leftover)
+
+    async def _park_codes(self, app_id: str, codes: list[dict[str, str]]) -> bool:
+        keys = [self.owner_key(app_id), self.parked_key(app_id)]
+
+        try:
+            with VALKEY_LATENCY.time("relay", "park", span="relay"):
+                return bool(await self._park(keys=keys, args=[DRAINING, self.handoff, *map(json.dumps, codes)]))  # type: ignore
+        except Exception as e:
+            LOGGER.warning("Unable to park %s codes for %s: %s", len(codes), app_id, e)
+            return False
+
+    async def _forward(self, app_id: str, payload: dict[str, Any]) -> bool:
+        # A second attempt covers a new owner claiming the application between reading and parking...
+        for _ in range(2):
+            with VALKEY_LATENCY.time("relay", "forward", span="relay"):
+                owner: bytes | None = await self.client.get(self.owner_key(app_id))
+
+            if not owner:
+                return False
+
+            if owner.decode() != DRAINING:
+                with VALKEY_LATENCY.time("relay", "forward", span="relay"):
+                    received = cast("int", await self.client.publish(self.node_channel(owner.decode()), json.dumps(payload)))  # type: ignore
+
+                return received > 0
+
+            # The bot is already leaving, so there is nothing to disconnect...
+            if payload["op"] != "send":
+                return True
+
+            if await self._park_codes(app_id, [payload["data"]]):
+                return True
+
+        return False
+
+    def _enqueue(self, connection: Connection, data: dict[str, str]) -> None:
+        try:
+            connection.queue.put_nowait(data)
+        except asyncio.QueueShutDown:
+            # The websocket is being drained; the code waits in Valkey for its next owner...
+            task = asyncio.create_task(self._park_codes(connection.app_id, [data]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            return
+
+        connection.queued += 1
+        connection.last_active = time.time()
+
+        received = data.get("_received")
+        if received:
+            RELAY_LATENCY.observe(time.time() - float(received), "queued")
+
+    def _dispatch(self, payload: dict[str, Any]) -> None:
+        connection = self.clients.get(payload["application_id"])
+        if not connection:
+            return
+
+        op = payload["op"]
+        if op == "send":
+            self._enqueue(connection, payload["data"])
+        elif op == "disconnect":
+            connection.queue.shutdown(immediate=True)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                # Messages are untyped dicts...
+                async for message in cast("AsyncIterator[dict[str, Any]]", self.pubsub.listen()):  # type: ignore
+                    handler = self._handlers.get(message["channel"].decode())
+
+                    if message["type"] != "message" or not handler:
+                        continue
+
+                    handler(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                LOGGER.error("Ignoring exception in %r listener: %s", self, e)
+                await asyncio.sleep(1)
+
+    async def _beat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat)
+
+            if not self.clients:
+                continue
+
+            try:
+                async with self.client.pipeline(transaction=False) as pipe:
+                    for connection in self.clients:
+                        pipe.expire(self.owner_key(connection.app_id), self.ttl)
+
+                    await pipe.execute()
+            except Exception as e:
+                LOGGER.warning("Unable to refresh ownership in %r: %s", self, e)
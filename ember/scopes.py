@@ -0,0 +1,54 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import functools
+import re
+import urllib.parse
+
+
+__all__ = ("canonical", "encode", "parse", "policy")
+
+
+SCOPE = re.compile(r"[a-z0-9_:]{1,64}")
+
+
+@functools.lru_cache(maxsize=4096)
+def parse(scopes: str) -> frozenset[str] | None:
+    """Parse a space or ``+`` separated scope string, returning ``None`` if any scope is malformed."""
+    parsed = frozenset(scopes.replace("+", " ").split())
+
+    if not all(SCOPE.fullmatch(scope) for scope in parsed):
+        return None
+
+    return parsed
+
+
+@functools.lru_cache(maxsize=1024)
+def policy(scopes: str, bot_scopes: str) -> frozenset[str] | None:
+    """The scopes an application allows, or ``None`` if it has not restricted them."""
+    return (parse(scopes) or frozenset()) | (parse(bot_scopes) or frozenset()) or None
+
+
+@functools.lru_cache(maxsize=4096)
+def encode(scopes: frozenset[str]) -> str:
+    """The canonical, URL encoded form of ``scopes`` for the Twitch authorize URL."""
+    return urllib.parse.quote(" ".join(sorted(scopes)), safe="")
+
+
+def canonical(scopes: frozenset[str]) -> str:
+    """The canonical form of ``scopes`` as stored on an application."""
+    return " ".join(sorted(scopes))
@@ -0,0 +1,119 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from litestar.middleware.session.server_side import ServerSideSessionBackend, ServerSideSessionConfig
+from litestar.types import Empty
+
+
+if TYPE_CHECKING:
+    from litestar.connection import ASGIConnection
+    from litestar.middleware.session.base import BaseBackendConfig
+    from litestar.types import Message, ScopeSession  # type: ignore
+
+    from stores import TimedValkeyStore
+    from types_.config import SessionsT
+
+
+__all__ = ("CoalescingSessionBackend", "CoalescingSessionConfig", "session_config")
+
+
+LOADED_KEY = "session_loaded"
+
+
+class CoalescingSessionBackend(ServerSideSessionBackend):
+    """A server-side backend that avoids rewriting sessions which have not changed.
+
+    The expiry is only renewed once the remaining TTL drops below ``renew_threshold``, and the session is
+    only written back when its data changed or it was renewed. Requests without a session write nothing.
+    """
+
+    config: CoalescingSessionConfig
+
+    async def load_from_connection(self, connection: ASGIConnection[Any, Any, Any, Any]) -> dict[str, Any]:
+        data: bytes | None = None
+        renewed = False
+
+        if session_id := connection.cookies.get(self.config.key):
+            store: TimedValkeyStore = self.config.get_store_from_app(connection.scope["app"])  # type: ignore
+            data, renewed = await store.get_and_refresh(
+                session_id,
+                expires_in=self.config.max_age,
+                threshold=self.config.renew_threshold,
+            )
+
+        connection.scope["state"][LOADED_KEY] = (data, renewed)
+        return self.deserialize_data(data) if data is not None else {}
+
+    async def store_in_message(
+        self,
+        scope_session: ScopeSession,  # type: ignore
+        message: Message,
+        connection: ASGIConnection[Any, Any, Any, Any],
+    ) -> None:
+        loaded: bytes | None
+        loaded, renewed = connection.scope["state"].get(LOADED_KEY, (None, False))
+
+        if scope_session is Empty:
+            # Nothing was ever stored, so there is nothing to clear...
+            if loaded is None and not connection.cookies.get(self.config.key):
+                return
+
+        elif loaded is None:
+            if not scope_session:
+                return
+
+        elif not renewed and self.serialize_data(scope_session, connection.scope) == loaded:  # type: ignore
+            return
+
+        await super().store_in_message(scope_session, message, connection)  # type: ignore
+
+
+@dataclass
+class CoalescingSessionConfig(ServerSideSessionConfig):
+    _backend_class = CoalescingSessionBackend
+
+    renew_threshold: int = field(default=86400)
+    """Renew the session expiry once fewer than this many seconds remain."""
+
+
+def session_config(config: SessionsT, **kwargs: Any) -> BaseBackendConfig[Any]:
+    """Build the session middleware configuration for the configured ``backend``.
+
+    ``valkey`` renews and rewrites the session on every request, ``coalescing`` only when needed and
+    ``cookie`` keeps the session in an encrypted cookie with no server-side storage.
+    """
+    backend = config.get("backend", "valkey")
+    max_age = config["max_age"]
+
+    if backend == "cookie":
+        # Requires the cryptography package (litestar[cryptography])...
+        from litestar.middleware.session.client_side import CookieBackendConfig
+
+        secret = config.get("secret")
+        if not secret:
+            raise RuntimeError("The 'cookie' session backend requires 'sessions.secret' to be set.")
+
+        return CookieBackendConfig(secret=bytes.fromhex(secret), max_age=max_age, **kwargs)
+
+    if backend == "coalescing":
+        threshold = config.get("renew_threshold", max_age // 7)
+        return CoalescingSessionConfig(max_age=max_age, renew_threshold=threshold, session_id_bytes=64, **kwargs)
+
+    return ServerSideSessionConfig(max_age=max_age, renew_on_access=True, session_id_bytes=64, **kwargs)
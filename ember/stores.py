@@ -0,0 +1,98 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, cast
+
+from litestar.stores.valkey import ValkeyStore
+from litestar.types import Empty
+
+from metrics import VALKEY_LATENCY
+
+
+if TYPE_CHECKING:
+    from datetime import timedelta
+
+    from litestar.types import EmptyType
+    from valkey.asyncio import Valkey
+
+
+__all__ = ("TimedValkeyStore",)
+
+
+# Renew the expiry only once fewer than ARGV[2] seconds remain. Returns {renewed, data}...
+GET_AND_REFRESH_SCRIPT = """
+local data = redis.call('GET', KEYS[1])
+if not data then
+    return {0, false}
+end
+
+local ttl = redis.call('TTL', KEYS[1])
+if ttl >= 0 and ttl < tonumber(ARGV[2]) then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+    return {1, data}
+end
+
+return {0, data}
+"""
+
+
+class TimedValkeyStore(ValkeyStore):
+    """A :class:`ValkeyStore` recording the latency of each command under its ``label``."""
+
+    __slots__ = ("_get_and_refresh_script", "label")
+
+    def __init__(
+        self,
+        valkey: Valkey,
+        namespace: str | EmptyType | None = Empty,
+        handle_client_shutdown: bool = False,
+    ) -> None:
+        super().__init__(valkey, namespace, handle_client_shutdown)
+
+        self.label = "valkey"
+        self._get_and_refresh_script = self._valkey.register_script(GET_AND_REFRESH_SCRIPT)
+
+    @classmethod
+    def labelled(cls, label: str, url: str, *, db: int | None = None, port: int | None = None) -> TimedValkeyStore:
+        store: TimedValkeyStore = cls.with_client(url, db=db, port=port)  # type: ignore
+        store.label = label
+        return store
+
+    async def set(self, key: str, value: str | bytes, expires_in: int | timedelta | None = None) -> None:
+        with VALKEY_LATENCY.time(self.label, "set", span=self.label):
+            await super().set(key, value, expires_in)
+
+    async def get(self, key: str, renew_for: int | timedelta | None = None) -> bytes | None:
+        with VALKEY_LATENCY.time(self.label, "get", span=self.label):
+            return await super().get(key, renew_for)
+
+    async def get_and_refresh(self, key: str, *, expires_in: int, threshold: int) -> tuple[bytes | None, bool]:
+        """Get a value, renewing its expiry to ``expires_in`` only if fewer than ``threshold`` seconds remain.
+
+        Returns the value and whether it was renewed.
+        """
+        with VALKEY_LATENCY.time(self.label, "get_and_refresh", span=self.label):
+            renewed, data = cast(
+                "tuple[int, bytes | None]",
+                await self._get_and_refresh_script(keys=[self._make_key(key)], args=[expires_in, threshold]),  # type: ignore
+            )
+
+        return data, bool(renewed)
+
+    async def delete(self, key: str) -> None:
+        with VALKEY_LATENCY.time(self.label, "delete", span=self.label):
+            await super().delete(key)
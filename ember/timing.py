@@ -0,0 +1,114 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import random
+import time
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from litestar.types import ASGIApp, Message, Receive, Scope, Send
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("Timings", "record", "server_timing")
+
+
+class Timings:
+    """Stage durations collected for a single sampled request, in seconds."""
+
+    __slots__ = ("spans", "start")
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.spans: dict[str, float] = {}
+
+    def add(self, name: str, duration: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + duration
+
+    def header(self) -> bytes:
+        total = time.perf_counter() - self.start
+        entries = [f"{name};dur={duration * 1000:.2f}" for name, duration in self.spans.items()]
+        entries.append(f"total;dur={total * 1000:.2f}")
+
+        return ", ".join(entries).encode()
+
+
+CURRENT: contextvars.ContextVar[Timings | None] = contextvars.ContextVar("timings", default=None)
+
+
+def record(name: str, duration: float) -> None:
+    """Add an already measured duration to the current request, if it is being sampled.
+
+    Stages are recorded by the metric timers given a ``span``, so each is measured once for both.
+    """
+    timings = CURRENT.get()
+
+    if timings is not None:
+        timings.add(name, duration)
+
+
+def server_timing(*, sample_rate: float = 1.0, header: bool = True, log: bool = False) -> Callable[[ASGIApp], ASGIApp]:
+    """Collect spans for a sample of HTTP requests, emitted as a ``Server-Timing`` header and/or a log line."""
+
+    def middleware(app: ASGIApp) -> ASGIApp:
+        async def wrapped(scope: Scope, receive: Receive, send: Send) -> None:
+            if scope["type"] != "http" or random.random() >= sample_rate:
+                await app(scope, receive, send)
+                return
+
+            timings = Timings()
+            token = CURRENT.set(timings)
+            status = 0
+
+            async def timed_send(message: Message) -> None:
+                nonlocal status
+
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+
+                    if header:
+                        headers = [*message.get("headers", []), (b"server-timing", timings.header())]
+                        message = {**message, "headers": headers}
+
+                await send(message)
+
+            try:
+                await app(scope, receive, timed_send)
+            finally:
+                CURRENT.reset(token)
+
+                if log:
+                    data = {
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "total": round((time.perf_counter() - timings.start) * 1000, 2),
+                        "spans": {name: round(duration * 1000, 2) for name, duration in timings.spans.items()},
+                    }
+                    LOGGER.info("request timing %s", json.dumps(data))
+
+        return wrapped
+
+    return middleware
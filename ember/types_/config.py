@@ -13,7 +13,18 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from typing import TypedDict
+from typing import Literal, NotRequired, TypedDict
+
+
+class TuningT(TypedDict, total=False):
+    backlog: int
+    limit_concurrency: int | None
+    timeout_keep_alive: int
+    ws: str
+    ws_max_queue: int
+    ws_ping_interval: float | None
+    ws_ping_timeout: float | None
+    ws_per_message_deflate: bool
 
 
 class ServerT(TypedDict):
@@ -21,10 +32,19 @@ class ServerT(TypedDict):
     host: str
     domain: str
     build: str
+    workers: NotRequired[int]
+    max_requests: NotRequired[int | None]
+    graceful_timeout: NotRequired[int | None]
+    forwarded_allow_ips: NotRequired[str]
+    profile: NotRequired[Literal["default", "performance"]]
+    tuning: NotRequired[TuningT]
 
 
 class SessionsT(TypedDict):
     max_age: int
+    backend: NotRequired[Literal["valkey", "coalescing", "cookie"]]
+    renew_threshold: NotRequired[int]
+    secret: NotRequired[str | None]
 
 
 class ValkeyT(TypedDict):
@@ -42,9 +62,129 @@ class TwitchT(TypedDict):
     client_secret: str
 
 
+class MetricsT(TypedDict, total=False):
+    enabled: bool
+    token: str | None
+    allow: list[str]
+
+
+class TimingT(TypedDict, total=False):
+    enabled: bool
+    sample_rate: float
+    header: bool
+    log: bool
+
+
+class BucketT(TypedDict):
+    rate: float
+    burst: float
+
+
+class RouteLimitT(TypedDict, total=False):
+    ip: BucketT
+    application: BucketT
+
+
+class RateLimitT(TypedDict, total=False):
+    enabled: bool
+    local: BucketT | None
+    routes: dict[str, RouteLimitT]
+
+
+class AdmissionT(TypedDict, total=False):
+    enabled: bool
+    max_connections: int | None
+    max_per_user: int | None
+    accept: BucketT | None
+    jitter: float
+    max_lag: float | None
+
+
+class DrainT(TypedDict, total=False):
+    enabled: bool
+    flush: float
+    spread: float
+    timeout: float
+
+
+class RefreshT(TypedDict):
+    enabled: bool
+    key: str
+    margin: NotRequired[float]
+    spread: NotRequired[float]
+    batch: NotRequired[int]
+    rate: NotRequired[float]
+    burst: NotRequired[float]
+
+
+class DebugT(TypedDict, total=False):
+    enabled: bool
+    token: str | None
+    allow: list[str]
+    max_seconds: float
+    slow_callback: float | None
+    lag_warning: float | None
+
+
+class CompressionT(TypedDict, total=False):
+    enabled: bool
+    threshold: int
+    level: int
+    memory_level: int
+    window_bits: int
+
+
+class BatchT(TypedDict, total=False):
+    enabled: bool
+    window: float
+    max_messages: int
+    max_bytes: int
+
+
+class WebsocketT(TypedDict, total=False):
+    compression: CompressionT
+    batch: BatchT
+
+
+class ClusterT(TypedDict):
+    enabled: bool
+    node: str
+    url: str
+    heartbeat: NotRequired[float]
+    ttl: NotRequired[float]
+    replicas: NotRequired[int]
+    flush: NotRequired[float]
+
+
+class AnalyticsT(TypedDict, total=False):
+    enabled: bool
+    flush: float
+    accuracy: float
+    max_pending: int
+
+
+class CaptureT(TypedDict, total=False):
+    enabled: bool
+    path: str
+    salt: str | None
+    flush: float
+    max_events: int
+
+
 class ConfigT(TypedDict):
     server: ServerT
     sessions: SessionsT
     valkey: ValkeyT
     database: DatabaseT
     twitch: TwitchT
+    metrics: NotRequired[MetricsT]
+    timing: NotRequired[TimingT]
+    ratelimit: NotRequired[RateLimitT]
+    admission: NotRequired[AdmissionT]
+    drain: NotRequired[DrainT]
+    refresh: NotRequired[RefreshT]
+    debug: NotRequired[DebugT]
+    websocket: NotRequired[WebsocketT]
+    cluster: NotRequired[ClusterT]
+    analytics: NotRequired[AnalyticsT]
+    capture: NotRequired[CaptureT]
@@ -21,29 +21,3 @@ class UserRecordDT(TypedDict):
     twitch_id: str
     name: str
     token: str | None
-
-
-class FullUserRecordDT(TypedDict, total=False):
-    id: int
-    twitch_id: str
-    name: str
-    token: str | None
-    application_id: str | None
-    client_id: str | None
-    application_name: str | None
-    scopes: str | None
-    bot_scopes: str | None
-    auths: int | None
-    allowed: str | None
-    url: str | None
-
-
-class ApplicationRecordDT(TypedDict):
-    application_id: str
-    user_id: int
-    client_id: str
-    application_name: str
-    url: str
-    scopes: str
-    bot_scopes: str
-    auths: int
@@ -0,0 +1,76 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import logging
+import secrets
+from typing import TYPE_CHECKING
+
+from metrics import VALKEY_LATENCY
+
+
+if TYPE_CHECKING:
+    from valkey.asyncio import Valkey
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("Versions",)
+
+
+class Versions:
+    """Per-user version counters, bumped by every change visible in ``/users/@me``.
+
+    Counters start at a random value, so a counter lost from Valkey never repeats an earlier ETag.
+    """
+
+    def __init__(self, client: Valkey) -> None:
+        self.client = client
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"user:version:{user_id}"
+
+    @staticmethod
+    def etag(user_id: int, version: int) -> str:
+        return f'"{user_id}.{version}"'
+
+    @staticmethod
+    def matches(header: str | None, etag: str) -> bool:
+        if not header:
+            return False
+
+        return any(tag.strip().removeprefix("W/") in (etag, "*") for tag in header.split(","))
+
+    async def get(self, user_id: int) -> int:
+        key = self.key(user_id)
+
+        with VALKEY_LATENCY.time("versions", "get", span="versions"):
+            value: bytes | None = await self.client.get(key)
+
+            if value is None:
+                await self.client.set(key, secrets.randbits(48), nx=True)
+                value = await self.client.get(key)
+
+        return int(value or 0)
+
+    async def bump(self, user_id: int) -> None:
+        try:
+            with VALKEY_LATENCY.time("versions", "bump", span="versions"):
+                await self.client.incr(self.key(user_id))
+        except Exception as e:
+            LOGGER.warning("Unable to bump version for user %s: %s", user_id, e)
@@ -0,0 +1,164 @@
+"""Copyright 2025 PythonistaGuild
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import TYPE_CHECKING, Any
+
+import asyncpg
+
+
+if TYPE_CHECKING:
+    from database import Database
+
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+__all__ = ("CHANNEL", "Whitelist")
+
+
+CHANNEL = "whitelist"
+
+
+class Whitelist:
+    """An in-memory index of the users allowed to authenticate with each application.
+
+    An application's entries are loaded on first use and then kept current by the ``NOTIFY`` messages the
+    database sends with every change, so membership checks never touch the database.
+    An application with no entries is open to everyone.
+
+    The relay never sees who authenticates, so it can only check the ``user`` named in the authorization link,
+    which the browser supplies. That is advisory: the bot enforces it by comparing the ``login`` of the token it
+    exchanges with the ``user`` forwarded alongside the code.
+
+    While the listening connection is down no entries are cached, as changes could be missed.
+    """
+
+    def __init__(self, db: Database) -> None:
+        self.db = db
+        self.entries: dict[str, set[str]] = {}
+
+        self._loading: dict[str, asyncio.Task[set[str]]] = {}
+        self._stale: set[str] = set()
+        self._connection: asyncpg.Connection[Any] | None = None
+        self._reconnect: asyncio.Task[None] | None = None
+        self._closed = False
+
+    @staticmethod
+    def normalize(entry: str) -> str:
+        return entry.strip().lower()
+
+    async def start(self) -> None:
+        await self._listen()
+
+    async def close(self) -> None:
+        self._closed = True
+
+        if self._reconnect:
+            self._reconnect.cancel()
+
+        if self._connection:
+            await self._connection.close()
+
+    async def get(self, app_id: str) -> set[str]:
+        entries = self.entries.get(app_id)
+        if entries is not None:
+            return entries
+
+        task = self._loading.get(app_id)
+        if task is None:
+            task = self._loading[app_id] = asyncio.create_task(self._load(app_id))
+
+        return await asyncio.shield(task)
+
+    async def allowed(self, app_id: str, user: str | None) -> bool:
+        entries = await self.get(app_id)
+
+        if not entries:
+            return True
+
+        return user is not None and self.normalize(user) in entries
+
+    async def _load(self, app_id: str) -> set[str]:
+        try:
+            entries = set(await self.db.fetch_whitelist(app_id))
+
+            # A change announced while loading may not be part of what we read...
+            if self._connection is not None and app_id not in self._stale:
+                self.entries[app_id] = entries
+
+            return entries
+        finally:
+            del self._loading[app_id]
+            self._stale.discard(app_id)
+
+    async def _listen(self) -> None:
+        connection: asyncpg.Connection[Any] = await asyncpg.connect(dsn=self.db.dsn)
+
+        await connection.add_listener(CHANNEL, self._notify)  # type: ignore
+        connection.add_termination_listener(self._terminated)  # type: ignore
+
+        self._connection = connection
+        LOGGER.info("Listening for whitelist changes on channel %r.", CHANNEL)
+
+    async def _relisten(self) -> None:
+        delay = 1.0
+
+        while not self._closed:
+            try:
+                await self._listen()
+            except Exception as e:
+                LOGGER.warning("Unable to listen for whitelist changes, retrying in %ss: %s", delay, e)
+
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60.0)
+            else:
+                return
+
+    def _terminated(self, connection: asyncpg.Connection[Any]) -> None:
+        self._connection = None
+        self.entries.clear()
+        self._stale.update(self._loading)
+
+        if not self._closed:
+            LOGGER.warning("Lost the whitelist listener connection. Reconnecting.")
+            self._reconnect = asyncio.create_task(self._relisten())
+
+    def _notify(self, connection: asyncpg.Connection[Any], pid: int, channel: str, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+            app_id: str = data["application_id"]
+            op: str = data["op"]
+        except (ValueError, KeyError) as e:
+            LOGGER.warning("Ignoring malformed whitelist notification %r: %s", payload, e)
+            return
+
+        if app_id in self._loading:
+            self._stale.add(app_id)
+
+        entries = self.entries.get(app_id)
+        if entries is None:
+            return
+
+        if op == "add":
+            entries.update(data["allowed"])
+        elif op == "remove":
+            entries.difference_update(data["allowed"])
+        else:
+            del self.entries[app_id]